@@ -19,6 +19,7 @@
 # END LICENCE
 # Standard import
 import re
+import bisect
 import datetime
 from functools import reduce
 import logging
@@ -28,6 +29,8 @@ logger = logging.getLogger('boinc.application')
 from bs4 import BeautifulSoup
 # This project
 import task
+from taskTable import TaskTable
+from textTable import TextTable
 from statistics import StatisticsList, ApplicationStatistics_wuprop
 
 class Application(object):
@@ -42,9 +45,9 @@ class Application(object):
             self.name_long = name
 
         if tasks is None:
-            self.tasks = list()
+            self.tasks = TaskTable()
         else:
-            self.tasks = tasks
+            self.tasks = TaskTable(tasks)
         self.badge = badge
         self.statistics = statistics
     
@@ -85,6 +88,11 @@ class Application(object):
         #self.setName_shortLong(user_friendly_name)
         self.name_long  = user_friendly_name
 
+    def setNameFromElement(self, element):
+        """Same as setNameFromSoup, but for a xml.etree <app> element"""
+        self.name_short = element.findtext('name')
+        self.name_long  = element.findtext('user_friendly_name')
+
     def appendTaskFromXML(self, xml):
         t = task.Task_local.createFromXML(xml)
         self.tasks.append(t)
@@ -153,12 +161,17 @@ class Application(object):
             name_long = name_long
         self.name_long = name_long.strip()
 
-    def __str__(self):
-        ret = ["= {} = {} {}".format(self.name, self.statistics, 
-                                     self.badge)]
+    def appendTo(self, table):
+        """Adds the application header and one row per task to the TextTable"""
+        table.append("= {} = {} {}".format(self.name, self.statistics, 
+                                           self.badge))
         for t in self.tasks:
-            ret.append(str(t))
-        return "\n".join(ret)
+            table.appendTask(t)
+
+    def __str__(self):
+        table = TextTable()
+        self.appendTo(table)
+        return str(table)
 
     def __len__(self):
         """
@@ -171,24 +184,28 @@ class Application(object):
         pending,
         started
         and tasks waiting for validation.
+        Only local tasks are counted, see Task_local.pendingTime.
+        The sums are cached by the TaskTable until the tasks change.
         """
-        pending = 0
-        running = 0
-        validation = 0
-        for task in self.tasks:
-            try:
-                (p, r, v) = task.pendingTime(include_elapsedCPUtime=include_elapsedCPUtime)
-                pending    += p
-                running    += r
-                validation += v 
-            except AttributeError:
-                pass
-
-        return pending, running, validation
-
-
-def mergeApplications(local_app, web_app):
-    """Tries to merge local and web information by adding information from local to the web application"""
+        return self.tasks.pendingTime(include_elapsedCPUtime=include_elapsedCPUtime)
+
+
+def findPrefix(index, names, prefix, taken):
+    """Returns the first (lowest) original index of the names starting with prefix, skipping those in taken.
+    index is the sorted list of (name, original index) and names the sorted names,
+    so the candidates are found by bisection instead of a scan over every name."""
+    first = None
+    ix = bisect.bisect_left(names, prefix)
+    while ix < len(names) and names[ix].startswith(prefix):
+        jx = index[ix][1]
+        if jx not in taken and (first is None or jx < first):
+            first = jx
+        ix += 1
+    return first
+
+def mergeApplications(local_app, web_app, web_project=None):
+    """Tries to merge local and web information by adding information from local to the web application.
+    web_project is the project holding web_app, if given its name_short index is kept up to date."""
     logger.debug('mergeapplication %s %s', local_app.name, web_app.name)
     # This is a uggly hack which should be removed (currently needed to avoid merging too much).
     try:
@@ -203,29 +220,31 @@ def mergeApplications(local_app, web_app):
         pass
 
 
-    local_tasks = list(local_app.tasks)
     web_tasks = web_app.tasks
-    ix = 0
-    while ix < len(local_tasks):
-        logger.debug('looking for %s', local_tasks[ix].name)
-        #if local_task[ix] in web_app.tasks:
-        for jx in range(len(web_tasks)):
-            #logger.debug('is it %s', web_tasks[jx].name)
-            if web_tasks[jx].name.startswith(local_tasks[ix].name):
-                logger.debug('Found it, replacing %s', web_tasks[jx])
-                web_tasks[jx] = local_tasks[ix] # Local has more info then web
-                del local_tasks[ix]
-                break
+    index = sorted((t.name, jx) for jx, t in enumerate(web_tasks))
+    names = [name for name, jx in index]
+    replaced = dict()           # index in web_tasks -> local task
+    remaining = list()
+    for local_task in local_app.tasks:
+        logger.debug('looking for %s', local_task.name)
+        jx = findPrefix(index, names, local_task.name, replaced)
+        if jx is None:
+            remaining.append(local_task)
         else:
-            ix += 1
+            logger.debug('Found it, replacing %s', web_tasks[jx])
+            replaced[jx] = local_task # Local has more info then web
 
-    for remaining_task in local_tasks:
-        web_app.tasks.append(remaining_task)
+    if len(replaced) != 0:
+        web_tasks[:] = [replaced.get(jx, t) for jx, t in enumerate(web_tasks)]
+    web_tasks.extend(remaining)
 
     if local_app.statistics != '':
         web_app.appendStatistics(local_app.statistics)
     
     if web_app.name_short == '':
-        web_app.name_short = local_app.name_short
+        if web_project is None:
+            web_app.name_short = local_app.name_short
+        else:
+            web_project.renameApplicationShort(web_app, local_app.name_short)
 
     return True
@@ -29,23 +29,36 @@ import atexit
 import subprocess
 import readline
 import shlex
+import threading
 import logging
 logger = logging.getLogger('boinc')
 # This project
 from loggerSetup import loggerSetup
 import config
 import browser
+import httpPool
 import project
 import boinccmd
+import taskQuery
+import snapshot
 import changePrefs
 
 class Boinc(object):
     def __init__(self, parser):
         self.CONFIG, self.CACHE_DIR, self.BOINC_DIR = config.set_globals()
+        httpPool.configure(self.CONFIG)
         self.cache = browser.Browser_file(self.CACHE_DIR)
+        self.matches = project.MatchMap(os.path.join(self.CACHE_DIR, 'merge_matches.pickle'))
+        self.snapshotFile = os.path.join(self.CACHE_DIR, 'projects_snapshot.pickle')
+        self.snapshotShown = False
         configureReadline(self.CONFIG.path)
         self.parse_args(parser)
 
+        password = boinccmd.readPassword(self.BOINC_DIR)
+        self.connection = boinccmd.Connection(password=password) # kept open between refreshes
+        atexit.register(self.connection.close)
+        self.localState = boinccmd.IncrementalState(self.connection)
+
         self.local_projects = dict()
         self.web_projects = dict()
         self.wuprop_projects = dict()
@@ -66,10 +79,31 @@ class Boinc(object):
             print(name)
             project.pretty_print(proj, show_empty=True)
 
+    def query(self):
+        """TaskQuery from the listing arguments, None if none of them are given"""
+        a = self.args
+        if not(a.state or a.project or a.device or a.deadline is not None
+               or a.sort or a.page_size or a.page):
+            return None
+
+        deadline = None
+        if a.deadline is not None:
+            deadline = (None, a.deadline*60*60)
+        sort = a.sort
+        if sort and a.reverse:
+            sort = '-' + sort
+        return taskQuery.TaskQuery(states=a.state, projects=a.project,
+                                   deadline=deadline, device=a.device,
+                                   sort=sort, page_size=a.page_size or 50,
+                                   page=a.page or 0)
+
     def updateLocalProjects(self):
         if self.args.local:
             try:
-                self.local_projects = boinccmd.get_state()
+                if self.args.incremental:
+                    self.local_projects = self.localState.update()
+                else:
+                    self.local_projects = boinccmd.get_state(connection=self.connection)
                 self.verbosePrintProject('LOCAL', self.local_projects)
             except Exception as e:
                 logging.error('Could not get local state, %s. Is boinc running?', e)
@@ -79,7 +113,7 @@ class Boinc(object):
             self.cache.update() # throw out the old stuff
             self.web_projects = browser.getProjectsDict(self.CONFIG, self.cache)
             self.verbosePrintProject('WEB', self.web_projects)
-            project.merge(self.local_projects, self.web_projects)
+            project.merge(self.local_projects, self.web_projects, matches=self.matches)
         else:
             self.web_projects = self.local_projects # so that it gets printed
 
@@ -92,6 +126,27 @@ class Boinc(object):
             project.mergeWuprop(self.wuprop_projects, 
                                 self.local_projects)
 
+    def update(self):
+        """Gets local, wuprop and web data and saves the merged web_projects as a snapshot"""
+        self.updateLocalProjects()
+        self.updateWupropProjects()
+        self.updateWebProjects()
+        if len(self.web_projects) != 0:
+            snapshot.save(self.snapshotFile, self.web_projects)
+
+    def showSnapshot(self):
+        """Prints the snapshot from the previous run (only on the first call)"""
+        if self.snapshotShown:
+            return
+        self.snapshotShown = True
+        projects, created = snapshot.load(self.snapshotFile)
+        if projects is None:
+            return
+        print('=== Snapshot from {}, updating ==='.format(time.strftime('%Y-%m-%d %H:%M', time.localtime(created))))
+        project.pretty_print(projects, 
+                             show_empty=self.args.verbose,
+                             query=self.query())
+
     def plot(self):
         if self.args.plot:
             b = browser.BrowserSuper(self.cache)
@@ -123,8 +178,10 @@ class Boinc(object):
 
     def callBoinccmd(self):
         if self.args.boinccmd:
-            ret = boinccmd.CallBoinccmd(self.BOINC_DIR, 
-                                        self.args.boinccmd)
+            ret = boinccmd.callBoinccmd(self.BOINC_DIR, 
+                                        self.args.boinccmd,
+                                        connection=self.connection,
+                                        binary=self.args.boinccmd_binary)
             self.args.boinccmd = None
             return ret
         
@@ -145,7 +202,9 @@ class Boinc(object):
                     except IndexError:
                         print("Usage error: please supply preferences as key value pairs. got %s" % prefs)
             self.args.prefs = None
-            p = boinccmd.CallBoinccmd(self.BOINC_DIR, '--read_global_prefs_override')
+            p = boinccmd.callBoinccmd(self.BOINC_DIR, '--read_global_prefs_override',
+                                      connection=self.connection,
+                                      binary=self.args.boinccmd_binary)
             return p
 
     def startBoinc(self):
@@ -187,16 +246,28 @@ def main(b):
 
     # Get data
     if b.args.update:
-        #try:
-        b.updateLocalProjects()
-        b.updateWupropProjects()
-        b.updateWebProjects()
-        #except Exception as e:
-        #    logger.exception('Uncaught exception when getting data')
+        # The previous result is shown while the update runs in the background,
+        # the plotting is left in this thread since matplotlib wants the main thread.
+        if b.args.web:
+            b.CONFIG.loadPasswords() # any keyring prompt before the snapshot is printed
+        errors = list()
+        def update():
+            try:
+                b.update()
+            except Exception as e:
+                logger.exception('Uncaught exception when getting data')
+                errors.append(e)
+        refresh = threading.Thread(target=update)
+        refresh.start()
+        b.showSnapshot()
+        refresh.join()
+        if len(errors) != 0:
+            raise errors[0]
 
         # print 'MERGED'
         project.pretty_print(b.web_projects, 
-                             show_empty=b.args.verbose)
+                             show_empty=b.args.verbose,
+                             query=b.query())
         b.plot()
 
         b.args.update = False   # reset for next time: todo: doesn't actually do anything
@@ -259,8 +330,29 @@ def run():
     # parser.add_switch('c', 'checkpoint', 
     #                   help_on='Show CPU time since checkpoint for active tasks.',
     #                   help_off='Hide CPU time since checkpoint for active tasks')
+    listing = parser.add_argument_group('task listing', 
+                                        ('Any of these shows a page of matching tasks '
+                                         'and a summary line per project instead of every task'))
+    listing.add_argument('--state', action='append', 
+                         help='Only show tasks in this state, like "running", can be repeated')
+    listing.add_argument('--project', action='append', 
+                         help='Only show projects with this as part of the name or url, can be repeated')
+    listing.add_argument('--device', action='append', 
+                         help='Only show tasks on this device (host), can be repeated')
+    listing.add_argument('--deadline', type=float, 
+                         help='Only show tasks with a deadline within this many hours (including overdue)')
+    listing.add_argument('--sort', choices=sorted(taskQuery.TaskQuery.sortKeys), help='Sort tasks by')
+    listing.add_argument('--reverse', action='store_true', help='Use descending order for --sort')
+    listing.add_argument('--page_size', type=int, help='Number of tasks per page (default 50)')
+    listing.add_argument('--page', type=int, help='Page to show, starting at 0')
     parser.add_argument('--boinccmd', nargs='?', help=('Passed to the command line boinccmd, '
                                                        'pass --boinccmd=--help for more info'))
+    parser.add_argument('--incremental', action='store_true',
+                        help=('Only get the full state from boinc on the first update, '
+                              'later updates only ask for what has changed'))
+    parser.add_argument('--boinccmd_binary', action='store_true', 
+                        help=('Use the boinccmd binary for --boinccmd and --prefs, '
+                              'default is to talk to boinc directly which supports fewer commands'))
     parser.add_argument('--prefs', nargs='?', help=('Passed to the py-boinc-prefs utility '
                                                     'which changes the global_prefs_override.xml '
                                                     'and issues a read_global_prefs_override when done. '
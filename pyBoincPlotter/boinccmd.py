@@ -22,12 +22,24 @@
 import os
 import subprocess
 import shlex
-from socket import socket
+import hashlib
+from socket import socket, error as SocketError
+import xml.etree.ElementTree as ElementTree
+from xml.sax.saxutils import escape
 import logging
 logger = logging.getLogger('boinc.boinccmd')
+try:
+    basestring
+except NameError:               # python 3
+    basestring = str
 # This project
 from project import Project, Project_fileTransfers, pretty_print
 from task import Task_fileTransfer
+import util
+
+class RpcError(Exception):
+    """The boinc client replied with an error"""
+    pass
 
 class CallBoinccmd(object):
     """ tiny layer on top of subprocess Popen for calling boinccmd and getting stdout """
@@ -59,12 +71,126 @@ class CallBoinccmd(object):
                 return ''
             return stdout
 
+class CallRpc(object):
+    """ Same interface as CallBoinccmd, but runs the boinccmd command line natively over a Connection.
+    The structured reply is available as self.reply (True for operations that simply succeed).
+    """
+    # boinccmd option -> Connection method, remaining arguments are passed on in order
+    commands = {'get_cc_status': 'get_cc_status',
+                'get_host_info': 'get_host_info',
+                'read_global_prefs_override': 'read_global_prefs_override',
+                'read_cc_config': 'read_cc_config',
+                'run_benchmarks': 'run_benchmarks',
+                'network_available': 'network_available',
+                'quit': 'quit',
+                'set_run_mode': 'set_run_mode',
+                'set_gpu_mode': 'set_gpu_mode',
+                'set_network_mode': 'set_network_mode',
+                'project': 'project_op',
+                'task': 'result_op',
+                'project_attach': 'project_attach'}
+
+    def __init__(self, connection, arguments='--get_cc_status'):
+        if isinstance(arguments, basestring):
+            arguments = shlex.split(arguments)
+        logger.info('rpc: %s', arguments)
+
+        self.reply = None
+        self.error = None
+        try:
+            self.reply = self.call(connection, arguments)
+        except (RpcError, SocketError, ValueError, TypeError) as e:
+            logger.debug('rpc %s failed', arguments, exc_info=True)
+            self.error = e
+
+    def call(self, connection, arguments):
+        name = arguments[0].lstrip('-')
+        if name == 'help':
+            return self.help()
+        if name not in self.commands:
+            raise ValueError('"%s" is not supported without the boinccmd binary, try %s'
+                             % (arguments[0], self.help()))
+        method = getattr(connection, self.commands[name])
+        return method(*arguments[1:])
+
+    def help(self):
+        return 'one of --' + ', --'.join(sorted(self.commands))
+
+    def communicate(self, returnAll=False):
+        if self.error is not None:
+            if returnAll:
+                return 'Error: {}'.format(self.error)
+            print("Error: {}".format(self.error))
+            return ''
+        if isinstance(self.reply, dict):
+            return formatDict(self.reply)
+        elif self.reply is True:
+            return 'Success'
+        return self.reply
+
+def formatDict(dct, indent=''):
+    """Indented 'key: value' lines for the dictionaries returned by util.elementToDict"""
+    ret = list()
+    for key in sorted(dct):
+        values = dct[key]
+        if not(isinstance(values, list)):
+            values = [values]
+        for value in values:
+            if isinstance(value, dict):
+                ret.append('{}{}:'.format(indent, key))
+                ret.append(formatDict(value, indent + '    '))
+            else:
+                ret.append('{}{}: {}'.format(indent, key, value))
+    return '\n'.join(ret)
+
+def callBoinccmd(boinc_dir, arguments, connection=None, binary=False):
+    """Runs a boinccmd command line, natively over the rpc connection (see CallRpc)
+    or with the boinccmd binary (see CallBoinccmd) if binary is True.
+    Either way the returned object has a communicate() method."""
+    if binary:
+        return CallBoinccmd(boinc_dir, arguments)
+
+    if connection is None:
+        connection = Connection(password=readPassword(boinc_dir))
+    return CallRpc(connection, arguments)
+
+def readPassword(boinc_dir):
+    """Returns the GUI RPC password from gui_rpc_auth.cfg in the boinc dir,
+    None if there is no such (readable) file or it is empty"""
+    filename = os.path.join(boinc_dir, 'gui_rpc_auth.cfg')
+    try:
+        with open(filename, 'r') as f:
+            password = f.read().strip()
+    except IOError as e:
+        logger.debug('Could not read GUI RPC password, %s', e)
+        return None
+    if password == '':
+        return None
+    return password
+
+def formatRequest(command):
+    """Returns the encoded rpc request,
+    command is either the name of the rpc (like get_state) or the full xml of the request"""
+    if not(command.startswith('<')):
+        command = '<%s/>' % command
+    buf = "<boinc_gui_rpc_request>\n"\
+          "%s\n"\
+          "</boinc_gui_rpc_request>\n\003"\
+          % (command)
+    return buf.encode()
+
+def authRequest(nonce, password):
+    """The auth2 request, answer to the nonce given by auth1"""
+    nonce_hash = hashlib.md5((nonce + password).encode()).hexdigest()
+    return '<auth2>\n<nonce_hash>%s</nonce_hash>\n</auth2>' % nonce_hash
+
 class Boinccmd(socket):
+    bufferSize = 65536          # size of the receive buffer, reused for every recv_into
     def __init__(self, addr='', portNr=31416, **kwargs):
         super(self.__class__, self).__init__(**kwargs)
-        self.previous_data = ''
         self.addr = addr
         self.portNr = portNr
+        self.buffer = bytearray(self.bufferSize)
     
     def __enter__(self):
         self.connect((self.addr, self.portNr))
@@ -72,42 +198,235 @@ class Boinccmd(socket):
     def __exit__(self, type, value, traceback):
         self.close()
 
+    def send_request(self, command):
+        self.sendall(formatRequest(command))
+
     def request(self, command):
-        buf = "<boinc_gui_rpc_request>\n"\
-              "<%s/>\n"\
-              "</boinc_gui_rpc_request>\n\003"\
-               % (command)
-        self.sendall(buf.encode())
+        self.send_request(command)
         return self.recv_end()
 
-    def recv_end(self):
-        """ Iterator over lines of self.recv()
+    def request_raw(self, command):
+        self.send_request(command)
+        return self.recv_chunks()
+
+    def authorize(self, password):
+        """Does the auth1/auth2 handshake needed when boinc has a GUI RPC password"""
+        reply = "\n".join(self.request('auth1'))
+        nonce = ElementTree.fromstring(reply).findtext('nonce')
+        reply = "\n".join(self.request(authRequest(nonce, password)))
+        if ElementTree.fromstring(reply).find('authorized') is None:
+            raise RpcError('boinc at "%s":%s did not accept the GUI RPC password' % (self.addr, self.portNr))
+
+    def recv_chunks(self):
+        """ Iterator over raw chunks of the reply, up to but not including the \\003 end mark.
+        Each chunk is a memoryview into self.buffer which is overwritten by the next recv,
+        so use it (or copy it) before asking for the next one.
         """
-        End = '\003'
-        more_data = True
-        while more_data:
-            data = self.previous_data + self.recv(4096).decode() # previous data gets included
-            data = data.split('\n')
-            self.previous_data = ''
-
-            for line_ix in range(len(data)): # For each line
-                if End in data[line_ix]:
-                    more_data = False # breaks outer loop
-                    break             # breaks inner loop
-                elif line_ix == len(data)-1: # no endmark and last line
-                    self.previous_data = data[line_ix]
-                else:
-                    yield data[line_ix]
-
-            ix = data[line_ix].find(End) # yield until End mark
+        view = memoryview(self.buffer)
+        while True:
+            n = self.recv_into(self.buffer)
+            if n == 0:
+                raise SocketError('Connection closed by boinc before end of reply')
+            ix = self.buffer.find(b'\003', 0, n)
             if ix != -1:
-                yield data[line_ix][:ix]
-                self.previous_data += data[line_ix][:ix]
+                yield view[:ix]
+                return
+            yield view[:n]
+
+    def recv_end(self):
+        """ Iterator over lines of the reply, without the newline.
+        The last item is whatever comes between the last newline and the end mark.
+        """
+        pending = bytearray()   # incomplete line carried over between chunks
+        for chunk in self.recv_chunks():
+            start = len(pending)
+            pending += chunk
+            end = pending.rfind(b'\n', start)
+            if end == -1:
+                continue
+
+            for line in pending[:end].decode().split('\n'): # decode complete lines only
+                yield line
+            del pending[:end+1]
+
+        yield pending.decode()
+
+class Connection(object):
+    """Keeps a single Boinccmd socket open between requests.
+    Use one instance for all requests to the same boinc client,
+    the socket is (re)connected when needed.
+    Note that the boinc client discards anything received after a complete request,
+    so requests are sent one at a time over the same socket and not all at once.
+    """
+    def __init__(self, addr='', portNr=31416, password=None):
+        self.addr = addr
+        self.portNr = portNr
+        self.password = password # GUI RPC password, if any
+        self.sock = None
+        self.inReply = False    # True while a reply is only partially read
+
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def connect(self):
+        self.close()
+        logger.debug('Connecting to boinc at "%s":%s', self.addr, self.portNr)
+        sock = Boinccmd(self.addr, self.portNr)
+        try:
+            sock.__enter__()
+            if self.password:
+                sock.authorize(self.password)
+        except:
+            sock.close()
+            raise
+        self.sock = sock
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        self.inReply = False
+
+    def request(self, command):
+        """Same as Boinccmd.request, yields each line of the reply.
+        A socket closed by the other end is retried once on a new socket.
+        """
+        return self._request(command, 'request')
+
+    def request_raw(self, command):
+        """Same as Boinccmd.request_raw, yields memoryview chunks of the reply."""
+        return self._request(command, 'request_raw')
+
+    def _request(self, command, method):
+        if self.sock is None or self.inReply: # the remains of an unfinished reply would mess up this one
+            self.connect()
+
+        try:
+            items = getattr(self.sock, method)(command)
+            first = next(items)
+        except SocketError as e:
+            logger.info('Lost connection to boinc, "%s", reconnecting', e)
+            self.connect()
+            items = getattr(self.sock, method)(command)
+            first = next(items)
+
+        self.inReply = True
+        try:
+            yield first
+            for item in items:
+                yield item
+        except SocketError:
+            self.close()
+            raise
+        self.inReply = False
+
+    #
+    # Operations, these return structured replies instead of lines
+    #
+    run_modes = ('always', 'auto', 'never', 'restore')
+    project_ops = ('reset', 'detach', 'update', 'suspend', 'resume',
+                   'nomorework', 'allowmorework', 'detach_when_done', 'dont_detach_when_done')
+    result_ops = ('suspend', 'resume', 'abort')
+
+    def call(self, command):
+        """Sends command (see formatRequest) and returns the <boinc_gui_rpc_reply> element,
+        raises RpcError if boinc replies with an error"""
+        reply = "\n".join(self.request(command))
+        root = ElementTree.fromstring(reply)
+        error = root.findtext('error')
+        if error is not None:
+            raise RpcError('boinc replied "%s" to %s' % (error, command))
+        if root.find('unauthorized') is not None:
+            raise RpcError('Not authorized for %s, check the GUI RPC password' % command)
+        return root
+
+    def simpleOp(self, command):
+        """For operations that only reply with <success/>"""
+        root = self.call(command)
+        if root.find('success') is None:
+            raise RpcError('Unexpected reply to %s: %s' % (command, ElementTree.tostring(root)))
+        return True
 
-def get_state_command(command='get_state', printRaw=False, projects=None):
-    parser = Parse_state(projects)
-    with Boinccmd() as s:
-        for line in s.request(command):
+    def get_cc_status(self):
+        return util.elementToDict(self.call('get_cc_status').find('cc_status'))
+
+    def get_host_info(self):
+        return util.elementToDict(self.call('get_host_info').find('host_info'))
+
+    def read_global_prefs_override(self):
+        return self.simpleOp('read_global_prefs_override')
+
+    def read_cc_config(self):
+        return self.simpleOp('read_cc_config')
+
+    def run_benchmarks(self):
+        return self.simpleOp('run_benchmarks')
+
+    def network_available(self):
+        return self.simpleOp('network_available')
+
+    def quit(self):
+        return self.simpleOp('quit')
+
+    def set_run_mode(self, mode, duration=0, command='set_run_mode'):
+        """mode is one of always, auto, never or restore, duration is in seconds (0 is forever)"""
+        if mode not in self.run_modes:
+            raise ValueError('Unknown mode "%s", expected one of %s' % (mode, self.run_modes))
+        return self.simpleOp('<{0}>\n<{1}/>\n<duration>{2:f}</duration>\n</{0}>'.format(command, mode, float(duration)))
+
+    def set_gpu_mode(self, mode, duration=0):
+        return self.set_run_mode(mode, duration, command='set_gpu_mode')
+
+    def set_network_mode(self, mode, duration=0):
+        return self.set_run_mode(mode, duration, command='set_network_mode')
+
+    def project_op(self, url, op):
+        """op is one of self.project_ops"""
+        if op not in self.project_ops:
+            raise ValueError('Unknown project operation "%s", expected one of %s' % (op, self.project_ops))
+        return self.simpleOp('<project_{0}>\n<project_url>{1}</project_url>\n</project_{0}>'.format(op, escape(url)))
+
+    def result_op(self, url, name, op):
+        """op is one of self.result_ops, name is the task name"""
+        if op not in self.result_ops:
+            raise ValueError('Unknown task operation "%s", expected one of %s' % (op, self.result_ops))
+        return self.simpleOp('<{0}_result>\n<project_url>{1}</project_url>\n<name>{2}</name>\n</{0}_result>'.format(op, escape(url), escape(name)))
+
+    def project_attach(self, url, authenticator, name=''):
+        return self.simpleOp(('<project_attach>\n<project_url>{0}</project_url>\n'
+                              '<authenticator>{1}</authenticator>\n'
+                              '<project_name>{2}</project_name>\n</project_attach>').format(escape(url), 
+                                                                                           escape(authenticator),
+                                                                                           escape(name)))
+
+def get_state_command(command='get_state', printRaw=False, projects=None, Parser=None,
+                      connection=None):
+    """Parser defaults to Parse_stateStream, falling back to Parse_state if the reply is not valid xml.
+    Pass in a Connection to reuse the socket for several commands."""
+    if connection is None:
+        with Connection() as connection:
+            return get_state_command(command, printRaw=printRaw, projects=projects,
+                                     Parser=Parser, connection=connection)
+
+    if Parser is None:
+        try:
+            return get_state_command(command, printRaw=printRaw, projects=projects,
+                                     Parser=Parse_stateStream, connection=connection)
+        except ElementTree.ParseError as e:
+            logger.warning('Could not parse %s reply as xml, "%s", trying again with fallback parser', command, e)
+            Parser = Parse_state
+
+    if projects is not None:
+        projects = dict(projects) # do not leave a half parsed reply behind if we fail
+    parser = Parser(projects)
+    if hasattr(parser, 'feedRaw') and not(printRaw):
+        # No need for lines, hand the received buffers straight to the parser
+        for chunk in connection.request_raw(command):
+            parser.feedRaw(chunk)
+    else:
+        for line in connection.request(command):
             if printRaw:
                 print(line)
 
@@ -115,11 +434,100 @@ def get_state_command(command='get_state', printRaw=False, projects=None):
 
     return parser.projects
 
-def get_state(printRaw=False):
-    d1 = get_state_command('get_state', printRaw=printRaw)
-    d2 = get_state_command('get_file_transfers', printRaw=printRaw, projects=d1)
+def get_state(printRaw=False, connection=None):
+    if connection is None:
+        with Connection() as connection:
+            return get_state(printRaw=printRaw, connection=connection)
+
+    d1 = get_state_command('get_state', printRaw=printRaw, connection=connection)
+    d2 = get_state_command('get_file_transfers', printRaw=printRaw, projects=d1,
+                           connection=connection)
     return d2
 
+class IncrementalState(object):
+    """Keeps the projects dictionary from get_state up to date with the lighter
+    get_results, get_project_status and get_file_transfers rpcs.
+    The Project, Application and Task objects are updated in place,
+    a full get_state is only done for the first update and whenever
+    an unknown task (and thereby workunit or application) or project shows up.
+    Only the active tasks are fetched, all the tasks are fetched when a task
+    is no longer active (it finished, was suspended or is gone).
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.projects = None
+        self.tasks = dict()     # (project url, task name) -> (Application, Task_local)
+        self.active = set()     # keys into self.tasks of the tasks with an active task
+
+    def update(self):
+        """Returns a (shallow) copy of the updated projects dictionary"""
+        if self.projects is None:
+            self.fullUpdate()
+        else:
+            try:
+                self.refresh()
+            except KeyError as e:
+                logger.info('%s, doing a full get_state', e)
+                self.fullUpdate()
+        return dict(self.projects)
+
+    def fullUpdate(self):
+        self.projects = get_state(connection=self.connection)
+        self.tasks = dict()
+        for p in self.projects.values():
+            for app in p.applications.values():
+                for t in app.tasks:
+                    self.tasks[(p.url, t.name)] = (app, t)
+        self.active = set(key for key, (app, t) in self.tasks.items() if t.active != -1)
+
+    def refresh(self):
+        self.updateProjectStatus()
+        self.updateFileTransfers()
+        active = self.updateResults(active_only=True)
+        if not(self.active <= active):
+            # A task stopped, so it has most likely finished or been suspended,
+            # fetch all the tasks to see its new state and to drop the reported ones
+            logger.debug('%s no longer active', self.active - active)
+            self.updateResults(active_only=False)
+        self.active = active
+
+    def updateProjectStatus(self):
+        root = self.connection.call('get_project_status')
+        for element in root.iter('project'):
+            url = Project.cleanUrl(element.findtext('master_url'))
+            if url not in self.projects:
+                raise KeyError('Unknown project %s' % url)
+            self.projects[url].updateFromElement(element)
+
+    def updateFileTransfers(self):
+        for p in self.projects.values():
+            p.fileTransfers = list()
+        self.projects = get_state_command('get_file_transfers', projects=self.projects, 
+                                          connection=self.connection)
+
+    def updateResults(self, active_only):
+        """Updates the known tasks in place, returns the set of keys seen.
+        With active_only False, tasks no longer known to boinc are removed."""
+        command = '<get_results>\n<active_only>%d</active_only>\n</get_results>' % active_only
+        root = self.connection.call(command)
+        seen = set()
+        for element in root.iter('result'):
+            url = Project.cleanUrl(element.findtext('project_url'))
+            name = element.findtext('wu_name').replace(' ', '') # same as Task.setName
+            key = (url, name)
+            if key not in self.tasks:
+                raise KeyError('Unknown task %s for %s' % (name, url))
+            app, t = self.tasks[key]
+            t.updateFromElement(element) # the setters invalidate app.tasks
+            seen.add(key)
+
+        if not(active_only):
+            for key in set(self.tasks) - seen:
+                logger.debug('task %s is gone', key)
+                app, t = self.tasks.pop(key)
+                app.tasks.remove(t)
+        return seen
+
 class Parse_state(object):
     def __init__(self, projects=None):
         self.currentBlock = []
@@ -157,13 +565,7 @@ class Parse_state(object):
                 logging.exception('Could not append task to application:')
         elif '</file_transfer>' in line:
             t = Task_fileTransfer.createFromXML("\n".join(self.currentBlock))
-            p = Project(url=t.project_url, name=t.project_name)
-            
-            if not(self.projects.has_key(t.project_url)):
-                logger.debug('Hmm, projects does not have key "%s", %s', t.project_url, self.projects)
-                self.projects[t.project_url] = p
-            logger.debug('appending file_transfer %s', t)
-            self.projects[p.url].fileTransfers.append(t)
+            self.appendFileTransfer(t)
         else:
             reset = False
 
@@ -174,6 +576,85 @@ class Parse_state(object):
         if self.inBlock:
             self.currentBlock.append(line.strip())
 
+    def appendFileTransfer(self, t):
+        p = Project(url=t.project_url, name=t.project_name)
+
+        if not(p.url in self.projects):
+            logger.debug('Hmm, projects does not have key "%s", %s', p.url, self.projects)
+            self.projects[p.url] = p
+        logger.debug('appending file_transfer %s', t)
+        self.projects[p.url].fileTransfers.append(t)
+
+class Parse_stateStream(Parse_state):
+    """Single pass version of Parse_state.
+    Instead of collecting each block and handing it to BeautifulSoup,
+    the reply is fed to an incremental xml.etree parser and the
+    Project, Application and Task objects are created directly from the elements.
+    Raises xml.etree.ElementTree.ParseError on malformed xml, use Parse_state for those.
+    The parser is an ElementTree.XMLParser with this object as the target (see start, data and end),
+    which works on python 2.7 as well as 3.
+    """
+    blocks = ('project', 'app', 'workunit', 'result', 'file_transfer')
+
+    def __init__(self, projects=None):
+        super(Parse_stateStream, self).__init__(projects)
+        self.builder = ElementTree.TreeBuilder()
+        self.parser = ElementTree.XMLParser(target=self)
+        self.stack = list()     # currently open elements
+
+    def feed(self, line):
+        """Expects a single line of the reply, without the newline"""
+        self.feedRaw(line + '\n')
+
+    def feedRaw(self, data):
+        """Expects any chunk (str, bytes or memoryview) of the reply, chunks may split lines and tags"""
+        if bytes is str and isinstance(data, memoryview): # python 2.7 expat only takes strings
+            data = data.tobytes()
+        self.parser.feed(data)
+
+    # XMLParser target interface
+    def start(self, tag, attrib):
+        element = self.builder.start(tag, attrib)
+        self.stack.append(element)
+        return element
+
+    def data(self, data):
+        self.builder.data(data)
+
+    def end(self, tag):
+        element = self.builder.end(tag)
+        self.stack.pop()
+        # blocks are children of <client_state> or <file_transfers>,
+        # ignore nested elements with the same tag
+        if len(self.stack) == 2 and element.tag in self.blocks:
+            self.handleBlock(element)
+            self.stack[-1].remove(element) # done with it, keep memory usage flat
+        return element
+
+    def close(self):
+        return self.builder.close()
+
+    def handleBlock(self, element):
+        if element.tag == 'project':
+            self.c_proj = Project.createFromElement(element)
+            self.projects[self.c_proj.url] = self.c_proj
+            logger.debug('project %s', self.c_proj)
+        elif element.tag == 'app':
+            self.c_app = self.c_proj.appendApplicationFromElement(element)
+            logger.debug('application %s', self.c_app)
+        elif element.tag == 'workunit':
+            self.c_task = self.c_proj.appendWorkunitFromElement(element)
+            logger.debug('task, %s', self.c_task)
+        elif element.tag == 'result':
+            try:
+                t = self.c_proj.appendResultFromElement(element)
+                logger.debug('result, %s', t)
+            except KeyError:
+                logging.exception('Could not append task to application:')
+        elif element.tag == 'file_transfer':
+            t = Task_fileTransfer.createFromElement(element)
+            self.appendFileTransfer(t)
+
 if __name__ == '__main__':
     import argparse
 
@@ -186,16 +667,20 @@ if __name__ == '__main__':
                                                                             'get_cc_status'])
     parser.add_argument('-r', '--raw', action='store_true', help='Print out the raw xml')
     parser.add_argument('--show_empty', action='store_true', help='Show empty projects (no tasks)')
+    parser.add_argument('--fallback', action='store_true', help='Use the BeautifulSoup based parser')
     args = parser.parse_args()
 
     loggerSetup(logging.DEBUG)
     if args.command == 'get_cc_status':
         import config
         _, _, BOINC_DIR = config.set_globals()
-        c = CallBoinccmd(BOINC_DIR, '--get_cc_status')
+        c = callBoinccmd(BOINC_DIR, '--get_cc_status')
         print(c.communicate(returnAll=True))
     else:
+        Parser = None
+        if args.fallback:
+            Parser = Parse_state
         projects = get_state_command(command=args.command,
-                                     printRaw=args.raw)
+                                     printRaw=args.raw, Parser=Parser)
         pretty_print(projects, 
                      show_empty=args.show_empty)
@@ -27,6 +27,7 @@ import os
 import sys
 import re
 import argparse
+import threading
 import logging
 logger = logging.getLogger('boinc.browser')
 # Non-standard python
@@ -34,6 +35,9 @@ import requests
 # This project
 from project import Project, pretty_print
 from parse import HTMLParser
+from manifest import Manifest
+from pageStore import PageStore
+import httpPool
 import my_async
 
 # Helper functions:
@@ -50,88 +54,166 @@ join = os.path.join
 
 class Browser_file(object):
     """Cache aware browser
-    Use self.update() (which is called on init) to read in content from the cache folder
+    Use self.update() (which is called on init) to remove expired content from the cache folder
     then use self.visitURL(...) which returns the content on success or None on failure
     Cache is invalidated and removed based on age
+    The cached files are listed in a manifest.Manifest, so neither lookup nor update walks the cache folder.
+    Page and image contents are kept compressed in a pageStore.PageStore, the manifest maps each url to its digest.
     Using this class directly makes little sense, unless you have the entire updated internet in our cache folder
-    Beware, not thread safe to update
     """
-    def __init__(self, CACHE_DIR, removeOld=True, removeOldAge=1):
-        """removeOld should be set to False for testing"""
+    # extension -> ttl class, files with other extensions (like the cookie pickles) are never removed
+    ttlClasses = {'.html': 'page', '.xml': 'page', '.json': 'page',
+                  '.jpg': 'image', '.png': 'image'} # images never expire
+    staleAge = 30               # days an expired file is kept for revalidation
+    def __init__(self, CACHE_DIR, removeOld=True, removeOldAge=1, manifest='cache_manifest.sqlite'):
+        """removeOld should be set to False for testing, 
+        manifest is the filename in CACHE_DIR, None keeps it in memory"""
         self.removeOldAge = removeOldAge
         self.cacheDir = CACHE_DIR
         self.removeOld = removeOld
+        self.manifest = Manifest(CACHE_DIR, filename=manifest)
+        self.store = PageStore(CACHE_DIR)
+        self.lock = threading.Lock() # a write or remove may share page store content with other urls
+        if self.manifest.created:
+            self.manifest.scan(tuple(self.ttlClasses), self.ttlClass)
         self.update()
 
-    def add(self, filename):
-        #logger.debug('Adding %s to valid cache', filename)
-        self.cache[filename] = None
+    def ttlClass(self, filename):
+        if 'show_host_detail' in filename:
+            # host page is unlikely to change that often
+            return 'host'
+        return self.ttlClasses.get(os.path.splitext(filename)[1], None)
+
+    def maxAge(self):
+        """ttl class -> seconds before a file is revalidated (or removed if there is nothing to revalidate with)"""
+        # Currently the workunit page is only used for project name, 
+        # which will never change. Could be set to 30 days so that the file will eventually be cleaned
+        return dict(page=self.removeOldAge*60*60,
+                    host=90*24*60*60) # Set to 90 days so that the file will eventually be cleaned
+
+    def write(self, URL, content, extension='', etag=None, modified=None):
+        """Caches content for URL and returns the filename it is listed under in the manifest.
+        Content with a ttl class goes to the compressed page store, where identical content is kept once,
+        other files (like the cookie pickles) are written as is since they are read directly."""
+        filename = self.filename(URL, extension)
+        ttl = self.ttlClass(filename)
+        with self.lock:
+            previous = self.manifest.get(filename)
+            if ttl is None:
+                with open(filename, 'bw') as f:
+                    f.write(content)
+                digest = None
+            else:
+                digest = self.store.put(content)
+            #logger.debug('Adding %s to valid cache', filename)
+            self.manifest.add(filename, url=URL, size=len(content), ttl=ttl,
+                              etag=etag, modified=modified, digest=digest)
+            if previous is not None and previous[6] != digest:
+                self.discard(filename, previous[6])
+        return filename
+
+    def discard(self, filename, digest):
+        """Removes the content of filename, which is no longer (or never was) in the manifest"""
+        if digest is None:
+            if os.path.exists(filename):
+                os.remove(filename)
+        elif not(self.manifest.referenced(digest)):
+            self.store.remove(digest)
+
     def remove(self, filename):
         logger.info('Removing old cache %s', filename)
-        try:
-            os.remove(filename)
-        except:
-            logger.exception('Unable to clean up old cach file %s', filename)
-
-    def fileAge(self, filename):
-        fileChanged = os.path.getmtime(filename)
-        age = (self.now - fileChanged)/(60*60) # age of file in hours
-        #logger.debug('%s is %.3g h old', filename, age)
-        return age
-    
+        with self.lock:
+            entry = self.manifest.get(filename)
+            self.manifest.remove(filename)
+            if entry is not None and entry[6] is not None:
+                self.discard(filename, entry[6])
+                return
+            try:
+                os.remove(filename)
+            except:
+                logger.exception('Unable to clean up old cach file %s', filename)
+
     def update(self):
-        self.cache = dict()
+        """Removes the expired files, only the manifest is queried.
+        Expired files with an ETag or Last-Modified are kept for revalidation (see BrowserSuper.visitURL)
+        until they are staleAge days old."""
         self.now = time.time()
-        for filename in self.findCacheFiles(('.html', '.xml', '.json')):
-            age = self.fileAge(filename)
-            oldAge = self.removeOldAge
-            # if 'workunit' in filename:
-            #     # Currently the workunit page is only used for project name, 
-            #     # which will never change. Set to 30 days so that the file will eventually be cleaned
-            #     oldAge = 30*24
-            if 'show_host_detail' in filename:
-                # host page is unlikely to change that often
-                # Set to 90 days so that the file will eventually be cleaned
-                oldAge = 90*24
-                
-            if not(self.removeOld) or age < oldAge:
-                self.add(filename)
-            else:
+        if not(self.removeOld):
+            return
+        for ttl, maxAge in self.maxAge().items():
+            for filename in self.manifest.expired(ttl, maxAge, now=self.now, validated=False):
+                self.remove(filename)
+            for filename in self.manifest.expired(ttl, max(maxAge, self.staleAge*24*60*60), now=self.now):
                 self.remove(filename)
 
-        for filename in self.findCacheFiles(('.jpg', '.png')): # These never expire
-            self.add(filename)
-        
-    def findCacheFiles(self, extension):#htmlCache(self):
-        for root, dirs, files in os.walk(self.cacheDir):
-            for f in files:
-                if f.endswith(extension):
-                    yield join(root, f)
+    def filename(self, URL, extension='.html'):
+        return join(self.cacheDir, sanitizeURL(URL)) + extension
+
+    def fresh(self, entry):
+        """True if the manifest entry is younger than the maxAge of its ttl class"""
+        if not(self.removeOld):
+            return True
+        fetched, ttl = entry[2], entry[3]
+        maxAge = self.maxAge().get(ttl)
+        return maxAge is None or time.time() - fetched < maxAge
+
+    def read(self, filename, entry):
+        try:
+            if entry[6] is None:
+                return readFile(filename) # from before the page store
+            return self.store.get(entry[6])
+        except IOError:
+            logger.warning('Cached file %s has gone missing', filename)
+            self.manifest.remove(filename)
+            return None
 
     def visitURL(self, URL, extension='.html'):
-        """Returns content if the site is in cache, None otherwise."""
-        filename = join(self.cacheDir, sanitizeURL(URL)) + extension
-        if filename in self.cache:
+        """Returns content if the site is in cache and fresh, None otherwise."""
+        filename = self.filename(URL, extension)
+        entry = self.manifest.get(filename)
+        if entry is not None and self.fresh(entry):
             logger.debug('Getting from cache %s, %s', URL, filename)
-            return readFile(filename)
-        else:
+            return self.read(filename, entry)
+        return None
+
+    def validators(self, URL, extension='.html'):
+        """Conditional request headers for the cached (stale) URL, empty if there is nothing to revalidate"""
+        headers = dict()
+        entry = self.manifest.get(self.filename(URL, extension))
+        if entry is not None:
+            etag, modified = entry[4], entry[5]
+            if etag is not None:
+                headers['If-None-Match'] = etag
+            if modified is not None:
+                headers['If-Modified-Since'] = modified
+        return headers
+
+    def notModified(self, URL, extension='.html'):
+        """The server replied 304 Not Modified, starts a new ttl for the cached file and returns its content"""
+        filename = self.filename(URL, extension)
+        entry = self.manifest.get(filename)
+        if entry is None:
             return None
+        content = self.read(filename, entry)
+        if content is not None:
+            self.manifest.touch(filename)
+        return content
 
     def removeURL(self, URL, extension='.html'):
         """If you visit a task page that errors out, 
         call this to remove the page from cache to try again."""
-        filename = join(self.cacheDir, sanitizeURL(URL)) + extension
-        self.remove(filename)
+        self.remove(self.filename(URL, extension))
 
 class BrowserSuper(object):
     # Browser for visiting the web, use subclass to actually connect somewhere
     # Subclass must define self.URL, self.loginInfo, self.loginPage and self.section
     # or use the visitURL function directly
     def __init__(self, browser_cache):
-        self.visitedPages = list()
+        self.visitedPages = set()
+        self.visitedLock = threading.Lock() # visit is called from the parse.HTMLParser.fetchPages threads
         self.browser_cache = browser_cache # address of cache class
         self.removeURL = self.browser_cache.removeURL
-        self.client = requests.session()
+        self.client = httpPool.session() # own cookies, shared connections and rate limit
         self.update()
 
     def update(self):
@@ -151,12 +233,12 @@ class BrowserSuper(object):
         except AttributeError:          # Raised when self.name is not defined, meaning we iniated BrowserSuper directly
             return None
 
-    def writeFile(self, URL, content, extension=''):
-        filename = join(self.browser_cache.cacheDir, sanitizeURL(URL)) + extension
-        with open(filename, 'bw') as f:
-            f.write(content)
-        self.browser_cache.add(filename)
-        return filename
+    def writeFile(self, URL, content, extension='', headers=None):
+        """headers are the response headers, the ETag and Last-Modified are kept for revalidation"""
+        if headers is None:
+            headers = dict()
+        return self.browser_cache.write(URL, content, extension=extension,
+                                        etag=headers.get('ETag'), modified=headers.get('Last-Modified'))
 
     def authenticate(self):
         try:
@@ -177,8 +259,9 @@ class BrowserSuper(object):
         # Visit task page
         URL = self.URL.format(page)
         
-        if URL in self.visitedPages: return ''
-        self.visitedPages.append(URL)
+        with self.visitedLock:
+            if URL in self.visitedPages: return ''
+            self.visitedPages.add(URL)
 
         return self.visitURL(URL, **kwargs)
 
@@ -205,8 +288,9 @@ class BrowserSuper(object):
         if content == None:
             logger.info('Visiting %s', URL)
 
+            headers = self.browser_cache.validators(URL, extension)
             try:
-                r = self.client.get(URL, timeout=timeout)
+                r = self.client.get(URL, timeout=timeout, headers=headers)
             except requests.ConnectionError:
                 print('Could not connect to {0}'.format(URL))
                 return ''
@@ -220,6 +304,14 @@ class BrowserSuper(object):
                 print('Uncaught exception for {}. {}'.format(URL, e))
                 return ''
 
+            if r.status_code == 304:
+                content = self.browser_cache.notModified(URL, extension)
+                if content is not None:
+                    logger.info('Not modified %s', URL)
+                    return content
+                # The cached file is gone (and dropped from the manifest), ask again without the validators
+                return self.visitURL(URL, recursionCall, extension=extension, timeout=timeout)
+
             if self.redirected(r):
                 if not(recursionCall):
                     logger.info('Seem to have been redirected, trying to authenticate first. %s', r.url)
@@ -230,7 +322,7 @@ class BrowserSuper(object):
                     return ''
                 
             content = r.content
-            self.writeFile(URL, content, extension=extension)
+            self.writeFile(URL, content, extension=extension, headers=r.headers)
         return content
 
     def getParser(self, project=None):
@@ -263,9 +355,15 @@ class BrowserSuper(object):
         return 'https://' + ret
 
 class Browser_worldcommunitygrid(BrowserSuper):
-    def __init__(self, browser_cache, CONFIG):
+    defaultPageSize = 250       # results per request, the api used to be called with 25
+    def __init__(self, browser_cache, CONFIG, pageSize=None):
+        """pageSize is the number of results per request,
+        default is the page_size option of the worldcommunitygrid.org section or defaultPageSize"""
         BrowserSuper.__init__(self, browser_cache)
         self.CONFIG = CONFIG
+        if pageSize is None and CONFIG.has_option('worldcommunitygrid.org', 'page_size'):
+            pageSize = CONFIG.get('worldcommunitygrid.org', 'page_size')
+        self.pageSize = int(pageSize or self.defaultPageSize)
         username = self.CONFIG.get('worldcommunitygrid.org', 'username')
         password = CONFIG.getpassword('worldcommunitygrid.org', 'username'),
         code = self.CONFIG.get('worldcommunitygrid.org', 'code')
@@ -274,7 +372,7 @@ class Browser_worldcommunitygrid(BrowserSuper):
         #name = 'https://secure.worldcommunitygrid.org' # todo: override property in superclass?
         name = 'https://www.worldcommunitygrid.org' # Moved
         self.URL = name+'/api/members/{username}/results?code={code}&json=true'.format(username=username, code=code)
-        self.URL = self.URL + '&limit=25&offset={offset}'
+        self.URL = self.URL + '&limit={limit}&offset={offset}'
         self.statistics = name+'/verifyMember.do?name={username}&code={code}&xml=true'.format(username=username, code=code)
         # self.URL = self.name +\
         #            '/ms/viewBoincResults.do?filterDevice=0&filterStatus=-1&projectId=-1&pageNum={0}&sortBy=sentTime'
@@ -290,12 +388,14 @@ class Browser_worldcommunitygrid(BrowserSuper):
         page = self.visitURL(self.statistics, extension='.xml')
         return page
 
-    def visit(self, page=1, **kwargs):
-        # Visit task page
-        URL = self.URL.format(offset=25*(page-1)) # page = 1 gives offest 0, page = 2 gives offset 25, ...
+    def visit(self, offset=0, **kwargs):
+        # Visit task page, asking for pageSize results from offset.
+        # The server may return fewer, see parse.HTMLParser_worldcommunitygrid.getRows
+        URL = self.URL.format(limit=self.pageSize, offset=offset)
         
-        if URL in self.visitedPages: return ''
-        self.visitedPages.append(URL)
+        with self.visitedLock:
+            if URL in self.visitedPages: return ''
+            self.visitedPages.add(URL)
 
         return self.visitURL(URL, extension='.json', **kwargs)
 
@@ -393,6 +493,7 @@ if __name__ == '__main__':
     args = parser.parse_args()
     
     CONFIG, CACHE_DIR, _ = config.set_globals()
+    httpPool.configure(CONFIG)
     browser_cache = Browser_file(CACHE_DIR)
     
     if args.section == 'all':
@@ -60,14 +60,23 @@ class Prefs(object):
             self.changePrefsFile(name, 100)
 
         
-def changePrefs(BOINC_DIR, a, value=None):
+def readPrefs(BOINC_DIR, connection=None, binary=False):
+    # Tells boinc to read the global_prefs_override.xml, see boinccmd.callBoinccmd
+    # Without a connection (and binary) one is opened and closed again
+    if connection is None and not(binary):
+        with boinccmd.Connection(password=boinccmd.readPassword(BOINC_DIR)) as connection:
+            return boinccmd.callBoinccmd(BOINC_DIR, '--read_global_prefs_override',
+                                         connection=connection)
+    return boinccmd.callBoinccmd(BOINC_DIR, '--read_global_prefs_override',
+                                 connection=connection, binary=binary)
+
+def changePrefs(BOINC_DIR, a, value=None, connection=None, binary=False):
     # Convenient function for changing a preference
     # If value is None simply return current value
     prefs = Prefs(BOINC_DIR)
     if value != None:
         prefs.changePrefsFile(a, value)
-        p = boinccmd.CallBoinccmd(BOINC_DIR, '--read_global_prefs_override')
-        p.communicate()
+        readPrefs(BOINC_DIR, connection=connection, binary=binary).communicate()
     return prefs.tree.find(a).text
 
 def getParser(p):
@@ -84,7 +93,10 @@ def run():
     p = Prefs(BOINC_DIR)
 
     parser = getParser(p)
+    parser.add_argument('--boinccmd_binary', action='store_true',
+                        help='Use the boinccmd binary, default is to talk to boinc directly')
     args = parser.parse_args()
+    binary = args.__dict__.pop('boinccmd_binary')
 
     # For each argument:
     changed = False
@@ -96,7 +108,7 @@ def run():
 
     if changed:
         # Upate
-        boinccmd.CallBoinccmd(BOINC_DIR, '--read_global_prefs_override').communicate()
+        readPrefs(BOINC_DIR, binary=binary).communicate()
     #toggleCPUusage().communicate()
     
 if __name__ == '__main__':
@@ -33,6 +33,7 @@ class MyConfigParser(configparser.ConfigParser):
     def __init__(self, filename):
         self.filename = filename
         self.path = os.path.dirname(filename)
+        self.passwords = dict() # (section, name) -> password from the keyring, see getpassword
         configparser.ConfigParser.__init__(self)
         self.read()
 
@@ -61,17 +62,29 @@ class MyConfigParser(configparser.ConfigParser):
         logger.debug('Written %s %s to config file %s', section, name, self.filename)
 
     def getpassword(self, section, name):
+        # The keyring is only asked once, as it may prompt on the terminal to be unlocked, see loadPasswords
+        key = (section, name)
+        if key in self.passwords:
+            return self.passwords[key]
         username = self.get(section, name) # say the name is 'username' then username from config file will be returned
         if username != None:
             name = username
-        return keyring.get_password(section, name)
+        self.passwords[key] = keyring.get_password(section, name)
+        return self.passwords[key]
 
     def setpassword(self, section, name, password):
+        self.passwords.pop((section, name), None)
         username = self.get(section, name)
         if username != None:
             name = username
         keyring.set_password(section, name, password)
 
+    def loadPasswords(self):
+        # Gets the password of each project from the keyring, call this on the main thread
+        # before a background refresh so that any keyring prompt is not mixed with other output
+        for section in self.projects():
+            self.getpassword(section, 'username')
+
     def projects(self):
         sections = list()
         for section in self.sections():
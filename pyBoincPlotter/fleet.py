@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""Polls the state of many boinc clients concurrently using asyncio.
+Needs python 3.5 or newer (async/await), unlike the rest of the project this module
+can not be imported on python 2.7, check sys.version_info >= requiredVersion before importing it.
+"""
+# Standard python
+import asyncio
+import xml.etree.ElementTree as ElementTree
+import logging
+logger = logging.getLogger('boinc.fleet')
+# This project
+import boinccmd
+from project import pretty_print
+
+defaultPort = 31416
+requiredVersion = (3, 5)
+
+def splitTarget(target):
+    """'host:port', 'host', '[ipv6]:port' or '[ipv6]' -> (host, port),
+    raises ValueError for a port that is not a number"""
+    if target.startswith('['):
+        host, _, port = target[1:].partition(']')
+        port = port[1:]         # skip the ':'
+    elif target.count(':') > 1: # ipv6 address without brackets, no port
+        host, port = target, ''
+    else:
+        host, sep, port = target.rpartition(':')
+        if sep == '':
+            host = port
+            port = ''
+    if port == '':
+        return host, defaultPort
+    return host, int(port)
+
+class Client(object):
+    """Asyncio version of boinccmd.Boinccmd/Connection for a single host"""
+    def __init__(self, target, password=None):
+        self.target = target
+        self.addr, self.portNr = splitTarget(target)
+        self.password = password
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.addr, self.portNr)
+        if self.password:
+            await self.authorize()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    async def request(self, command, feed):
+        """Sends command and calls feed with each chunk of the reply (without the \\003 end mark)"""
+        self.writer.write(boinccmd.formatRequest(command))
+        await self.writer.drain()
+        while True:
+            chunk = await self.reader.read(65536)
+            if len(chunk) == 0:
+                raise ConnectionError('Connection closed by boinc at "%s" before end of reply' % self.target)
+            ix = chunk.find(b'\003')
+            if ix != -1:
+                feed(chunk[:ix])
+                return
+            feed(chunk)
+
+    async def requestAll(self, command):
+        """Returns the complete reply as bytes"""
+        reply = bytearray()
+        await self.request(command, reply.extend)
+        return bytes(reply)
+
+    async def authorize(self):
+        reply = await self.requestAll('auth1')
+        nonce = ElementTree.fromstring(reply).findtext('nonce')
+        reply = await self.requestAll(boinccmd.authRequest(nonce, self.password))
+        if ElementTree.fromstring(reply).find('authorized') is None:
+            raise boinccmd.RpcError('boinc at "%s" did not accept the GUI RPC password' % self.target)
+
+    def parse(self, command, reply, projects=None):
+        """Parses the complete reply, same as boinccmd.get_state_command"""
+        parser = boinccmd.Parse_stateStream(projects)
+        try:
+            parser.feedRaw(reply)
+        except ElementTree.ParseError as e:
+            logger.warning('Could not parse %s reply from "%s" as xml, "%s", trying again with fallback parser',
+                           command, self.target, e)
+            parser = boinccmd.Parse_state(projects)
+            for line in reply.decode().split('\n'):
+                parser.feed(line)
+        return parser.projects
+
+    async def get_state_command(self, command, projects=None):
+        """Same as boinccmd.get_state_command. The reply is parsed on the default executor,
+        so that the event loop is free to receive from the other hosts in the meantime."""
+        reply = await self.requestAll(command)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.parse, command, reply, projects)
+
+    async def get_state(self):
+        """Same as boinccmd.get_state, but each task has the host as device"""
+        await self.connect()
+        try:
+            projects = await self.get_state_command('get_state')
+            projects = await self.get_state_command('get_file_transfers', projects)
+        finally:
+            self.close()
+
+        for p in projects.values():
+            for task in p.tasks():
+                task.setDevice(self.addr)
+        return projects
+
+async def pollHost(target, timeout, password=None):
+    client = None
+    try:
+        client = Client(target, password=password)
+        return await asyncio.wait_for(client.get_state(), timeout)
+    except asyncio.TimeoutError:
+        logger.error('Timed out after %s s waiting for boinc at "%s"', timeout, target)
+    except Exception as e:
+        logger.error('Could not get state from boinc at "%s", %s', target, e)
+    finally:
+        if client is not None:
+            client.close()
+
+async def pollAll(targets, timeout=10, password=None):
+    def getPassword(target):
+        if isinstance(password, dict):
+            return password.get(target)
+        return password
+
+    replies = await asyncio.gather(*[pollHost(target, timeout, getPassword(target))
+                                     for target in targets])
+    hosts = dict()
+    for target, projects in zip(targets, replies):
+        if projects is not None:
+            hosts[target] = projects
+    return hosts
+
+def poll(targets, timeout=10, password=None):
+    """Gets the state of each boinc client in targets, given as 'host:port' or 'host', concurrently.
+    Returns a dictionary where key is the target and value is the usual projects dictionary,
+    hosts that could not be reached within timeout seconds are left out (and logged).
+    password is either a single GUI RPC password for all hosts or a dictionary with target as key.
+    """
+    loop = asyncio.new_event_loop() # not asyncio.run, which needs python 3.7
+    try:
+        return loop.run_until_complete(pollAll(targets, timeout=timeout, password=password))
+    finally:
+        loop.close()
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from loggerSetup import loggerSetup
+
+    parser = argparse.ArgumentParser(description='Polls the state of several boinc clients')
+    parser.add_argument('targets', nargs='+', help='host or host:port of each boinc client')
+    parser.add_argument('--timeout', default=10, type=float, help='Seconds to wait for each host')
+    parser.add_argument('--password', help='GUI RPC password, same for all hosts')
+    parser.add_argument('--password_file', help='Read the GUI RPC password from file (like gui_rpc_auth.cfg)')
+    parser.add_argument('--show_empty', action='store_true', help='Show empty projects (no tasks)')
+    args = parser.parse_args()
+
+    loggerSetup(logging.INFO)
+    password = args.password
+    if args.password_file:
+        with open(args.password_file, 'r') as f:
+            password = f.read().strip()
+
+    start = time.time()
+    hosts = poll(args.targets, timeout=args.timeout, password=password)
+    for target in args.targets:
+        if target in hosts:
+            print('==== {} ===='.format(target))
+            pretty_print(hosts[target], show_empty=args.show_empty)
+    logger.info('Polled %s of %s hosts in %.3g s', len(hosts), len(args.targets), time.time() - start)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Process wide http connection pool with a request rate limit per host, see session().
+"""
+# Standard python imports
+import time
+import threading
+import logging
+logger = logging.getLogger('boinc.httpPool')
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+# non standard:
+import requests
+from requests.adapters import HTTPAdapter
+
+# Defaults, overridden by the [configuration] options max_connections, requests_per_second and burst
+MAX_CONNECTIONS = 4             # per host, matches parse.HTMLParser.maxWorkers
+REQUESTS_PER_SECOND = None      # per host, None or 0 for no limit (the default, opt in with requests_per_second)
+BURST = MAX_CONNECTIONS         # requests a host may get at once after a pause
+
+class TokenBucket(object):
+    """
+    Allows rate requests per second on average and up to burst at once.
+    acquire() takes a token, a thread that finds the bucket empty reserves the next token
+    and sleeps outside the lock, so waiting threads are let through in turn.
+    """
+    def __init__(self, rate, burst=1, clock=time.time, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self.last = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request is allowed, returns the seconds waited"""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.last)*self.rate)
+            self.last = now
+            wait = 0
+            if self.tokens < 1:
+                wait = (1 - self.tokens)/self.rate
+            self.tokens -= 1
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+class RateLimiter(object):
+    """One TokenBucket per host name"""
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = dict()
+        self.lock = threading.Lock()
+
+    def bucket(self, host):
+        with self.lock:
+            try:
+                return self.buckets[host]
+            except KeyError:
+                b = TokenBucket(self.rate, self.burst)
+                self.buckets[host] = b
+                return b
+
+    def acquire(self, url):
+        if not(self.rate):
+            return 0
+        host = urlparse(url).hostname
+        wait = self.bucket(host).acquire()
+        if wait > 0:
+            logger.debug('Rate limited %s, waited %.2g s', host, wait)
+        return wait
+
+class LimitedAdapter(HTTPAdapter):
+    """HTTPAdapter which asks the RateLimiter before every request (including redirects and logins)"""
+    def __init__(self, limiter=None, **kwargs):
+        self.limiter = limiter
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def send(self, request, **kwargs):
+        if self.limiter is not None:
+            self.limiter.acquire(request.url)
+        return HTTPAdapter.send(self, request, **kwargs)
+
+def createAdapter(maxConnections=MAX_CONNECTIONS, rate=REQUESTS_PER_SECOND, burst=BURST):
+    # pool_block makes a thread wait for a free connection rather than opening (and dropping) an extra one
+    limiter = None
+    if rate:
+        limiter = RateLimiter(rate, burst)
+    return LimitedAdapter(limiter=limiter,
+                          pool_connections=20, pool_maxsize=maxConnections, pool_block=True)
+
+_adapter = None
+_lock = threading.Lock()
+
+def configure(CONFIG=None, **kwargs):
+    """Sets up the process wide adapter from the [configuration] section of CONFIG,
+    keyword arguments (maxConnections, rate, burst) take precedence.
+    Sessions created before this call keep the previous adapter."""
+    global _adapter
+    options = dict(maxConnections=('max_connections', int),
+                   rate=('requests_per_second', float),
+                   burst=('burst', int))
+    for key, (option, convert) in options.items():
+        if key not in kwargs and CONFIG is not None and CONFIG.has_option('configuration', option):
+            try:
+                kwargs[key] = convert(CONFIG.get('configuration', option))
+            except ValueError as e:
+                logger.warning('Ignoring configuration %s, %s', option, e)
+    with _lock:
+        _adapter = createAdapter(**kwargs)
+    return _adapter
+
+def adapter():
+    """The process wide adapter, with the default limits unless configure has been called"""
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = createAdapter()
+        return _adapter
+
+def session():
+    """A requests session (own cookies) sharing the connection pool and rate limits of every other session"""
+    s = requests.session()
+    a = adapter()
+    s.mount('http://', a)
+    s.mount('https://', a)
+    return s
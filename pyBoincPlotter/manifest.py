@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Index of the files in the cache folder, see Manifest.
+"""
+# Standard python imports
+import os
+import time
+import sqlite3
+import threading
+import logging
+logger = logging.getLogger('boinc.manifest')
+
+class Manifest(object):
+    """
+    Sqlite table of the cached files with url, size, fetch time, ttl class, http validators
+    and the digest of the content in pageStore.PageStore (None for a plain file),
+    so that browser.Browser_file can look up a file and find the expired ones
+    without walking and stat'ing the cache folder.
+    Filenames are stored relative to the cache folder.
+    A second table keeps the scraping watermark of each project, see watermark.Watermark.
+    Pass filename=None for an in memory manifest.
+    """
+    def __init__(self, cacheDir, filename='cache_manifest.sqlite'):
+        self.cacheDir = cacheDir
+        self.lock = threading.Lock() # the browsers may add files from several threads
+        if filename is None:
+            path = ':memory:'
+            self.created = True
+        else:
+            path = os.path.join(cacheDir, filename)
+            self.created = not(os.path.exists(path))
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS files '
+                        '(filename TEXT PRIMARY KEY, url TEXT, size INTEGER, fetched REAL, ttl TEXT, '
+                        'etag TEXT, modified TEXT, digest TEXT)')
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(files)')]
+        for column in ('etag', 'modified', 'digest'): # manifests from before the http validators and page store
+            if column not in columns:
+                self.db.execute('ALTER TABLE files ADD COLUMN %s TEXT' % column)
+        self.db.execute('CREATE INDEX IF NOT EXISTS files_ttl ON files (ttl, fetched)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS files_digest ON files (digest)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS watermarks (project TEXT PRIMARY KEY, saved REAL, data BLOB)')
+        self.db.commit()
+
+    def relative(self, filename):
+        if os.path.isabs(filename):
+            return os.path.relpath(filename, self.cacheDir)
+        return filename
+
+    def add(self, filename, url=None, size=None, fetched=None, ttl=None, etag=None, modified=None, digest=None):
+        """etag and modified are the ETag and Last-Modified response headers, if any"""
+        if fetched is None:
+            fetched = time.time()
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (self.relative(filename), url, size, fetched, ttl, etag, modified, digest))
+            self.db.commit()
+
+    def touch(self, filename, fetched=None):
+        """Sets a new fetch time, like when the server says the file is not modified"""
+        if fetched is None:
+            fetched = time.time()
+        with self.lock:
+            self.db.execute('UPDATE files SET fetched = ? WHERE filename = ?',
+                            (fetched, self.relative(filename)))
+            self.db.commit()
+
+    def remove(self, filename):
+        with self.lock:
+            self.db.execute('DELETE FROM files WHERE filename = ?', (self.relative(filename), ))
+            self.db.commit()
+
+    def __contains__(self, filename):
+        with self.lock:
+            row = self.db.execute('SELECT 1 FROM files WHERE filename = ?',
+                                  (self.relative(filename), )).fetchone()
+        return row is not None
+
+    def get(self, filename):
+        """Returns (url, size, fetched, ttl, etag, modified, digest) or None"""
+        with self.lock:
+            return self.db.execute('SELECT url, size, fetched, ttl, etag, modified, digest FROM files '
+                                   'WHERE filename = ?',
+                                   (self.relative(filename), )).fetchone()
+
+    def referenced(self, digest):
+        """True if any file has the digest"""
+        with self.lock:
+            row = self.db.execute('SELECT 1 FROM files WHERE digest = ? LIMIT 1', (digest, )).fetchone()
+        return row is not None
+
+    def expired(self, ttl, maxAge, now=None, validated=None):
+        """List of the (absolute) filenames of the ttl class fetched more than maxAge seconds ago.
+        validated=False only lists the files without an etag or modified time, True only those with."""
+        if now is None:
+            now = time.time()
+        query = 'SELECT filename FROM files WHERE ttl = ? AND fetched < ?'
+        args = [ttl, now - maxAge]
+        if validated is not None:
+            query += ' AND (etag IS NOT NULL OR modified IS NOT NULL) = ?'
+            args.append(bool(validated))
+        with self.lock:
+            rows = self.db.execute(query, args).fetchall()
+        return [os.path.join(self.cacheDir, row[0]) for row in rows]
+
+    def scan(self, extensions, ttlClass):
+        """Adds the existing files with one of the extensions, using the modification time as fetch time.
+        Only needed once, when the manifest is created for an existing cache folder."""
+        rows = list()
+        for root, dirs, files in os.walk(self.cacheDir):
+            for f in files:
+                if f.endswith(extensions):
+                    filename = os.path.join(root, f)
+                    stat = os.stat(filename)
+                    rows.append((self.relative(filename), None, stat.st_size, stat.st_mtime, ttlClass(filename),
+                                 None, None, None))
+        logger.info('Adding %d existing files to the cache manifest', len(rows))
+        with self.lock:
+            self.db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.db.commit()
+
+    def setWatermark(self, project, data):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)',
+                            (project, time.time(), sqlite3.Binary(data)))
+            self.db.commit()
+
+    def getWatermark(self, project):
+        """Returns the data stored by setWatermark, or None"""
+        with self.lock:
+            row = self.db.execute('SELECT data FROM watermarks WHERE project = ?', (project, )).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0])
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Compressed and content addressed storage of the cached pages, see PageStore.
+"""
+# Standard python imports
+import os
+import zlib
+import hashlib
+import logging
+logger = logging.getLogger('boinc.pageStore')
+
+class PageStore(object):
+    """
+    Folder of zlib compressed bodies named by the sha1 of the uncompressed content,
+    so identical pages and images fetched from different urls are stored once.
+    The url -> digest map is kept by manifest.Manifest,
+    it is up to the caller to remove a body once no url refers to it.
+    """
+    suffix = '.z'
+    def __init__(self, cacheDir, folder='pages', level=6):
+        self.directory = os.path.join(cacheDir, folder)
+        self.level = level
+
+    def digest(self, content):
+        return hashlib.sha1(content).hexdigest()
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest + self.suffix)
+
+    def put(self, content):
+        """Stores content (bytes) unless it is already there, returns the digest"""
+        digest = self.digest(content)
+        filename = self.path(digest)
+        if not(os.path.exists(filename)):
+            if not(os.path.isdir(self.directory)):
+                os.makedirs(self.directory)
+            tmp = '%s.%d.tmp' % (filename, os.getpid())
+            with open(tmp, 'wb') as f:
+                f.write(zlib.compress(content, self.level))
+            if os.path.exists(filename):
+                os.remove(tmp)          # written in the meantime, same content
+            else:
+                os.rename(tmp, filename)
+        return digest
+
+    def get(self, digest):
+        """Returns the uncompressed content, raises IOError if it is missing or damaged"""
+        with open(self.path(digest), 'rb') as f:
+            compressed = f.read()
+        try:
+            return zlib.decompress(compressed)
+        except zlib.error as e:
+            raise IOError('Damaged cache page %s, %s' % (digest, e))
+
+    def remove(self, digest):
+        try:
+            os.remove(self.path(digest))
+        except OSError:
+            logger.exception('Unable to clean up cached page %s', digest)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
@@ -32,8 +32,11 @@ import task
 import plot.badge as badge
 import statistics
 import project
+from watermark import Watermark
+from workerPool import WorkerPool
 
 class HTMLParser(object):
+    maxWorkers = 4              # additional pages fetched in parallel, see fetchPages
     def __init__(self, browser, p=None):
         self.Task = task.Task_web
         self.wantedLength = 10  # wanted length of task data
@@ -84,20 +87,57 @@ class HTMLParser(object):
 
     def parse(self, content):
         """Fills up the self.project with applications and tasks
-        Assumes the application name is the last column"""
-        for row in self.getRows(content):
-            try:
-                t = self.Task.createFromHTML(row[:-1])
-            except Exception as e:
-                self.logger.exception('Unable to parse %s as task: "%s"', row, e)
-                continue
+        Assumes the application name is the last column.
+        Stops at the first task with an old deadline, or at the first page below the watermark
+        of the previous parse (see watermark.Watermark) where the stored tasks are used for the rest."""
+        mark = self.loadWatermark()
+        ahead = None
+        if len(mark) != 0:
+            ahead = 1           # most likely only one or two pages are needed
+        listing = list()        # (application name, task)
+        for rows in self.getPages(content, ahead=ahead):
+            tasks = list()
+            for row in rows:
+                try:
+                    t = self.Task.createFromHTML(row[:-1])
+                except Exception as e:
+                    self.logger.exception('Unable to parse %s as task: "%s"', row, e)
+                    continue
+                tasks.append((row[-1], t))
+
+            if mark.covers([t for app, t in tasks]):
+                logger.info('Stopping parsing at page with task "%s", below the watermark', tasks[0][1])
+                seen = set(t.name for app, t in listing)
+                for app, t in mark.remaining(seen):
+                    if not(self.tooOld(t)):
+                        self.appendTask(app, t, listing)
+                break
 
-            if (t.deadline - datetime.datetime.utcnow()) < -datetime.timedelta(days=90):
-                logger.info('Stopping parsing at task "%s" due to old deadline' % t)
-                return ;
+            old = False
+            for app, t in tasks:
+                if self.tooOld(t):
+                    logger.info('Stopping parsing at task "%s" due to old deadline' % t)
+                    old = True
+                    break
+                self.appendTask(app, t, listing)
+            if old:
+                break
 
-            application = self.project.appendApplication(row[-1])
-            application.tasks.append(t)
+        self.saveWatermark(Watermark.fromListing(listing))
+
+    def appendTask(self, app, t, listing):
+        application = self.project.appendApplication(app)
+        application.tasks.append(t)
+        listing.append((app, t))
+
+    def tooOld(self, t):
+        return (t.deadline - datetime.datetime.utcnow()) < -datetime.timedelta(days=90)
+
+    def loadWatermark(self):
+        return Watermark.load(self.browser.browser_cache.manifest, self.name)
+
+    def saveWatermark(self, mark):
+        mark.save(self.browser.browser_cache.manifest, self.name)
 
     def parseTable(self, soup):
         for tr in soup.find_all('tr'):
@@ -110,17 +150,61 @@ class HTMLParser(object):
                 yield ret
 
     def getRows(self, html):
-        """Generator for each row in result table"""
+        """Generator for each row in result table, see fetchPages for the additional pages"""
+        for rows in self.getPages(html):
+            for row in rows:
+                self.logger.debug('yielding %s', row)
+                yield row
+
+    def getPages(self, html, ahead=None):
+        """Generator of the list of rows of each page, starting with html, see fetchPages for the additional pages"""
         soup = BeautifulSoup(html, 'lxml')
-        for row in self.parseTable(soup):
-            self.logger.debug('yielding %s', row)
-            yield row
+        yield list(self.parseTable(soup))
+
+        for soup in self.fetchPages(self.findNextPage(soup), ahead=ahead):
+            yield list(self.parseTable(soup))
+
+    def fetchPages(self, offsets, ahead=None):
+        """Generator of the parsed additional pages, in the order of their offset.
+        The pages are visited by a pool of maxWorkers threads, only offsets linked from a page
+        are visited, so the pool is as busy as the number of links on each page allows.
+        At most maxWorkers pages are fetched ahead of the page being yielded,
+        so a caller that stops asking for rows (like parse on an old deadline) also stops the fetching.
+        A caller expecting to stop early can start with fewer pages ahead, doubled for each page yielded."""
+        queue = set(offsets)    # known offsets, not yet submitted
+        if len(queue) == 0:
+            return
+        seen = set(queue)
 
-        for additionalPage in self.findNextPage(soup):
-            html = self.browser.visit(additionalPage)
-            if html != '':
-                for row in self.getRows(html): # Recursion!
-                    yield row
+        if ahead is None:
+            ahead = self.maxWorkers
+        pool = WorkerPool(self.maxWorkers)
+        futures = dict()        # offset -> future
+        try:
+            while True:
+                while len(futures) < ahead and len(queue) != 0:
+                    offset = min(queue)
+                    queue.remove(offset)
+                    futures[offset] = pool.submit(self.browser.visit, offset)
+                if len(futures) == 0:
+                    break
+
+                offset = min(futures)
+                html = futures.pop(offset).result()
+                if html == '':  # '' when already visited or failed
+                    continue
+                soup = BeautifulSoup(html, 'lxml')
+                for link in self.findNextPage(soup):
+                    if link not in seen:
+                        seen.add(link)
+                        queue.add(link)
+
+                yield soup
+                ahead = min(2*ahead, self.maxWorkers)
+        finally:
+            for future in futures.values():
+                future.cancel()
+            pool.shutdown()
 
     def findNextPage(self, soup):
         """Finds links to additional pages of tasks"""
@@ -161,27 +245,65 @@ class HTMLParser_worldcommunitygrid(HTMLParser):
             app = self.project.appendApplicationShort(result['AppName'])
             app.tasks.append(t)
 
-    def getRows(self, content, pagenr=1):
-        logger.debug('Called getRows, pagenr=%s', pagenr)
+    def decode(self, content):
+        """The ResultsStatus of a json results page, None on failure"""
         try:
-            data = json.loads(content)
-        except:
+            return json.loads(content)[u'ResultsStatus']
+        except Exception:
             logger.exception('JSON error for "%s"', content)
-        data = data[u'ResultsStatus']
+            return None
+
+    def fetchPage(self, offset):
+        """Visits and decodes the page starting at offset, called from the getRows pool"""
+        content = self.browser.visit(offset=offset)
+        if content == '':
+            return None
+        return self.decode(content)
+
+    def getRows(self, content):
+        """Generator for each result. content is the first page,
+        which tells how many results there are and how many the server returns per page
+        (the server may cap the requested limit), so the remaining offsets are known up front.
+        These are visited and decoded by a pool of maxWorkers threads, and yielded in offset order."""
+        data = self.decode(content)
+        if data is None:
+            return
         try:
             for result in data[u'Results']:
                 yield result
 
             logger.debug("ResultsAvailable > ResultsReturned + Offset = %s > %s + %s", 
                          data['ResultsAvailable'],  data['ResultsReturned'], data['Offset'])
-            if int(data['ResultsAvailable']) > int(data['ResultsReturned']) + int(data['Offset']):
-                content = self.browser.visit(pagenr+1)
-                if content != '':
-                    for res in self.getRows(content, pagenr=pagenr+1): # recursion
-                        yield res
-
+            available = int(data['ResultsAvailable'])
+            step = int(data['ResultsReturned'])
+            start = int(data['Offset']) + step
         except KeyError as e:
             logger.exception('Parse exception, KeyError with keys %s', data.keys())
+            return
+        if start >= available or step <= 0:
+            return
+
+        offsets = range(start, available, step)
+        pool = WorkerPool(self.maxWorkers)
+        futures = [pool.submit(self.fetchPage, offset) for offset in offsets]
+        try:
+            for offset, future in zip(offsets, futures):
+                data = future.result()
+                end = min(offset + step, available)
+                while data is not None:
+                    results = data.get(u'Results', [])[:end - offset]
+                    for result in results:
+                        yield result
+                    offset += len(results)
+                    if offset >= end or len(results) == 0:
+                        break
+                    # Fewer results than the first page, do not skip the rest of this page
+                    logger.warning('Short results page, fetching from offset %d', offset)
+                    data = self.fetchPage(offset)
+        finally:
+            for future in futures:
+                future.cancel()
+            pool.shutdown()
 
     def getBadges(self):
         page = self.browser.visitStatistics()
@@ -221,7 +343,7 @@ class HTMLParser_worldcommunitygrid(HTMLParser):
             results = application.find('Results').text
             
             app = self.project.appendApplication(name)
-            app.name_short = short
+            self.project.renameApplicationShort(app, short)
             Stat = statistics.ApplicationStatistics_worldcommunitygrid
             app.appendStatistics(Stat(runtime, points, results))
 
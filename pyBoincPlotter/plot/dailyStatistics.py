@@ -89,7 +89,8 @@ if __name__ == '__main__':
     import boinccmd
     
     _, _, BOINC_DIR = config.set_globals()
-    local_projects = boinccmd.get_state(command='get_project_status') # Need for names
+    with boinccmd.Connection(password=boinccmd.readPassword(BOINC_DIR)) as connection:
+        local_projects = boinccmd.get_state_command('get_project_status', connection=connection) # Need for names
 
     fig = plt.figure()
     plotAll(fig, local_projects, BOINC_DIR)
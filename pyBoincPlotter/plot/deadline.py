@@ -83,10 +83,13 @@ if __name__ == '__main__':
     from loggerSetup import loggerSetup
     loggerSetup(logging.INFO)
 
+    import config
     import boinccmd
     import project
 
-    projects = boinccmd.get_state()
+    _, _, BOINC_DIR = config.set_globals()
+    with boinccmd.Connection(password=boinccmd.readPassword(BOINC_DIR)) as connection:
+        projects = boinccmd.get_state(connection=connection)
     project.pretty_print(projects)
 
     fig1 = plt.figure()
@@ -677,7 +677,8 @@ if __name__ == '__main__':
     CONFIG, CACHE_DIR, BOINC_DIR = config.set_globals()
     browser_cache = browser.Browser_file(CACHE_DIR)
 
-    local_projects = boinccmd.get_state() # Need for names
+    with boinccmd.Connection(password=boinccmd.readPassword(BOINC_DIR)) as connection:
+        local_projects = boinccmd.get_state(connection=connection) # Need for names
     web_projects = browser.getProjectsDict(CONFIG, browser_cache)
     project.merge(local_projects,
                   web_projects)
@@ -40,11 +40,18 @@ def plot(fig, projects):
     for p in projects.values():
         for app in p.applications.values():
             apps.append(app)
-
-            for task in app.tasks:
-                if task.state_str not in states:
-                    logger.debug('Adding state %s', task.state_str)
-                    states.append(task.state_str)
+            app.tasks.column('state') # registers any new state strings
+    codes = [Task.states.code(state) for state in states]
+
+    # Number of tasks per application and state code, see Task.states
+    N = len(Task.states)
+    counts = [app.tasks.stateBincount() for app in apps]
+    for code in np.flatnonzero(sum(counts, np.zeros(N))):
+        state = Task.states.values[code]
+        if state not in states:
+            logger.debug('Adding state %s', state)
+            states.append(state)
+            codes.append(code)
 
     colormap = matplotlib.cm.get_cmap('Set1')
     colors = [colormap(i) for i in np.linspace(0, 1, len(apps))]
@@ -58,10 +65,7 @@ def plot(fig, projects):
         if len(app.tasks) == 0:
             continue
 
-        height = np.zeros(len(states))
-        for task in app.tasks:
-            ix = states.index(task.state_str)
-            height[ix] += 1
+        height = counts[ix_app][codes]
         
         ax.bar(x, height, bottom=bottom, 
                color=colors[ix_app], width=width,
@@ -88,11 +92,12 @@ if __name__ == '__main__':
 
     fig = plt.figure()
 
-    local_projects = boinccmd.get_state()
+    CONFIG, CACHE_DIR, BOINC_DIR = config.set_globals()
+    with boinccmd.Connection(password=boinccmd.readPassword(BOINC_DIR)) as connection:
+        local_projects = boinccmd.get_state(connection=connection)
     # print 'LOCAL'
     # project.pretty_print(local_projects)
 
-    CONFIG, CACHE_DIR, _ = config.set_globals()
     cache = browser.Browser_file(CACHE_DIR)
     b = browser.BrowserSuper(cache)
 
@@ -253,11 +253,12 @@ if __name__ == '__main__':
     import project
     import boinccmd
 
-    local_projects = boinccmd.get_state()
+    CONFIG, CACHE_DIR, BOINC_DIR = config.set_globals()
+    with boinccmd.Connection(password=boinccmd.readPassword(BOINC_DIR)) as connection:
+        local_projects = boinccmd.get_state(connection=connection)
     print('LOCAL')
     project.pretty_print(local_projects)
 
-    CONFIG, CACHE_DIR, _ = config.set_globals()
     cache = browser.Browser_file(CACHE_DIR)
     b = browser.BrowserSuper(cache)
 
@@ -18,7 +18,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # END LICENCE
 # Standard python
+import os
 import re
+import bisect
+import pickle
 import difflib
 import logging
 logger = logging.getLogger('boinc.project')
@@ -26,7 +29,9 @@ logger = logging.getLogger('boinc.project')
 from bs4 import BeautifulSoup
 # This project:
 from application import Application, mergeApplications
-from task import Task_local, adjustColumnSpacing
+from task import Task_local
+from textTable import TextTable
+import taskQuery
 from statistics import ProjectStatistics, StatisticsList
 from settings import Settings
 
@@ -45,6 +50,7 @@ class Project(object):
         self.fileTransfers = list() # list of task like objects with files in transit (will mostly be empty)
 
         self._appNames = dict() # key is task name and value is application name
+        self._appsShort = dict() # key is application name_short, see findApplicationShort
         self._badges = list()
         self.show_empty = False
 
@@ -69,35 +75,99 @@ class Project(object):
         return Project(url=url, name=name,
                        statistics=s, settings=settings)
 
+    @staticmethod
+    def createFromElement(element):
+        """
+        Same as createFromXML, but expects the <project> element
+        from a xml.etree parser
+        """
+        settings = Settings.createFromElement(element)
+        s = ProjectStatistics.createFromElement(element)
+        url = element.findtext('master_url')
+        name = element.findtext('project_name')
+        return Project(url=url, name=name,
+                       statistics=s, settings=settings)
+
+    def updateFromElement(self, element):
+        """Replaces statistics and settings with the ones from a newer <project> element,
+        like the ones from get_project_status. Application statistics are cleared
+        since these are only set by merging with the web and wuprop projects."""
+        self.settings = Settings.createFromElement(element)
+        self.statistics = ProjectStatistics.createFromElement(element)
+        for app in self.applications.values():
+            app.statistics = ''
+
     def appendApplicationFromXML(self, xml):
         a = Application()
         a.setNameFromXML(xml)
-        self.applications[a.name_long] = a
+        self.insertApplication(a.name_long, a)
+        return a
+
+    def appendApplicationFromElement(self, element):
+        a = Application()
+        a.setNameFromElement(element)
+        self.insertApplication(a.name_long, a)
         return a
+
+    def findApplicationShort(self, name_short):
+        """Returns the application with the given name_short, or None.
+        The index is only up to date when applications are added with insertApplication
+        and renamed with renameApplicationShort."""
+        return self._appsShort.get(name_short)
+
+    def insertApplication(self, key, app):
+        """self.applications[key] = app, keeping the name_short index up to date"""
+        self.applications[key] = app
+        self._appsShort.setdefault(app.name_short, app)
+
+    def renameApplicationShort(self, app, name_short):
+        """app.name_short = name_short, keeping the name_short index up to date"""
+        previous = app.name_short
+        app.name_short = name_short
+        if self._appsShort.get(previous) is app:
+            del self._appsShort[previous]
+            for a in self.applications.values():
+                if a.name_short == previous:
+                    self._appsShort[previous] = a
+                    break
+        self._appsShort.setdefault(name_short, app)
     
     def appendWorkunitFromXML(self, xml):
         # Currently, the only thing of interest is the mapping between name and app_name
         soup = BeautifulSoup(xml, features='lxml')
         name = soup.find('name').text
         app_name = soup.find('app_name').text
+        return self.appendWorkunit(name, app_name)
+
+    def appendWorkunitFromElement(self, element):
+        name = element.findtext('name')
+        app_name = element.findtext('app_name')
+        return self.appendWorkunit(name, app_name)
+
+    def appendWorkunit(self, name, app_name):
         self._appNames[name] = app_name
         return 'name %s, app_name %s' % (name, app_name)
     
     def appendResultFromXML(self, xml):
         t = Task_local.createFromXML(xml)
+        return self.appendResult(t)
+
+    def appendResultFromElement(self, element):
+        t = Task_local.createFromElement(element)
+        return self.appendResult(t)
 
+    def appendResult(self, t):
+        """Appends the Task_local t to the application given by the previously appended workunits"""
         try:
             app_name = self._appNames[t.name]
         except KeyError:
             raise KeyError('Unknown app_name for task %s, known names %s' % (t.name, self._appNames))
 
         #logger.debug('trying to find app_name %s', app_name)
-        for key, app in self.applications.items():
-            if app.name_short == app_name:
-                app.tasks.append(t)
-                break
-        else:
+        app = self.findApplicationShort(app_name)
+        if app is None:
             raise KeyError('Could not find app_name %s in list of applications' % app_name)
+        app.tasks.append(t)
 
         return t
 
@@ -105,19 +175,17 @@ class Project(object):
     # HTML related
     # 
     def appendApplicationShort(self, name_short):
-        for key, app in self.applications.items():
-            if app.name_short == name_short:
-                return app
-        else:
+        app = self.findApplicationShort(name_short)
+        if app is None:
             app = Application(name_short, is_long=True)
-            self.applications[name_short] = app
+            self.insertApplication(name_short, app)
         return app
 
     def appendApplication(self, name, is_long=False):
         app = Application(name=name, is_long=is_long)
         name_long = app.name_long
         if not(name_long in self.applications):
-            self.applications[name_long] = app
+            self.insertApplication(name_long, app)
 
         return self.applications[name_long]
 
@@ -169,42 +237,49 @@ class Project(object):
         self.name = self.name#.capitalize()
 
     def setUrl(self, url):
+        self.url = self.cleanUrl(url)
+
+    @staticmethod
+    def cleanUrl(url):
+        """The url as used for the keys of the projects dictionary"""
         if url is None:
-            self.url = url
-            return
+            return url
 
         if url.endswith('/'):
-            self.url = url[:-1]
-        else:
-            self.url = url
+            url = url[:-1]
 
         http = 'http://'
-        ix = self.url.find(http)
+        ix = url.find(http)
         if ix != -1:
-            name = self.url[ix+len(http):]
+            name = url[ix+len(http):]
             if not(name.startswith('www.')):
                 name = 'www.' + name
-                self.url = http + name
+                url = http + name
+        return url
 
-    def __str__(self):
-        ret = ["== {} ==".format(self.name.title())]
+    def appendTo(self, table):
+        """Adds the project, its applications and file transfers to the TextTable"""
+        table.append("== {} ==".format(self.name.title()))
         for prop in [self.settings, self.statistics]:
             if prop != None:
-                ret.append(str(prop))
+                table.append(prop)
 
         for _, badge in self._badges:
-            ret.append(str(badge))
+            table.append(badge)
 
         for key in sorted(self.applications):
             if len(self.applications[key]) != 0 or self.show_empty:
-                ret.append(str(self.applications[key]))
+                self.applications[key].appendTo(table)
 
         if len(self.fileTransfers) != 0:
-            ret.append('- File Transfers -')
+            table.append('- File Transfers -')
             for t in self.fileTransfers:
-                ret.append(str(t))
+                table.appendTask(t)
 
-        return "\n".join(ret)
+    def __str__(self):
+        table = TextTable()
+        self.appendTo(table)
+        return str(table)
 
     def __len__(self):
         """
@@ -226,18 +301,23 @@ class Project_fileTransfers(Project):
     def __init__(self, tasks):
         Project.__init__(self, name='File Transfers')
         a = Application(tasks=tasks)
-        self.applications[''] = a
+        self.insertApplication('', a)
 
 def merge(local_projects, 
-          web_projects):
-    """Tries to merge local and web information by adding information from local to the web dictionary"""
+          web_projects, matches=None):
+    """Tries to merge local and web information by adding information from local to the web dictionary.
+    matches is an optional MatchMap, which remembers the name matching between refreshes"""
     local_projects = dict(local_projects)
-    mergeDicts(local_projects, web_projects, mergeProject, 'url')
+    mergeDicts(local_projects, web_projects, lambda l, w: mergeProject(l, w, matches), 'url',
+               matches=matches, namespace='')
+    if matches is not None:
+        matches.save()
 
-def mergeProject(local_project, web_project):
+def mergeProject(local_project, web_project, matches=None):
     local_apps = dict(local_project.applications)
     web_apps = web_project.applications
-    mergeDicts(local_apps, web_apps, mergeApplications, 'name_long')
+    mergeDicts(local_apps, web_apps, lambda l, w: mergeApplications(l, w, web_project), 'name_long',
+               matches=matches, namespace=web_project.url, insert=web_project.insertApplication)
 
     web_project.appendStatistics(local_project.statistics)
     logger.debug('web_project.name "%s", local_project.name "%s"', 
@@ -270,75 +350,171 @@ def mergeWuprop(wuprop_projects,
                      'present locally'), remaining)
         local_projects[remaining] = wuprop_projects[remaining] # This is really messy, since remaining isn't a url
 
-def mergeDicts(local_dict, web_dict, merge, name):
-    """Helper function for above merge rutines"""
+class MatchMap(object):
+    """
+    Remembers the local key -> web key pairs found by the name matching in mergeDicts,
+    so that the matching only has to be done for new names.
+    Pairs are stored per namespace ('' for projects, the project url for applications)
+    in a pickle file, typically in the cache dir.
+    """
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.matches = dict()   # namespace -> {local key: web key}
+        self.changed = False
+        if filename is not None and os.path.exists(filename):
+            try:
+                with open(filename, 'rb') as f:
+                    self.matches = pickle.load(f)
+            except Exception as e:
+                logger.warning('Could not read merge matches "%s", %s', filename, e)
+
+    def get(self, namespace, key):
+        return self.matches.get(namespace, dict()).get(key)
+
+    def set(self, namespace, key, web_key):
+        matches = self.matches.setdefault(namespace, dict())
+        if matches.get(key) != web_key:
+            matches[key] = web_key
+            self.changed = True
+
+    def remove(self, namespace, key):
+        matches = self.matches.get(namespace, dict())
+        if key in matches:
+            del matches[key]
+            self.changed = True
+
+    def save(self):
+        if self.changed and self.filename is not None:
+            with open(self.filename, 'wb') as f:
+                pickle.dump(self.matches, f)
+            self.changed = False
+
+def normalizeName(name):
+    """Lower case and without parentheses, 'PPS (Sieve)' -> 'pps sieve'"""
+    return name.replace('(', '').replace(')', '').lower()
+
+class NameIndex(object):
+    """
+    Index over the web names used by the fuzzy matching in mergeDicts, built once per merge.
+    candidates(name) gives the web keys where either name is a prefix of the other,
+    or where the normalized names are equal, in the order of the web dictionary.
+    """
+    def __init__(self, web_dict, name):
+        self.order = dict()                 # web key -> position in web_dict
+        self.names = dict()                 # web name -> [web key]
+        self.normalized = dict()            # normalized web name -> [web key]
+        for ix, (key, web) in enumerate(web_dict.items()):
+            self.order[key] = ix
+            web_name = getattr(web, name)
+            if web_name is None:
+                continue
+            self.names.setdefault(web_name, list()).append(key)
+            self.normalized.setdefault(normalizeName(web_name), list()).append(key)
+        self.sorted = sorted(self.names)
+
+    def candidates(self, name):
+        if name is None:
+            return []
+        keys = set(self.normalized.get(normalizeName(name), []))
+        # web names starting with name
+        ix = bisect.bisect_left(self.sorted, name)
+        while ix < len(self.sorted) and self.sorted[ix].startswith(name):
+            keys.update(self.names[self.sorted[ix]])
+            ix += 1
+        # web names that name starts with
+        for ix in range(len(name)):
+            keys.update(self.names.get(name[:ix], []))
+        return sorted(keys, key=self.order.get)
+
+def mergeDicts(local_dict, web_dict, merge, name, matches=None, namespace='', insert=None):
+    """Helper function for above merge rutines.
+    Tries, in order: equal keys, pairs remembered by matches (an optional MatchMap), equal name_short,
+    fuzzy name matching (see NameIndex) and finally difflib.
+    Pairs found by name are added to matches, so that difflib only runs for new names,
+    except when there was more than one web entry with the same name_short or fuzzy candidate.
+    A remembered pair is forgotten when its web entry is gone or no longer merges.
+    Local entries without a match are added with insert(key, value), default is web_dict[key] = value."""
     logging.debug('merging with %s, ("%s", "%s")', merge, 
                   local_dict, web_dict)
-    for key in list(local_dict.keys()):
-        if key in web_dict:
-            if merge(local_dict[key],
-                     web_dict[key]):
-                del local_dict[key]
-
-    def fuzzyMatch(name1, name2):
-        if name1 is None or name2 is None: return False
-
-        if name1.startswith(name2):
-            return True
-        if name2.startswith(name1):
+    def tryMerge(local_key, web_key, remember=True):
+        if merge(local_dict[local_key], web_dict[web_key]):
+            del local_dict[local_key]
+            if remember and matches is not None:
+                matches.set(namespace, local_key, web_key)
             return True
-        # This last one catches the following condition:
-        # 'PPS (Sieve)' == 'PPS Sieve'
-        name1 = name1.replace('(', '').replace(')', '')
-        name2 = name2.replace('(', '').replace(')', '')
-        return name1 == name2
+        return False
 
+    for key in list(local_dict.keys()):
+        if key in web_dict:
+            tryMerge(key, key, remember=False)
+
+    if matches is not None:
+        for key in list(local_dict.keys()):
+            web_key = matches.get(namespace, key)
+            if web_key is None:
+                continue
+            if web_key in web_dict:
+                logger.debug('remembered match "%s", "%s"', key, web_key)
+                if tryMerge(key, web_key, remember=False):
+                    continue
+            logger.debug('forgetting match "%s", "%s"', key, web_key)
+            matches.remove(namespace, key)
+
+    name_short = dict()
+    for web_key, web in web_dict.items():
+        if hasattr(web, 'name_short'):
+            name_short.setdefault(web.name_short, list()).append(web_key)
     for remaining_key, remaining in list(local_dict.items()):
-        for web in web_dict.values():
-            if getattr(remaining, 'name_short', 1) == getattr(web, 'name_short', -1):
-                logger.debug('short name match \n"%s", \n"%s"', 
-                             remaining.name, web.name)
-                if merge(remaining, web):
-                    del local_dict[remaining_key]
-                    break
+        if not(hasattr(remaining, 'name_short')):
+            continue
+        web_keys = name_short.get(remaining.name_short, [])
+        for web_key in web_keys:
+            logger.debug('short name match \n"%s", \n"%s"', 
+                         remaining.name, web_dict[web_key].name)
+            if tryMerge(remaining_key, web_key, remember=len(web_keys) == 1):
+                break
 
+    index = NameIndex(web_dict, name)
     for remaining_key, remaining in list(local_dict.items()):
-        for web in web_dict.values():
-            if fuzzyMatch(getattr(remaining, name),
-                          getattr(web, name)):
-                logger.debug('fuzzy match \n"%s", \n"%s"', 
-                             remaining.name, web.name)
-                if merge(remaining, web):
-                    del local_dict[remaining_key]
-                    break
+        web_keys = index.candidates(getattr(remaining, name))
+        for web_key in web_keys:
+            logger.debug('fuzzy match \n"%s", \n"%s"', 
+                         remaining.name, web_dict[web_key].name)
+            if tryMerge(remaining_key, web_key, remember=len(web_keys) == 1):
+                break
 
-    web_objects = web_dict.values()
-    web_names   = [getattr(web, name) for web in web_objects]
+    # Only genuinely new names gets this far
+    web_keys  = list(web_dict.keys())
+    web_names = [getattr(web_dict[key], name) for key in web_keys]
     for remaining_key, remaining in list(local_dict.items()):
         try:
             match = difflib.get_close_matches(getattr(remaining, name), web_names, n=1, cutoff=0.8)
-            ix = web_names.index(match[0])
+            web_key = web_keys[web_names.index(match[0])]
             logger.debug('difflib match \n"%s", \n"%s"', 
-                         remaining.name, web_objects[ix].name)
-            if merge(remaining, web_objects[ix]):
-                del local_dict[remaining_key]
-                #break
-            else:
+                         remaining.name, web_dict[web_key].name)
+            if not(tryMerge(remaining_key, web_key)):
                 raise IndexError()
         except (IndexError, TypeError):
             logger.warning('merge with %s failed, remaining local %s, web keys, %s', merge, remaining_key, web_dict.keys())
-            web_dict[remaining_key] = local_dict[remaining_key]
+            if insert is None:
+                web_dict[remaining_key] = local_dict[remaining_key]
+            else:
+                insert(remaining_key, local_dict[remaining_key])
             del local_dict[remaining_key]
     
     assert len(local_dict) == 0, 'Vops, not all projects merged %s' % local_dict
     
-def pretty_print(projects, show_empty=False, show_checkpoint=False):
-    for p in projects.values():
-        for app in p.applications:
-            tasks = p.applications[app].tasks
-            adjustColumnSpacing(tasks)
-
+def pretty_print(projects, show_empty=False, show_checkpoint=False, f=None, query=None):
+    """Prints all projects as one TextTable, so that the task columns line up across projects.
+    Each task is formatted once and the output is written in one go to f (default sys.stdout).
+    Pass a taskQuery.TaskQuery as query to only print a page of the matching tasks."""
+    if query is not None:
+        return taskQuery.pretty_print(projects, query, f=f)
+
+    table = TextTable()
     for key, p in sorted(projects.items()):
         p.show_empty = show_empty # hack
         if len(p) != 0 or show_empty:
-            print(str(p) + '\n')
+            p.appendTo(table)
+            table.append('')
+    table.write(f)
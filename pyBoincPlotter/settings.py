@@ -37,6 +37,19 @@ class Settings(collections.namedtuple('Settings', ['resource_share', 'dont_reque
 
         return Settings(dont_request_more_work=dont_request_more_work, **res)
 
+    @staticmethod
+    def createFromElement(element):
+        """Same as createFromSoup, but for a xml.etree element"""
+        res = dict(resource_share = element.findtext('resource_share'),
+                   sched_priority = element.findtext('sched_priority'))
+        for key in res:
+            if res[key] != None:
+                res[key] = float(res[key])
+
+        dont_request_more_work = element.find('dont_request_more_work') != None
+
+        return Settings(dont_request_more_work=dont_request_more_work, **res)
+
     def __str__(self):
         ret = ''
         if self.resource_share is not None:
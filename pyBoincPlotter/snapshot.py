@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+On disk snapshot of the merged projects dictionary, so that a new start can show
+the previous result straight away while the real update runs.
+
+The file holds two pickles, a small header followed by the projects.
+The header is checked before the projects are loaded,
+it has the schema version and the modification time of every module
+whose classes are pickled, so a snapshot written by other code is never loaded.
+"""
+# Standard python imports
+import io
+import os
+import time
+import pickle
+import logging
+logger = logging.getLogger('boinc.snapshot')
+
+# This project
+from version import __version__
+
+# Increase when the layout of the pickled classes changes in a way the mtimes can not detect
+SCHEMA_VERSION = 1
+# Modules (relative to this directory) defining the classes found in a projects dictionary
+SOURCES = ['task.py', 'taskTable.py', 'application.py', 'project.py',
+           'statistics.py', 'settings.py', os.path.join('plot', 'badge.py')]
+
+def sources():
+    """Dictionary of source file -> modification time"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    ret = dict()
+    for name in SOURCES:
+        try:
+            ret[name] = os.path.getmtime(os.path.join(directory, name))
+        except OSError:
+            ret[name] = None
+    return ret
+
+def header():
+    return dict(schema=SCHEMA_VERSION,
+                version=__version__,
+                sources=sources(),
+                created=time.time())
+
+def compatible(head):
+    """True if the snapshot header matches the running code"""
+    current = header()
+    for key in ('schema', 'version', 'sources'):
+        if head.get(key) != current[key]:
+            logger.info('Snapshot %s differs, got %s expected %s', key, head.get(key), current[key])
+            return False
+    return True
+
+def dump(f, obj):
+    pickle.dump(header(), f, pickle.HIGHEST_PROTOCOL)
+    pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
+
+def read(f):
+    """Returns (obj, creation time) from the open file f, or (None, None) if written by incompatible code"""
+    head = pickle.load(f)
+    if not(isinstance(head, dict)) or not(compatible(head)):
+        return None, None
+    return pickle.load(f), head['created']
+
+def dumps(obj):
+    """Same as dump, but returns the bytes (like for storing in a database)"""
+    f = io.BytesIO()
+    dump(f, obj)
+    return f.getvalue()
+
+def loads(data):
+    """Same as load, but from the bytes returned by dumps"""
+    try:
+        return read(io.BytesIO(data))
+    except Exception as e:
+        logger.warning('Could not load snapshot data, %s', e)
+        return None, None
+
+def save(filename, projects):
+    """Writes projects to filename, through a temporary file so that a reader never sees half a snapshot"""
+    tmp = filename + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            dump(f, projects)
+        if os.path.exists(filename):
+            os.remove(filename) # os.rename does not overwrite on windows
+        os.rename(tmp, filename)
+        logger.debug('Saved snapshot %s', filename)
+        return True
+    except Exception as e:
+        logger.warning('Could not save snapshot %s, %s', filename, e)
+        return False
+
+def load(filename):
+    """Returns (projects, creation time) from filename,
+    or (None, None) if it is missing, unreadable or written by incompatible code."""
+    try:
+        with open(filename, 'rb') as f:
+            return read(f)
+    except (IOError, OSError):
+        return None, None
+    except Exception as e:
+        logger.warning('Could not load snapshot %s, %s', filename, e)
+        return None, None
@@ -67,6 +67,14 @@ class ProjectStatistics(object):
                           soup.host_total_credit.text,
                           soup.host_expavg_credit.text)
 
+    @staticmethod
+    def createFromElement(element):
+        """Same as createFromSoup, but for a xml.etree element"""
+        return ProjectStatistics(element.findtext('user_total_credit'),
+                                 element.findtext('user_expavg_credit'),
+                                 element.findtext('host_total_credit'),
+                                 element.findtext('host_expavg_credit'))
+
     def __str__(self):
         length_user = len(util.fmtNumber(self.user[0], '.0f')) # user will always be longer than host
         length_host = len(util.fmtNumber(self.host[0], '.0f')) # user will always be longer than host
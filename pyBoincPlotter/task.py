@@ -23,7 +23,10 @@ Task -> Task_web -> Task_web_worlcommunitygrid
 """
 
 # Standard python imports
+import time
+import calendar
 import datetime
+import threading
 import logging
 logger = logging.getLogger('boinc.task')
 
@@ -33,6 +36,34 @@ from bs4 import BeautifulSoup
 # This project
 import util
 
+utcEpoch = datetime.datetime(1970, 1, 1)
+
+class Registry(object):
+    """
+    Thread safe interning of strings as small integers, see Task.states.
+    Lookups are plain dictionary reads, the lock is only taken when adding a new string.
+    """
+    def __init__(self, values=()):
+        self.lock = threading.Lock()
+        self.values = list()    # code -> string, only appended to
+        self.codes = dict()     # string -> code
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        try:
+            return self.codes[value]
+        except KeyError:
+            with self.lock:
+                if value not in self.codes:
+                    logger.debug('Adding state %s', value)
+                    self.values.append(value) # before the code, so that a code is always valid
+                    self.codes[value] = len(self.values) - 1
+                return self.codes[value]
+
+    def __len__(self):
+        return len(self.values)
+
 class Task(object):
     """
     Mostly handles string conversion around the following properties:
@@ -46,8 +77,22 @@ class Task(object):
     - grantedCredit
     Subclasses Task_local and Task_web are the one to use depending on source.
     """
-    desc_state = ['downloading', 'ready to run', 'running', 'suspended', 'paused', 'computation completed', 'uploading', 'ready to report', 'unknown']
+    __slots__ = ('name', 'device', 'state', 'fractionDone',
+                 'elapsedSeconds', 'remainingSeconds', 'checkpointSeconds', 'deadlineEpoch')
+    # Shared by all tasks, the state is stored as the integer code of the state string
+    states = Registry(['downloading', 'ready to run', 'running', 'suspended', 'paused', 'computation completed', 'uploading', 'ready to report', 'unknown',
+                       'in progress'])
+    desc_state = states.values  # read only, use states.code to add
+    inProgress = states.code('in progress')
+    unknown = states.code('unknown')
     fmt_date = '%d %b %Y %H:%M:%S UTC'
+    # Incremented by every setter, lets taskTable.TaskTable see that a task was modified in place.
+    # A list, since assigning a class attribute would flush the attribute lookup cache of every task class
+    generation = [0]
+    # slot -> value used by fromValues when not given, extended by the subclasses
+    valueDefaults = dict(name='', device='localhost', state=unknown,
+                         fractionDone=0., elapsedSeconds=0., remainingSeconds=0.,
+                         checkpointSeconds=None, deadlineEpoch=None)
     def __init__(self, name='', device='localhost',
                  state='unknown', fractionDone='0',
                  checkpointCPUtime=None, currentCPUtime=None,
@@ -58,18 +103,19 @@ class Task(object):
         type(self.fractionDone_str) == str
         type(self.fractionDone) == float
         each attribute has a setter method that assumes a string is passed in. This is then converted to a python object
-        like float, datetime or timedelta.
+        like float or int. Times are kept as float seconds (and the deadline as seconds since the epoch),
+        the timedelta and datetime versions are created on demand.
         """
         self.setName(name)                # There is also a self.name_short which is max 15 characters long
         self.setDevice(device)
 
-        self.setState(state) # Stored as integer representing index in the self.desc_state list
+        self.setState(state) # Stored as integer code, see self.states
         self.setFractionDone(fractionDone) # stored as float
 
-        self.setElapsedCPUtime(elapsedCPUtime) # stored as timedelta, see strToTimedelta and timedeltaToStr
-        self.setRemainingCPUtime(remainingCPUtime) # stored as timedelta, see strToTimedelta and timedeltaToStr
+        self.setElapsedCPUtime(elapsedCPUtime) # stored as float seconds, see strToSeconds and secondsToStr
+        self.setRemainingCPUtime(remainingCPUtime) # stored as float seconds, see strToSeconds and secondsToStr
         self.setCheckpoint(checkpointCPUtime, currentCPUtime)
-        self.setDeadline(deadline)                 # stored as datetime, string is time until deadline
+        self.setDeadline(deadline)                 # stored as seconds since the epoch, string is time until deadline
 
     N = 10
     fmt = []
@@ -92,16 +138,58 @@ class Task(object):
 
         return Task.fmt.format(*s, **self.columnSpacing)
     
+    @classmethod
+    def fromValues(cls, **values):
+        """
+        Bulk constructor from already typed values keyed by slot name,
+        floats for fractionDone (in percent) and the *Seconds, seconds since the epoch for deadlineEpoch
+        and a state code or state string. None of the string setters are called,
+        so any cleanup (like the spaces removed by setName) is left to the caller.
+        Slots not given are set from valueDefaults.
+        """
+        self = cls.__new__(cls)
+        for slot, default in allValueDefaults(cls):
+            setattr(self, slot, values.pop(slot, default))
+        if len(values) != 0:
+            raise TypeError('Unknown values for %s: %s' % (cls.__name__, sorted(values)))
+        if not(isinstance(self.state, int)):
+            self.state = self.states.code(self.state.lower())
+        return self
+
     def done(self):
-        return not(self.desc_state[self.state] == 'in progress')
+        return self.state != self.inProgress
+
+    #
+    # Pickle support, see snapshot.py
+    #
+    def __getstate__(self):
+        """Dictionary of the slots. The state code is only valid within this process
+        (codes are handed out as new states are seen), so it is stored as the state string."""
+        ret = dict()
+        for slot in slotNames(type(self)):
+            try:
+                ret[slot] = getattr(self, slot)
+            except AttributeError: # slot never set
+                pass
+        if 'state' in ret:
+            ret['state'] = self.states.values[ret['state']]
+        return ret
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        if 'state' in state:
+            self.state = self.states.code(state['state'])
 
     #
     # Conversion functions
     #
-    # Applied to self.elapsedCPUtime and self.remainingCPUtime
-    def strToTimedelta(self, sec):
-        timedelta = datetime.timedelta(seconds=self.toFloat(sec))
-        return timedelta
+    # Applied to self.elapsedSeconds and self.remainingSeconds
+    def strToSeconds(self, sec):
+        return self.toFloat(sec)
+
+    def secondsToStr(self, sec):
+        return self.timedeltaToStr(datetime.timedelta(seconds=sec))
 
     def timedeltaToStr(self, timedelta):
         timedelta = str(timedelta)
@@ -134,6 +222,7 @@ class Task(object):
     
     def setName(self, value):
         self.name = value.replace(' ', '')
+        Task.generation[0] += 1
 
     @property
     def device_str(self):
@@ -141,35 +230,38 @@ class Task(object):
 
     def setDevice(self, device):
         self.device = device
+        Task.generation[0] += 1
 
     @property
     def state_str(self):
-        state = self.desc_state[self.state]
+        state = self.states.values[self.state]
         return state
 
     def setState(self, state):
         try:
             self.state = int(state)
         except ValueError: # lets hope its a string representing the state
-            try:
-                self.state = self.desc_state.index(state.lower())
-            except:                     # guess not
-                logger.debug('Adding state %s', state.lower())
-                self.desc_state.append(state.lower()) # now it is!
-                self.state = self.desc_state.index(state.lower())
+            self.state = self.states.code(state.lower())
+        Task.generation[0] += 1
 
     @property
     def fractionDone_str(self):
-        if self.done():
+        if self.done() and self.fractionDone != 100:
             self.fractionDone = 100
+            Task.generation[0] += 1
         return "{:.0f} %".format(self.fractionDone)
 
     def setFractionDone(self, fractionDone):
         self.fractionDone = float(fractionDone)*100
+        Task.generation[0] += 1
+
+    @property
+    def elapsedCPUtime(self):
+        return datetime.timedelta(seconds=self.elapsedSeconds)
 
     @property
     def elapsedCPUtime_str(self):
-        elapsed = self.timedeltaToStr(self.elapsedCPUtime)
+        elapsed = self.secondsToStr(self.elapsedSeconds)
         # if self.checkpoint != None:
         #     elapsed += " ({})".format(self.checkpoint_str)
         return elapsed
@@ -177,60 +269,78 @@ class Task(object):
     def setElapsedCPUtime(self, elapsedCPUtime):
         if elapsedCPUtime == '---':
             elapsedCPUtime = '0'
-        self.elapsedCPUtime = self.strToTimedelta(elapsedCPUtime)
+        self.elapsedSeconds = self.strToSeconds(elapsedCPUtime)
+        Task.generation[0] += 1
+
+    @property
+    def remainingCPUtime(self):
+        return datetime.timedelta(seconds=self.remainingSeconds)
 
     @property
     def remainingCPUtime_str(self):
-        return self.timedeltaToStr(self.remainingCPUtime)
+        return self.secondsToStr(self.remainingSeconds)
 
     def setRemainingCPUtime(self, remainingCPUtime):
-        self.__state = None
-        self.remainingCPUtime = self.strToTimedelta(remainingCPUtime)
+        self.remainingSeconds = self.strToSeconds(remainingCPUtime)
+        Task.generation[0] += 1
 
-    # @property
-    # def checkpoint_str(self):
-    #     return self.timedeltaToStr(self.checkpoint)
+    @property
+    def checkpoint(self):
+        """CPU time since checkpoint, as a positive timedelta (negative timedeltas are wierd)"""
+        if self.checkpointSeconds is None:
+            return None
+        return datetime.timedelta(seconds=abs(self.checkpointSeconds))
+
+    @property
+    def checkpoint_str(self):
+        if self.checkpointSeconds is None:
+            return ''
+        elif self.checkpointSeconds < 0:
+            return '-' + self.secondsToStr(-self.checkpointSeconds)
+        else:
+            return self.secondsToStr(self.checkpointSeconds)
 
     def setCheckpoint(self, checkpointCPUtime, currentCPUtime):
-        self.checkpoint = None
+        self.checkpointSeconds = None
         if checkpointCPUtime != None and currentCPUtime != None:
             try:
-                sec = self.toFloat(currentCPUtime) - self.toFloat(checkpointCPUtime)
-                if sec < 0:     # negative timedeltas are wierd
-                    self.checkpoint = datetime.timedelta(seconds=-sec)
-                    self.checkpoint_str = '-' + self.timedeltaToStr(self.checkpoint)
-                else:
-                    self.checkpoint = datetime.timedelta(seconds=sec)
-                    self.checkpoint_str = self.timedeltaToStr(self.checkpoint)
+                self.checkpointSeconds = self.toFloat(currentCPUtime) - self.toFloat(checkpointCPUtime)
             except:
                 pass
+        Task.generation[0] += 1
+
+    @property
+    def deadline(self):
+        """Deadline as a (naive) utc datetime"""
+        if self.deadlineEpoch is None:
+            return None
+        return utcEpoch + datetime.timedelta(seconds=self.deadlineEpoch)
 
     @property
     def deadline_str(self):
         """ Time until deadline
         """
-        if self.deadline is not None:
-            now = datetime.datetime.utcnow()#today()
-            delta = self.deadline - now
-            s = self.timedeltaToStr(delta)
-            if delta.days < 0:
-                delta = now - self.deadline
-                s = '-' + self.timedeltaToStr(delta)
-        else:
+        if self.deadlineEpoch is None:
             return '-'
-        return s
+        delta = self.deadlineEpoch - time.time()
+        if delta < 0:
+            return '-' + self.secondsToStr(-delta)
+        return self.secondsToStr(delta)
 
     def setDeadline(self, deadline):
-        """ Store deadline as datetime object
+        """ Store deadline as seconds since the epoch, the string is in utc
         """
         if deadline is not None and deadline != '---':
             deadline = deadline.replace('|', '')
             deadline = deadline.replace(',', '')
-            self.deadline = datetime.datetime.strptime(deadline, self.fmt_date)
+            deadline = datetime.datetime.strptime(deadline, self.fmt_date)
+            self.deadlineEpoch = float(calendar.timegm(deadline.timetuple()))
         else:
-            self.deadline = None
+            self.deadlineEpoch = None
+        Task.generation[0] += 1
 
 class Task_local(Task):
+    __slots__ = ('schedularState', 'active', 'memUsage', 'resources', '__state')
     desc_schedularState = ['ready to start', 'suspended', 'running', 'unknown']
     # Based on common_defs.h
     desc_active = ['paused', 'running',                      # 0, 1
@@ -238,6 +348,8 @@ class Task_local(Task):
                    'abort pending', 'aborted', 'unable to start', # 5, 6, 7
                    'waiting to quit', 'suspended', 'waiting for copy', # 8, 9, 10
                    'unknown']   # -1
+    valueDefaults = dict(schedularState=-1, active=-1, memUsage=0., resources='',
+                         _Task_local__state=None)
     def __init__(self, schedularState=-1, active=-1, memUsage=0, resources='', **kwargs):
         self.__state = None      # cache
 
@@ -281,8 +393,67 @@ class Task_local(Task):
         except Exception as e:
             logger.exception('Trying to create task out of {}, got'.format(xml))
 
+    @staticmethod
+    def createFromElement(element):
+        """
+        Same as createFromXML, but expects the <result> element
+        from a xml.etree parser
+        """
+        try:
+            return Task_local.fromValues(**Task_local.valuesFromElement(element))
+        except Exception as e:
+            logger.exception('Trying to create task out of element {}, got'.format(element.findtext('name')))
+
+    @staticmethod
+    def kwargsFromElement(element):
+        find = util.findtext
+        return dict(name = find(element, 'wu_name'),
+                    state = find(element, 'state', -1),
+                    fractionDone = find(element, 'fraction_done', 0),
+                    elapsedCPUtime = find(element, 'elapsed_time') or find(element, 'final_elapsed_time', 0),
+                    remainingCPUtime = find(element, 'estimated_cpu_time_remaining', 0),
+                    checkpointCPUtime = find(element, 'checkpoint_cpu_time'),
+                    currentCPUtime = find(element, 'current_cpu_time'),
+                    deadline = find(element, 'report_deadline'),
+                    schedularState = find(element, 'schedular_state', -1),
+                    active = find(element, 'active_task_state', -1),
+                    memUsage = find(element, 'working_set_size_smoothed', 0),
+                    resources = find(element, 'resources', ''))
+
+    @staticmethod
+    def valuesFromElement(element):
+        """Same as kwargsFromElement, but with typed values for fromValues"""
+        find = util.findtext
+        checkpoint = find(element, 'checkpoint_cpu_time')
+        current = find(element, 'current_cpu_time')
+        if checkpoint is not None and current is not None:
+            checkpoint = float(current) - float(checkpoint)
+        deadline = find(element, 'report_deadline')
+        if deadline is not None:
+            deadline = float(deadline)
+        return dict(name = find(element, 'wu_name', '').replace(' ', ''),
+                    state = int(find(element, 'state', -1)),
+                    fractionDone = float(find(element, 'fraction_done', 0))*100,
+                    elapsedSeconds = float(find(element, 'elapsed_time') or find(element, 'final_elapsed_time', 0)),
+                    remainingSeconds = float(find(element, 'estimated_cpu_time_remaining', 0)),
+                    checkpointSeconds = checkpoint,
+                    deadlineEpoch = deadline,
+                    schedularState = int(find(element, 'schedular_state', -1)),
+                    active = int(find(element, 'active_task_state', -1)),
+                    memUsage = float(find(element, 'working_set_size_smoothed', 0)),
+                    resources = find(element, 'resources', ''))
+
+    def updateFromElement(self, element):
+        """
+        Updates this task in place from a newer <result> element of the same task,
+        so that every reference to this task sees the new state
+        """
+        kwargs = self.kwargsFromElement(element)
+        kwargs['device'] = self.device
+        Task_local.__init__(self, **kwargs)
+
     def done(self):
-        return self.remainingCPUtime_str == '0:00:00'
+        return 0 <= self.remainingSeconds < 1 # remainingCPUtime_str == '0:00:00'
 
     def toString(self):
         s = super(Task_local, self).toString()
@@ -304,14 +475,22 @@ class Task_local(Task):
 
     def setDeadline(self, deadline):
         if deadline is not None:
-            self.deadline = datetime.datetime.fromtimestamp(float(deadline))
+            self.deadlineEpoch = float(deadline)
         else:
-            self.deadline = None
+            self.deadlineEpoch = None
+        Task.generation[0] += 1
+
+    @property
+    def deadline(self):
+        """Deadline as a (naive) local datetime"""
+        if self.deadlineEpoch is None:
+            return None
+        return datetime.datetime.fromtimestamp(self.deadlineEpoch)
 
     @Task.state_str.getter
     def state_str(self):
         if self.__state is None:
-            state = self.desc_state[self.state]
+            state = self.states.values[self.state]
             # Hack
             # The current state seems to be determined by 3 numbers: state, active and schedularState.
             # I have been unable to determine their exact meaning, so the following is based on comparision with the boincManager.
@@ -346,6 +525,7 @@ class Task_local(Task):
     def setSchedularState(self, state):
         self.__state = None
         self.schedularState = int(state)
+        Task.generation[0] += 1
 
     @property
     def active_str(self):
@@ -355,22 +535,23 @@ class Task_local(Task):
     def setActive(self, state):
         self.__state = None
         self.active = int(state)
+        Task.generation[0] += 1
 
     def pendingTime(self, include_elapsedCPUtime=True):
         """Returns seconds for pending, started
         and task waiting for validation.
         """
         def getSeconds(task):
-            ret = task.remainingCPUtime
+            ret = task.remainingSeconds
             if include_elapsedCPUtime:
-                ret += task.elapsedCPUtime
-            return ret.total_seconds()
+                ret += task.elapsedSeconds
+            return round(ret, 6) # microsecond resolution, like the timedeltas
 
         logger.debug('pendingTime, task = %s', self)
         if self.done():
             logger.debug('adding to validation')
             return (0, 0, getSeconds(self))
-        elif self.elapsedCPUtime != datetime.timedelta(0):
+        elif self.elapsedSeconds != 0:
             logger.debug('adding to running')
             return (0, getSeconds(self), 0)
         else:
@@ -378,6 +559,7 @@ class Task_local(Task):
             return (getSeconds(self), 0, 0)
 
 class Task_fileTransfer(Task):
+    __slots__ = ('nbytes', 'nbytesXferred', 'project_url', 'project_name')
     def __init__(self, project_url, project_name, name, nbytes, 
                  status, time_so_far, nbytes_xferred, is_upload):
         kwargs = dict()
@@ -387,14 +569,14 @@ class Task_fileTransfer(Task):
             state = 'downloading'
         nbytes = float(nbytes)
         nbytes_xferred = float(nbytes_xferred)
+        self.nbytes = nbytes
+        self.nbytesXferred = nbytes_xferred
 
         kwargs['elapsedCPUtime'] = time_so_far
         kwargs['name'] = name
         kwargs['state'] = state
         if nbytes != 0:
             kwargs['fractionDone'] = 1 - (nbytes - nbytes_xferred)/nbytes
-        self.bytesDone = '{}B/{}B'.format(util.fmtSi(nbytes_xferred), 
-                                        util.fmtSi(nbytes))
         self.project_url = project_url
         self.project_name = project_name
         Task.__init__(self, **kwargs)
@@ -402,6 +584,11 @@ class Task_fileTransfer(Task):
     def done(self):
         return False            # override superclass since it does a few wierd things with the fractionDone
 
+    @property
+    def bytesDone(self):
+        return '{}B/{}B'.format(util.fmtSi(self.nbytesXferred), 
+                                util.fmtSi(self.nbytes))
+
     def toString(self):
         s = super(Task_fileTransfer, self).toString()
         s[5] = self.bytesDone
@@ -437,8 +624,30 @@ class Task_fileTransfer(Task):
         except Exception as e:
             logger.exception('Trying to create task out of {}, got'.format(xml))
 
+    @staticmethod
+    def createFromElement(element):
+        """
+        Same as createFromXML, but expects the <file_transfer> element
+        from a xml.etree parser
+        """
+        try:
+            find = util.findtext
+            kwargs = dict(project_url = find(element, 'project_url', ''),
+                          project_name = find(element, 'project_name', ''),
+                          name = element.findtext('name', ''),
+                          nbytes = find(element, 'nbytes', 0),
+                          status = find(element, 'status'),
+                          time_so_far = find(element, 'time_so_far', 0),
+                          nbytes_xferred = find(element, 'last_bytes_xferred', 0),
+                          is_upload = find(element, 'is_upload', 0))
+            return Task_fileTransfer(**kwargs)
+        except Exception as e:
+            logger.exception('Trying to create task out of element {}, got'.format(element.findtext('name')))
+
 class Task_web(Task):
+    __slots__ = ('grantedCredit', 'claimedCredit')
     fmt_date = '%d %b %Y %H:%M:%S UTC'
+    valueDefaults = dict(grantedCredit=0., claimedCredit=0.)
 
     def __init__(self, claimedCredit='0', grantedCredit='0', **kwargs):
         self.setGrantedCredit(grantedCredit) # stored as float
@@ -478,6 +687,7 @@ class Task_web(Task):
         if grantedCredit == 'pending':
             grantedCredit = '0'
         self.grantedCredit = self.toFloat(grantedCredit)
+        Task.generation[0] += 1
 
     @property
     def claimedCredit_str(self):
@@ -488,8 +698,26 @@ class Task_web(Task):
 
     def setClaimedCredit(self, claimedCredit):
         self.claimedCredit = self.toFloat(claimedCredit)
+        Task.generation[0] += 1
+
+    # States which will not change again on the web page, see watermark.Watermark
+    finalStates = frozenset(Task.states.code(state) for state in ('valid', 'invalid', 'error', 'aborted'))
+
+    @property
+    def isFinal(self):
+        return self.state in self.finalStates
+
+    webStates = dict()          # web state string -> state code, since the same few strings are repeated for every task
 
     def setState(self, state):
+        try:
+            self.state = self.webStates[state]
+            Task.generation[0] += 1
+            return
+        except KeyError:
+            pass
+
+        webState = state
         if state.lower() == 'completed and validated':
             state = 'valid'
         elif state.lower() == 'over success done':
@@ -508,8 +736,10 @@ class Task_web(Task):
             state = 'error'
 
         super(Task_web, self).setState(state)
+        self.webStates[webState] = self.state
 
 class Task_web_worldcommunitygrid(Task_web):
+    __slots__ = ()
     #fmt_date = '%m/%d/%y %H:%M:%S'
     fmt_date = '%Y-%m-%dT%H:%M:%S'
     desc_serverState = ['unknown', 'unknown', 'unknown', 'unknown',
@@ -521,8 +751,8 @@ class Task_web_worldcommunitygrid(Task_web):
                           'Error: no check',             # 3
                           'pending verification', 'too late'] # 4, 5
 
-    def strToTimedelta(self, hours):
-        return datetime.timedelta(hours=self.toFloat(hours))
+    def strToSeconds(self, hours):
+        return self.toFloat(hours)*3600
 
     def __init__(self, serverState, outcome, validateState, **kwargs):
         state = self.getState(serverState, outcome, validateState)
@@ -570,6 +800,7 @@ class Task_web_worldcommunitygrid(Task_web):
         
 
 class Task_web_yoyo(Task_web):
+    __slots__ = ()
     @staticmethod
     def createFromHTML(data):
         assert len(data) == 9, 'vops, data not recognized %s' % data
@@ -588,6 +819,7 @@ class Task_web_yoyo(Task_web):
                              claimedCredit=claimedCredit, grantedCredit=grantedCredit)
 
 class Task_web_climateprediction(Task_web):
+    __slots__ = ('workUnitId', 'stateWebStr', 'created', 'tasks') # created and tasks are set by parse.HTMLParser_climateprediction
     def __init__(self, workUnitId=None, stateWebStr='', **kwargs):
         self.workUnitId = workUnitId
         self.stateWebStr = stateWebStr
@@ -639,6 +871,7 @@ class Task_web_climateprediction(Task_web):
                         claimedCredit=claimedCredit, grantedCredit=grantedCredit)
 
 class Task_web_rosetta(Task_web):
+    __slots__ = ()
     @staticmethod
     def createFromHTML(data):
         # [u'824244685', u'746438930', u'15 May 2016 0:12:51 UTC', u'15 May 2016 19:03:33 UTC', u'Over', u'Success', u'Done', u'10,429.85', u'104.80', u'115.68']
@@ -666,17 +899,42 @@ class Task_jobLog(Task):
         fe - rsc_fpops_est, estimated flops
         et - final_elapsed_time, clock time to finish    
     """
+    __slots__ = ('timeEpoch', 'estimated_runtime_uncorrected', 'rsc_fpops_est', 'final_elapsed_time',
+                 'credit')      # credit is set by plot.jobLog.merge
+    valueDefaults = dict(fractionDone=100., timeEpoch=0, estimated_runtime_uncorrected=0.,
+                         rsc_fpops_est=0., final_elapsed_time=0.)
     def __init__(self, time, name, 
                  ue, ct, fe, et):
-        super(Task_jobLog, self).__init__(name=name, fractionDone='100',
+        super(Task_jobLog, self).__init__(name=name, fractionDone='1',
                                           elapsedCPUtime=ct, remainingCPUtime='0')
         self.setTime(time)
         # Lets just keep it simple, float already has a sane str() version
         self.estimated_runtime_uncorrected = float(ue)
-        self.final_cpu_time = float(ct)
         self.rsc_fpops_est = float(fe)
         self.final_elapsed_time = float(et)
 
+    @classmethod
+    def fromValues(cls, timeEpoch, name, elapsedSeconds,
+                   estimated_runtime_uncorrected, rsc_fpops_est, final_elapsed_time):
+        """
+        Same as Task.fromValues, but the job log always has the same fields,
+        so every slot is assigned directly instead of going through valueDefaults.
+        """
+        self = cls.__new__(cls)
+        self.name = name
+        self.device = 'localhost'
+        self.state = cls.unknown
+        self.fractionDone = 100.
+        self.elapsedSeconds = elapsedSeconds
+        self.remainingSeconds = 0.
+        self.checkpointSeconds = None
+        self.deadlineEpoch = None
+        self.timeEpoch = timeEpoch
+        self.estimated_runtime_uncorrected = estimated_runtime_uncorrected
+        self.rsc_fpops_est = rsc_fpops_est
+        self.final_elapsed_time = final_elapsed_time
+        return self
+
     @staticmethod
     def createFromJobLog(line):
         """
@@ -684,22 +942,60 @@ class Task_jobLog(Task):
         """
         s = line.split()
         assert len(s) in (11, 13), 'Line in job log not recognized {0} "{1}" -> "{2}"'.format(len(s), line, s)
-        return Task_jobLog(time=s[0], name=s[8],
-                           ue=s[2], ct=s[4], fe=s[6], et=s[10])
+        return Task_jobLog.fromValues(timeEpoch=int(s[0]), name=s[8],
+                                      elapsedSeconds=float(s[4]),
+                                      estimated_runtime_uncorrected=float(s[2]),
+                                      rsc_fpops_est=float(s[6]),
+                                      final_elapsed_time=float(s[10]))
+
+    @property
+    def final_cpu_time(self):
+        return self.elapsedSeconds
+
+    @property
+    def time(self):
+        return datetime.datetime.fromtimestamp(self.timeEpoch)
 
     def setTime(self, value):
-        t = int(value)
-        self.time = datetime.datetime.fromtimestamp(t)
+        self.timeEpoch = int(value)
+        Task.generation[0] += 1
 
     def toString(self):
         s = super(Task_jobLog, self).toString()
         s.insert(0, self.time.isoformat())
         return s
 
+_slotNames = dict()
+def slotNames(cls):
+    """All slot attribute names of cls and its base classes, with private names mangled"""
+    try:
+        return _slotNames[cls]
+    except KeyError:
+        names = list()
+        for c in cls.__mro__:
+            for slot in c.__dict__.get('__slots__', ()):
+                if slot.startswith('__') and not(slot.endswith('__')):
+                    slot = '_%s%s' % (c.__name__.lstrip('_'), slot)
+                names.append(slot)
+        _slotNames[cls] = names
+        return names
+
+_valueDefaults = dict()
+def allValueDefaults(cls):
+    """List of (slot, default) from valueDefaults of cls and its base classes, see Task.fromValues"""
+    try:
+        return _valueDefaults[cls]
+    except KeyError:
+        defaults = dict()
+        for c in reversed(cls.__mro__):
+            defaults.update(c.__dict__.get('valueDefaults', {}))
+        _valueDefaults[cls] = list(defaults.items())
+        return _valueDefaults[cls]
+
 def adjustColumnSpacing(tasks):
     """
     Not Thread safe, modifies the Task.columnSpacing for equal columns.
-    Call this before printing list of tasks
+    Call this before printing list of tasks, or use textTable.TextTable which has no global state.
     """
     for t in tasks:
         for ix, item in enumerate(t.toString()):
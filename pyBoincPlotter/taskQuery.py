@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Filtered and paged listing of tasks, see TaskQuery.
+"""
+# Standard python imports
+import time
+import heapq
+import datetime
+import itertools
+import logging
+logger = logging.getLogger('boinc.taskQuery')
+
+# non standard:
+import numpy as np
+# This project
+from task import Task
+from textTable import TextTable
+from util import timedeltaToStr
+
+class TaskQuery(object):
+    """
+    Selects which tasks to show and in what order.
+    states:   list of state strings, like 'running' or 'ready to report'
+    projects: list of strings, a project matches if any of them is part of its name or url (case insensitive)
+    deadline: (start, end) in seconds from now, either may be None. Use a negative start for overdue tasks.
+    device:   list of device (host) names
+    sort:     one of sortKeys, prefix with '-' for descending order
+    page_size and page (starting at 0) selects the rows shown, page_size=None shows all.
+    """
+    sortKeys = {'name': 'name',
+                'state': 'state_str',
+                'done': 'fractionDone',
+                'elapsed': 'elapsedSeconds',
+                'remaining': 'remainingSeconds',
+                'deadline': 'deadlineEpoch',
+                'device': 'device'}
+
+    def __init__(self, states=None, projects=None, deadline=None, device=None,
+                 sort=None, page_size=50, page=0):
+        self.states = None
+        if states:
+            self.states = set(s.lower() for s in states)
+        self.projects = None
+        if projects:
+            self.projects = [p.lower() for p in projects]
+        self.deadline = deadline
+        self.device = None
+        if device:
+            self.device = set(device)
+
+        self.sort = sort
+        self.reverse = False
+        if sort is not None:
+            if sort.startswith('-'):
+                self.reverse = True
+                sort = sort[1:]
+            if sort not in self.sortKeys:
+                raise ValueError('Unknown sort key "%s", expected one of %s' % (sort, sorted(self.sortKeys)))
+            self.sortAttr = self.sortKeys[sort]
+        self.page_size = page_size
+        self.page = page
+
+    def matchProject(self, project):
+        if self.projects is None:
+            return True
+        names = [str(project.name).lower(), str(project.url).lower()]
+        for p in self.projects:
+            for name in names:
+                if p in name:
+                    return True
+        return False
+
+    def match(self, task, now):
+        if self.states is not None and task.state_str not in self.states:
+            return False
+        if self.device is not None and task.device not in self.device:
+            return False
+        if self.deadline is not None:
+            deadline = getattr(task, 'deadlineEpoch', None)
+            if deadline is None:
+                return False
+            start, end = self.deadline
+            if start is not None and deadline < now + start:
+                return False
+            if end is not None and deadline > now + end:
+                return False
+        return True
+
+    def filter(self, projects):
+        """Generator of (project, task) for the matching tasks, in the same order as pretty_print"""
+        now = time.time()
+        for key, p in sorted(projects.items()):
+            if not(self.matchProject(p)):
+                continue
+            for t in p.tasks():
+                if self.match(t, now):
+                    yield p, t
+
+    def sortKey(self, item):
+        value = getattr(item[1], self.sortAttr, None)
+        # None (e.g. unknown deadline) is placed last, also when reversed
+        if self.reverse:
+            return (value is not None, value)
+        else:
+            return (value is None, value)
+
+    def select(self, projects):
+        """Returns the (project, task) pairs on the current page, and whether there are more matching tasks.
+        Without sorting the filter stops as soon as the page is full,
+        with sorting only the page_size*(page + 1) first tasks are kept (heapq)."""
+        matches = self.filter(projects)
+        start = 0
+        stop = None
+        if self.page_size is not None:
+            start = self.page_size*self.page
+            stop = start + self.page_size + 1 # one extra to know if there are more
+
+        if self.sort is not None:
+            if stop is None:
+                matches = sorted(matches, key=self.sortKey, reverse=self.reverse)
+            elif self.reverse:
+                matches = heapq.nlargest(stop, matches, key=self.sortKey)
+            else:
+                matches = heapq.nsmallest(stop, matches, key=self.sortKey)
+
+        rows = list(itertools.islice(matches, start, stop))
+        more = False
+        if self.page_size is not None and len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            more = True
+        return rows, more
+
+    def summary(self, project):
+        """One line summary of the project from the TaskTable aggregates, no task is formatted"""
+        counts = np.zeros(len(Task.states), dtype=int)
+        pending = np.zeros(3)
+        for app in project.applications.values():
+            c = app.tasks.stateBincount()
+            counts[:len(c)] += c
+            pending += app.tasks.pendingTime()
+
+        ret = "{}: {} tasks".format(project.name, int(counts.sum()))
+        states = ["{} {}".format(counts[code], Task.states.values[code]) for code in np.flatnonzero(counts)]
+        if len(states) != 0:
+            ret += " ({})".format(", ".join(states))
+        if pending.sum() != 0:
+            ret += ", pending {}, running {}, validation {}".format(*[timedeltaToStr(datetime.timedelta(seconds=s))
+                                                                     for s in pending])
+        return ret
+
+    def appendTo(self, table, projects):
+        """Adds the project summaries and the current page of tasks to the TextTable"""
+        for key, p in sorted(projects.items()):
+            if self.matchProject(p):
+                table.append(self.summary(p))
+        table.append('')
+
+        rows, more = self.select(projects)
+        for p, t in rows:
+            table.appendRow([p.name] + t.toString())
+
+        if self.page_size is None:
+            return
+        first = self.page*self.page_size
+        if len(rows) == 0:
+            table.append('No matching tasks on page {}'.format(self.page))
+        else:
+            s = 'Showing tasks {}-{}'.format(first + 1, first + len(rows))
+            if more:
+                s += ', more on page {}'.format(self.page + 1)
+            table.append(s)
+
+def pretty_print(projects, query, f=None):
+    table = TextTable()
+    query.appendTo(table, projects)
+    table.write(f)
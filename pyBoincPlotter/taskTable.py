@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Columnar storage for the tasks of an application, see TaskTable.
+"""
+# Standard python imports
+import logging
+logger = logging.getLogger('boinc.taskTable')
+
+# non standard:
+import numpy as np
+# This project
+from task import Task
+
+class Pool(object):
+    """Interns values (names) as small integer codes, for a single table"""
+    def __init__(self):
+        self.values = list()
+        self.codes = dict()
+
+    def code(self, value):
+        try:
+            return self.codes[value]
+        except KeyError:
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+            return self.codes[value]
+
+    def __len__(self):
+        return len(self.values)
+
+class TaskTable(list):
+    """
+    List of Task objects which also keeps the task attributes as numpy columns,
+    so that aggregations (pendingTime, stateCounts) are array reductions.
+    The columns in columnDefaults are created in a single pass on first use,
+    any other attribute is added by column(attr). Names are stored as codes into
+    the names pool and state strings as codes from the shared Task.states registry.
+
+    The columns and cached aggregates are thrown away whenever the list is modified
+    or a task setter has been called since they were created (see Task.generation).
+    Assigning task attributes directly, bypassing the setters, needs a call to changed().
+    """
+    # attribute -> value used for tasks without it (or where it is None)
+    columnDefaults = dict(fractionDone=0,
+                          elapsedSeconds=0,
+                          remainingSeconds=0,
+                          deadlineEpoch=np.nan,
+                          grantedCredit=0,
+                          memUsage=0)
+
+    def __init__(self, tasks=()):
+        list.__init__(self, tasks)
+        self._columns = None
+        self._aggregates = dict() # (method, arguments) -> result, like pendingTime
+        self._generation = Task.generation[0]
+
+    def changed(self):
+        # Assigned rather than cleared, unpickling appends the tasks before the state is set
+        self._columns = None
+        self._aggregates = dict()
+        self._generation = Task.generation[0]
+
+    def upToDate(self):
+        """Throws away the columns if any task has been modified since they were created"""
+        if self._generation != Task.generation[0]:
+            self.changed()
+
+    def __getstate__(self):
+        """The columns are not pickled, they are recreated on first use"""
+        state = dict(self.__dict__)
+        state['_columns'] = None
+        state['_aggregates'] = dict()
+        state['_generation'] = None
+        state.pop('names', None)
+        return state
+
+    def createColumns(self):
+        n = len(self)
+        columns = dict()
+        for attr in self.columnDefaults:
+            columns[attr] = np.empty(n)
+        columns['name'] = np.empty(n, dtype=np.int32)
+        columns['state'] = np.empty(n, dtype=np.int32)
+        columns['local'] = np.empty(n, dtype=bool) # has a pendingTime, i.e. Task_local
+        columns['done'] = np.empty(n, dtype=bool)
+        self.names = Pool()
+
+        items = list(self.columnDefaults.items())
+        for ix, t in enumerate(self):
+            for attr, default in items:
+                value = getattr(t, attr, None)
+                columns[attr][ix] = default if value is None else value
+            columns['name'][ix] = self.names.code(t.name)
+            columns['state'][ix] = Task.states.code(t.state_str)
+            columns['local'][ix] = hasattr(t, 'pendingTime')
+            columns['done'][ix] = t.done()
+        return columns
+
+    def column(self, attr, default=np.nan):
+        """Numpy array of the given task attribute, with default where the task does not have it"""
+        self.upToDate()
+        if self._columns is None:
+            self._columns = self.createColumns()
+        try:
+            return self._columns[attr]
+        except KeyError:
+            pass
+
+        values = list()
+        for t in self:
+            value = getattr(t, attr, None)
+            values.append(default if value is None else value)
+        self._columns[attr] = np.array(values, dtype=float)
+        return self._columns[attr]
+
+    def pendingTime(self, include_elapsedCPUtime=True):
+        """Same as Application.pendingTime, returns total seconds for
+        pending, started and tasks waiting for validation.
+        The result is kept until the table changes."""
+        self.upToDate()
+        key = ('pendingTime', include_elapsedCPUtime)
+        try:
+            return self._aggregates[key]
+        except KeyError:
+            pass
+
+        seconds = self.column('remainingSeconds')
+        if include_elapsedCPUtime:
+            seconds = seconds + self.column('elapsedSeconds')
+        seconds = np.round(seconds, 6) # microsecond resolution, like Task_local.pendingTime
+
+        local = self.column('local')
+        done = self.column('done')
+        started = self.column('elapsedSeconds') != 0
+        validation = seconds[local & done].sum()
+        running = seconds[local & ~done & started].sum()
+        pending = seconds[local & ~done & ~started].sum()
+        self._aggregates[key] = (float(pending), float(running), float(validation))
+        return self._aggregates[key]
+
+    def stateBincount(self):
+        """Number of tasks for each state code in Task.states"""
+        return np.bincount(self.column('state'), minlength=len(Task.states))
+
+    def stateCounts(self):
+        """Dictionary of state_str -> number of tasks"""
+        counts = self.stateBincount()
+        return dict((Task.states.values[code], int(counts[code])) for code in np.flatnonzero(counts))
+
+def _modifies(name):
+    method = getattr(list, name)
+    def wrapper(self, *args, **kwargs):
+        self.changed()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'sort', 'reverse', 'clear',
+              '__setitem__', '__delitem__', '__setslice__', '__delslice__', '__iadd__', '__imul__'):
+    if hasattr(list, _name):    # clear is python 3 only, the slice ones python 2 only
+        setattr(TaskTable, _name, _modifies(_name))
@@ -0,0 +1,255 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Micro benchmarks for the hot paths, run with
+python benchmark.py <name>
+from the pyBoincPlotter folder (same as the tests).
+"""
+# Standard python
+import argparse
+import datetime
+import timeit
+try:
+    import tracemalloc          # python 3.4
+except ImportError:
+    tracemalloc = None
+# This project
+import boinccmd
+import task
+import project
+import application
+import parse_input
+from rpc_server import Server, synthesizeState
+
+def readReply(scale=1):
+    """The recorded get_state reply, with the body repeated scale times (no longer valid xml when scale > 1)"""
+    with open(parse_input.boinccmd, 'rb') as f:
+        reply = f.read()
+    return reply*scale
+
+def recv_end_decodeSplit(sock):
+    """The previous line framing, decodes and splits each 4096 byte chunk. Kept for comparison."""
+    End = '\003'
+    previous_data = ''
+    more_data = True
+    while more_data:
+        data = previous_data + sock.recv(4096).decode()
+        data = data.split('\n')
+        previous_data = ''
+        for line_ix in range(len(data)):
+            if End in data[line_ix]:
+                more_data = False
+                break
+            elif line_ix == len(data)-1:
+                previous_data = data[line_ix]
+            else:
+                yield data[line_ix]
+
+        ix = data[line_ix].find(End)
+        if ix != -1:
+            yield data[line_ix][:ix]
+
+def best(func, number=10, repeat=3):
+    """Best time in seconds for a single call of func"""
+    return min(timeit.repeat(func, number=number, repeat=repeat))/number
+
+def report(name, seconds, nbytes):
+    print('{0:<30} {1:8.2f} ms {2:8.1f} MB/s'.format(name, seconds*1e3, nbytes/seconds/1e6))
+
+def benchmark_framing(scale=20):
+    """Receiving a (scaled up) get_state reply, without parsing"""
+    reply = readReply(scale)
+    with Server(dict(get_state=reply)) as server, boinccmd.Boinccmd('127.0.0.1', server.port) as sock:
+        def old():
+            sock.send_request('get_state')
+            for line in recv_end_decodeSplit(sock):
+                pass
+        def lines():
+            for line in sock.request('get_state'):
+                pass
+        def chunks():
+            for chunk in sock.request_raw('get_state'):
+                pass
+
+        print('Reply of {0:.1f} MB'.format(len(reply)/1e6))
+        report('decode and split per chunk', best(old), len(reply))
+        report('recv_end', best(lines), len(reply))
+        report('recv_chunks', best(chunks), len(reply))
+
+def benchmark_parse():
+    """Receiving and parsing the recorded get_state reply"""
+    reply = readReply()
+    with Server(dict(get_state=reply)) as server, boinccmd.Connection('127.0.0.1', server.port) as connection:
+        def lines():
+            parser = boinccmd.Parse_stateStream()
+            for line in connection.request('get_state'):
+                parser.feed(line)
+        def raw():
+            boinccmd.get_state_command(connection=connection)
+
+        report('Parse_stateStream lines', best(lines), len(reply))
+        report('Parse_stateStream raw', best(raw), len(reply))
+
+def measure_get_state(server, number=3):
+    """Best end-to-end get_state() time and the peak and retained memory of a single call,
+    the memory is None without tracemalloc"""
+    with boinccmd.Connection('127.0.0.1', server.port) as connection:
+        seconds = best(lambda: boinccmd.get_state(connection=connection), number=number, repeat=1)
+        if tracemalloc is None:
+            return seconds, None, None, boinccmd.get_state(connection=connection)
+        tracemalloc.start()
+        projects = boinccmd.get_state(connection=connection)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak, retained, projects
+
+def benchmark_get_state(results=10000, projects=50):
+    """End-to-end get_state() against the stand-in server, recorded and synthesized replies,
+    in one piece and trickling in 4096 byte chunks"""
+    synthesized = synthesizeState(results, projects)
+    if tracemalloc is None:
+        print('{0:<40} {1:>10} {2:>7}'.format('', 'time', 'tasks'))
+    else:
+        print('{0:<40} {1:>10} {2:>10} {3:>10} {4:>7}'.format('', 'time', 'peak', 'retained', 'tasks'))
+    for name, reply, kwargs in [('recorded', readReply(), dict()),
+                                ('synthesized', synthesized, dict()),
+                                ('synthesized, 4096 byte chunks', synthesized, dict(chunkSize=4096)),
+                                ('synthesized, 1 ms latency', synthesized, dict(latency=1e-3))]:
+        replies = dict(get_state=reply, get_file_transfers=parse_input.file_transfers)
+        with Server(replies, **kwargs) as server:
+            seconds, peak, retained, prjs = measure_get_state(server)
+        tasks = sum(len(list(p.tasks())) for p in prjs.values())
+        if tracemalloc is None:
+            print('{0:<40} {1:7.1f} ms {2:7d}'.format(name, seconds*1e3, tasks))
+        else:
+            print('{0:<40} {1:7.1f} ms {2:7.1f} MB {3:7.1f} MB {4:7d}'.format(name, seconds*1e3, peak/1e6,
+                                                                            retained/1e6, tasks))
+
+class DictJobLog(object):
+    """Baseline for benchmark_memory, the attributes and types Task_jobLog kept
+    in the instance __dict__ before __slots__ and float seconds"""
+    def __init__(self, time, name, ue, ct, fe, et):
+        self.name = name
+        self.device = 'localhost'
+        self.state = 0
+        self.fractionDone = 100.
+        self.elapsedCPUtime = datetime.timedelta(seconds=float(ct))
+        self.remainingCPUtime = datetime.timedelta(seconds=0)
+        self.checkpoint = None
+        self.deadline = None
+        self.time = datetime.datetime.fromtimestamp(int(time))
+        self.estimated_runtime_uncorrected = float(ue)
+        self.final_cpu_time = float(ct)
+        self.rsc_fpops_est = float(fe)
+        self.final_elapsed_time = float(et)
+
+    @staticmethod
+    def createFromJobLog(line):
+        s = line.split()
+        return DictJobLog(time=s[0], name=s[8], ue=s[2], ct=s[4], fe=s[6], et=s[10])
+
+def benchmark_memory(n=100000):
+    """Bytes per task for n Task_jobLog instances, as read from the job log,
+    compared to the dict backed baseline"""
+    if tracemalloc is None:
+        print('Skipped, needs tracemalloc (python 3.4)')
+        return
+    lines = ['%d ue %f ct %f fe %f nm task_%d_0 et %f' % (1374666070 + 600*ix, 3600.5, 3500.25, 5e13, ix, 3550.75)
+             for ix in range(n)]
+    for name, Task in [('dict baseline', DictJobLog), ('Task_jobLog', task.Task_jobLog)]:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tasks = [Task.createFromJobLog(line) for line in lines]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print('{0:<30} {1} tasks: {2:.1f} MB, {3:.0f} bytes per task'.format(name, len(tasks), (after - before)/1e6,
+                                                                            (after - before)/float(len(tasks))))
+        del tasks
+
+def benchmark_apps(results=20000, apps=200):
+    """Parsing a synthesized get_state with many applications in a single project"""
+    reply = synthesizeState(results, projects=1, apps=apps)
+    def parse():
+        parser = boinccmd.Parse_stateStream()
+        parser.feedRaw(reply)
+    report('parse {0} apps, {1} results'.format(apps, results), best(parse, number=1), len(reply))
+
+    tasks = [task.Task_local(name='wu_%d' % ix) for ix in range(results)]
+    def append():
+        prj = project.Project('http://project.example.org')
+        for ix in range(apps):
+            prj.appendApplicationShort('app%d' % ix)
+        for ix, t in enumerate(tasks):
+            prj.appendWorkunit(t.name, 'app%d' % (ix % apps))
+            prj.appendResult(t)
+    seconds = best(append, number=1)
+    print('{0:<30} {1:8.2f} ms {2:8.2f} us per result'.format('appendResult', seconds*1e3, seconds/results*1e6))
+
+def benchmark_merge(web=50000, local=1000):
+    """mergeApplications of local tasks into an application with many web tasks"""
+    webTasks = [task.Task_web(name='faah%08d_ZINC_xBr27_A_PR_02_0--' % ix, state='in progress')
+                for ix in range(web)]
+    localTasks = [task.Task_local(name='faah%08d_ZINC_xBr27_A_PR_02' % ix) for ix in range(0, web, web//local)]
+    def merge():
+        local_app = application.Application('FightAIDS@Home (faah)', tasks=localTasks)
+        web_app = application.Application('FightAIDS@Home (faah)', tasks=webTasks)
+        application.mergeApplications(local_app, web_app)
+    seconds = best(merge, number=1)
+    print('{0:<30} {1:8.2f} ms'.format('{0} local into {1} web'.format(len(localTasks), web), seconds*1e3))
+
+def benchmark_construct(n=100000):
+    """Task_jobLog construction from the same split job log lines,
+    string setters (__init__) compared to converting the fields and calling fromValues"""
+    lines = ['%d ue %f ct %f fe %f nm task_%d_0 et %f' % (1374666070 + 600*ix, 3600.5, 3500.25, 5e13, ix, 3550.75)
+             for ix in range(n)]
+    split = [line.split() for line in lines]
+    def strings():
+        for s in split:
+            task.Task_jobLog(time=s[0], name=s[8], ue=s[2], ct=s[4], fe=s[6], et=s[10])
+    def values():
+        for s in split:
+            task.Task_jobLog.fromValues(timeEpoch=int(s[0]), name=s[8],
+                                        elapsedSeconds=float(s[4]),
+                                        estimated_runtime_uncorrected=float(s[2]),
+                                        rsc_fpops_est=float(s[6]),
+                                        final_elapsed_time=float(s[10]))
+    for name, func in [('__init__', strings), ('fromValues', values)]:
+        seconds = best(func, number=1)
+        print('{0:<30} {1:8.2f} ms {2:8.2f} us per task'.format(name, seconds*1e3, seconds/n*1e6))
+
+benchmarks = dict(framing=benchmark_framing,
+                  apps=benchmark_apps,
+                  parse=benchmark_parse,
+                  get_state=benchmark_get_state,
+                  merge=benchmark_merge,
+                  construct=benchmark_construct,
+                  memory=benchmark_memory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs micro benchmarks')
+    parser.add_argument('name', nargs='*', help='Any of {0}, default is to run all'.format(sorted(benchmarks)))
+    args = parser.parse_args()
+    for name in args.name:
+        if name not in benchmarks:
+            parser.error('Unknown benchmark "{0}"'.format(name))
+
+    for name in args.name or sorted(benchmarks):
+        print('== {0} =='.format(name))
+        benchmarks[name]()
@@ -342,3 +342,25 @@ application="""<app>
     <user_friendly_name>FightAIDS@Home</user_friendly_name>
     <non_cpu_intensive>0</non_cpu_intensive>
 </app>"""
+
+file_transfers = """<boinc_gui_rpc_reply>
+<file_transfers>
+<file_transfer>
+    <project_url>http://www.worldcommunitygrid.org/</project_url>
+    <project_name>World Community Grid</project_name>
+    <name>faah43852_ZINC31355285_xBr27_refmac2_A_PR_02_0_0</name>
+    <nbytes>1048576.000000</nbytes>
+    <max_nbytes>0.000000</max_nbytes>
+    <status>0</status>
+    <persistent_file_xfer>
+        <num_retries>0</num_retries>
+        <first_request_time>1374079473.000000</first_request_time>
+        <next_request_time>1374079473.000000</next_request_time>
+        <time_so_far>12.500000</time_so_far>
+        <last_bytes_xferred>524288.000000</last_bytes_xferred>
+        <is_upload>1</is_upload>
+    </persistent_file_xfer>
+</file_transfer>
+</file_transfers>
+</boinc_gui_rpc_reply>
+"""
@@ -0,0 +1,285 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Stand-in for the boinc client GUI RPC, for tests and offline benchmarks.
+Replays recorded replies (see record) or synthesized ones (see synthesizeState)
+over a local socket using the same \\003 framing as boinc, with optional
+chunking and latency to mimic a slow or remote client.
+
+python rpc_server.py record <folder>
+python rpc_server.py serve --folder <folder>
+python rpc_server.py serve --results 10000 --projects 50
+"""
+# Standard python
+import os
+import re
+import copy
+import time
+import socket
+import threading
+import argparse
+import xml.etree.ElementTree as ElementTree
+# This project
+import boinccmd
+import parse_input
+
+End = b'\003'
+Nonce = '1234.5'
+
+def reply(body):
+    """Wraps body in <boinc_gui_rpc_reply>"""
+    return '<boinc_gui_rpc_reply>\n%s</boinc_gui_rpc_reply>\n' % body
+
+def requestName(request):
+    """The rpc name of request, 'get_state' for '<boinc_gui_rpc_request>\\n<get_state/>...'"""
+    match = re.search(r'<boinc_gui_rpc_request>\s*<(\w+)', request)
+    if match is None:
+        return ''
+    return match.group(1)
+
+def recorded():
+    """The replies recorded for the tests"""
+    with open(parse_input.boinccmd, 'rb') as f:
+        state = f.read()
+    return dict(get_state=state,
+                get_file_transfers=parse_input.file_transfers)
+
+# 
+# Recording
+# 
+def record(connection, folder, commands=('get_state', 'get_file_transfers', 'get_cc_status',
+                                         'get_results', 'get_project_status')):
+    """Saves the raw reply of each command to folder/<command>.xml"""
+    if not(os.path.exists(folder)):
+        os.makedirs(folder)
+    for command in commands:
+        filename = os.path.join(folder, command + '.xml')
+        with open(filename, 'wb') as f:
+            for chunk in connection.request_raw(command):
+                f.write(chunk)
+
+def loadRecording(folder):
+    """Reads the replies saved by record, keyed by rpc name"""
+    replies = dict()
+    for filename in os.listdir(folder):
+        name, ext = os.path.splitext(filename)
+        if ext == '.xml':
+            with open(os.path.join(folder, filename), 'rb') as f:
+                replies[name] = f.read()
+    return replies
+
+# 
+# Synthesizing
+# 
+def synthesizeState(results=10000, projects=50, apps=3, active=4):
+    """A valid get_state reply with the given number of results spread over
+    projects*apps applications, the first active results of each project are running.
+    The project, app, workunit and result blocks are copies of the recorded ones."""
+    root = ElementTree.fromstring(recorded()['get_state'])
+    client_state = root.find('client_state')
+    templates = dict()
+    for tag in ('project', 'app', 'app_version', 'workunit', 'result'):
+        for element in client_state.findall(tag):
+            if tag != 'result' or element.find('active_task') is not None:
+                templates.setdefault(tag, element)
+            client_state.remove(element)
+    for element in client_state.findall('file_info'):
+        client_state.remove(element)
+
+    def new(tag, **texts):
+        element = copy.deepcopy(templates[tag])
+        for key, value in texts.items():
+            element.find(key).text = str(value)
+        return element
+
+    position = list(client_state).index(client_state.find('time_stats')) + 1
+    blocks = list()
+    for p in range(projects):
+        url = 'http://project%d.example.org/' % p
+        blocks.append(new('project', master_url=url, project_name='Project %d' % p))
+        for a in range(apps):
+            app_name = 'app%d' % a
+            blocks.append(new('app', name=app_name, user_friendly_name='Application %d' % a))
+            blocks.append(new('app_version', app_name=app_name))
+
+        n = results//projects + (p < results % projects)
+        for r in range(n):
+            wu_name = 'wu_%d_%d' % (p, r)
+            blocks.append(new('workunit', name=wu_name, app_name='app%d' % (r % apps)))
+            result = new('result', name=wu_name + '_0', wu_name=wu_name, project_url=url)
+            if r >= active:
+                result.remove(result.find('active_task'))
+            blocks.append(result)
+    client_state[position:position] = blocks
+    return ElementTree.tostring(root) + b'\n'
+
+# 
+# Serving
+# 
+class Server(object):
+    """Answers each request with replies[rpc name] on a local socket,
+    where the reply is bytes, a string or a callable taking the request string.
+
+    password:  requires the auth1/auth2 handshake (nonce is always Nonce)
+    chunkSize: sends the reply in pieces of this many bytes, with chunkDelay seconds in between
+    latency:   seconds to wait before each reply
+    hangUp:    closes the connection after this many requests
+    """
+    def __init__(self, replies=None, password=None, chunkSize=None, chunkDelay=0,
+                 latency=0, hangUp=None, port=0):
+        if replies is None:
+            replies = recorded()
+        self.replies = replies
+        self.password = password
+        self.chunkSize = chunkSize
+        self.chunkDelay = chunkDelay
+        self.latency = latency
+        self.hangUp = hangUp
+        self.accepted = 0
+        self.requests = list()
+
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.target = '127.0.0.1:%d' % self.port
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                return
+            self.accepted += 1
+            thread = threading.Thread(target=self.handle, args=(conn, ))
+            thread.daemon = True
+            thread.start()
+
+    def handle(self, conn):
+        count = 0
+        pending = b''
+        try:
+            while self.hangUp is None or count < self.hangUp:
+                while not(End in pending):
+                    data = conn.recv(65536)
+                    if len(data) == 0:
+                        return
+                    pending += data
+                request, pending = pending.split(End, 1)
+                request = request.decode()
+                self.requests.append(request)
+                count += 1
+
+                data = self.answer(request)
+                if not(isinstance(data, bytes)):
+                    data = data.encode()
+                if self.latency:
+                    time.sleep(self.latency)
+                self.send(conn, data + End)
+        except socket.error:
+            pass
+        finally:
+            conn.close()
+
+    def send(self, conn, data):
+        if self.chunkSize is None:
+            conn.sendall(data)
+            return
+
+        view = memoryview(data)
+        for ix in range(0, len(data), self.chunkSize):
+            if ix != 0 and self.chunkDelay:
+                time.sleep(self.chunkDelay)
+            conn.sendall(view[ix:ix+self.chunkSize])
+
+    def answer(self, request):
+        name = requestName(request)
+        if self.password is not None:
+            if name == 'auth1':
+                return reply('<nonce>%s</nonce>\n' % Nonce)
+            elif name == 'auth2':
+                if boinccmd.authRequest(Nonce, self.password) in request:
+                    return reply('<authorized/>\n')
+                else:
+                    return reply('<unauthorized/>\n')
+
+        try:
+            data = self.replies[name]
+        except KeyError:
+            return reply('<error>unrecognized op: %s</error>\n' % name)
+        if callable(data):
+            return data(request)
+        return data
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Records or replays boinc GUI RPC replies')
+    subparsers = parser.add_subparsers(dest='action')
+    parser_record = subparsers.add_parser('record', help='Record replies from a running boinc client')
+    parser_record.add_argument('folder')
+    parser_record.add_argument('--host', default='')
+    parser_record.add_argument('--port', type=int, default=31416)
+    parser_record.add_argument('--password', default=None)
+
+    parser_serve = subparsers.add_parser('serve', help='Replay recorded or synthesized replies')
+    parser_serve.add_argument('--folder', help='Replies saved by record, default is the test data')
+    parser_serve.add_argument('--results', type=int, help='Synthesize a get_state with this many results')
+    parser_serve.add_argument('--projects', type=int, default=50)
+    parser_serve.add_argument('--port', type=int, default=31416)
+    parser_serve.add_argument('--password', default=None)
+    parser_serve.add_argument('--chunkSize', type=int, default=None)
+    parser_serve.add_argument('--chunkDelay', type=float, default=0)
+    parser_serve.add_argument('--latency', type=float, default=0)
+    args = parser.parse_args()
+
+    if args.action == 'record':
+        with boinccmd.Connection(args.host, args.port, password=args.password) as connection:
+            record(connection, args.folder)
+    elif args.action == 'serve':
+        if args.folder is not None:
+            replies = loadRecording(args.folder)
+        else:
+            replies = recorded()
+        if args.results is not None:
+            replies['get_state'] = synthesizeState(args.results, args.projects)
+
+        server = Server(replies, password=args.password, port=args.port,
+                        chunkSize=args.chunkSize, chunkDelay=args.chunkDelay,
+                        latency=args.latency)
+        print('Serving %s on %s' % (sorted(replies), server.target))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.close()
+    else:
+        parser.print_help()
@@ -20,7 +20,9 @@
 # Standard python
 import unittest
 # This project
+import task
 import application
+import statistics
 import parse_input
 
 class TestApplication(unittest.TestCase):
@@ -60,6 +62,31 @@ class TestApplication(unittest.TestCase):
         s = str(self.app)
         self.assertEqual(len(s.split('\n')), 2)
 
+    def test_merge(self):
+        web = [task.Task_web(name=name, state='in progress') for name in
+               ['wu_3_0--', 'wu_1_0--', 'wu_1_1--', 'wu_2_0--']]
+        local = [task.Task_local(name=name) for name in ['wu_1', 'wu_2', 'wu_1', 'wu_9']]
+        local_app = application.Application('foo (bar)', tasks=local)
+        web_app = application.Application('foo (bar)', tasks=web)
+        self.assertTrue(application.mergeApplications(local_app, web_app))
+        self.assertEqual([t.name for t in web_app.tasks],
+                         ['wu_3_0--', 'wu_1', 'wu_1', 'wu_2', 'wu_9'])
+        self.assertTrue(web_app.tasks[1] is local[0])
+        self.assertTrue(web_app.tasks[2] is local[2])
+
+    def test_aggregates(self):
+        self.assertEqual(self.app.credit, 0)
+        self.app.appendStatistics(statistics.ApplicationStatistics_worldcommunitygrid('3600', '42', '2'))
+        self.assertEqual(self.app.credit, 42)
+        self.assertEqual(self.app.runtime.total_seconds(), 3600)
+        self.app.statistics[0].credit = 1
+        self.assertEqual(self.app.credit, 1)
+        self.app.statistics = statistics.ApplicationStatistics(credit='10', results='1')
+        self.assertEqual(self.app.credit, 10)
+        self.app.statistics = ''
+        self.app.badge = statistics.ApplicationStatistics(credit='5', results='1')
+        self.assertEqual(self.app.credit, 5)
+
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestApplication)
     unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,303 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python
+import unittest
+import threading
+import socket
+import xml.etree.ElementTree as ElementTree
+# This project
+import boinccmd
+import parse_input
+import rpc_server
+
+def parseFile(Parser, filename=parse_input.boinccmd):
+    parser = Parser()
+    with open(filename) as f:
+        for line in f:
+            parser.feed(line.rstrip('\n'))
+    return parser.projects
+
+class TestParse_stateStream(unittest.TestCase):
+    def setUp(self):
+        self.projects = parseFile(boinccmd.Parse_stateStream)
+
+    def test_projects(self):
+        self.assertEqual(len(self.projects), 8)
+        self.assertTrue('http://www.worldcommunitygrid.org' in self.projects)
+        prj = self.projects['http://www.worldcommunitygrid.org']
+        self.assertEqual(prj.name, 'World Community Grid')
+        self.assertEqual(len(prj), 28)
+
+    def test_same_as_fallback(self):
+        fallback = parseFile(boinccmd.Parse_state)
+        self.assertEqual(sorted(fallback.keys()), sorted(self.projects.keys()))
+        for key in fallback:
+            self.assertEqual(str(fallback[key]), str(self.projects[key]))
+
+    def test_chunks(self):
+        """Feeding arbitrary chunks instead of lines should give the same result"""
+        parser = boinccmd.Parse_stateStream()
+        with open(parse_input.boinccmd, 'rb') as f:
+            content = f.read()
+        for ix in range(0, len(content), 4096):
+            parser.feedRaw(content[ix:ix+4096])
+        self.assertEqual(len(parser.projects), 8)
+        self.assertEqual(len(parser.projects['http://www.worldcommunitygrid.org']), 28)
+
+    def test_file_transfer(self):
+        parser = boinccmd.Parse_stateStream(self.projects)
+        for line in parse_input.file_transfers.split('\n'):
+            parser.feed(line)
+        prj = self.projects['http://www.worldcommunitygrid.org']
+        self.assertEqual(len(prj.fileTransfers), 1)
+        self.assertEqual(prj.fileTransfers[0].state_str, 'uploading')
+
+    def test_synthesized(self):
+        parser = boinccmd.Parse_stateStream()
+        parser.feedRaw(rpc_server.synthesizeState(results=101, projects=5))
+        self.assertEqual(len(parser.projects), 5)
+        self.assertEqual(sum([len(p) for p in parser.projects.values()]), 101)
+        active = [t for p in parser.projects.values() for t in p.tasks() if t.active != -1]
+        self.assertEqual(len(active), 5*4)
+
+    def test_get_state_chunked(self):
+        """get_state over the rpc, with the reply trickling in small pieces"""
+        with rpc_server.Server(chunkSize=100) as server:
+            with boinccmd.Connection('127.0.0.1', server.port) as connection:
+                projects = boinccmd.get_state(connection=connection)
+        self.assertEqual(len(projects), 8)
+        self.assertEqual(len(projects['http://www.worldcommunitygrid.org'].fileTransfers), 1)
+
+class ServerTestCase(unittest.TestCase):
+    """Runs a tiny server which answers each request with self.answer(request),
+    and hangs up after every self.hangUp requests"""
+    hangUp = 2
+
+    def setUp(self):
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.accepted = 0
+        self.requests = list()
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+        self.connection = boinccmd.Connection('127.0.0.1', self.server.getsockname()[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.close()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except socket.error:
+                return
+            self.accepted += 1
+            for _ in range(self.hangUp):
+                request = b''
+                while not(request.endswith(b'\003')):
+                    data = conn.recv(4096)
+                    if len(data) == 0:
+                        break
+                    request += data
+                else:
+                    self.requests.append(request.decode())
+                    conn.sendall(self.answer(request.decode()).encode() + b'\003')
+                    continue
+                break
+            conn.close()
+
+class TestConnection(ServerTestCase):
+    def answer(self, request):
+        return 'reply %d\n' % len(self.requests)
+
+    def test_reuse(self):
+        replies = [list(self.connection.request('get_state'))[0] for _ in range(5)]
+        self.assertEqual(replies, ['reply 1', 'reply 2', 'reply 3', 'reply 4', 'reply 5'])
+        self.assertEqual(self.accepted, 3)
+
+class TestCallRpc(ServerTestCase):
+    def answer(self, request):
+        if '<get_cc_status/>' in request:
+            return ('<boinc_gui_rpc_reply>\n<cc_status>\n'
+                    '<network_status>2</network_status>\n<task_mode>2</task_mode>\n'
+                    '<task_mode_delay>0.000000</task_mode_delay>\n<disallow_attach/>\n'
+                    '</cc_status>\n</boinc_gui_rpc_reply>\n')
+        elif 'http://www.unknown.org' in request:
+            return '<boinc_gui_rpc_reply>\n<error>No such project</error>\n</boinc_gui_rpc_reply>\n'
+        else:
+            return '<boinc_gui_rpc_reply>\n<success/>\n</boinc_gui_rpc_reply>\n'
+
+    def test_cc_status(self):
+        status = self.connection.get_cc_status()
+        self.assertEqual(status, dict(network_status=2, task_mode=2, task_mode_delay=0, disallow_attach=True))
+
+    def test_ops(self):
+        self.assertTrue(self.connection.read_global_prefs_override())
+        self.assertTrue(self.connection.set_run_mode('never', 3600))
+        self.assertTrue('<set_run_mode>\n<never/>\n<duration>3600.000000</duration>' in self.requests[-1])
+        self.assertTrue(self.connection.project_op('http://www.worldcommunitygrid.org', 'suspend'))
+        self.assertTrue('<project_suspend>' in self.requests[-1])
+        with self.assertRaises(ValueError):
+            self.connection.project_op('http://www.worldcommunitygrid.org', 'explode')
+        with self.assertRaises(boinccmd.RpcError):
+            self.connection.project_op('http://www.unknown.org', 'update')
+
+    def test_call(self):
+        c = boinccmd.CallRpc(self.connection, '--set_run_mode auto')
+        self.assertEqual(c.communicate(), 'Success')
+        c = boinccmd.CallRpc(self.connection, '--get_cc_status')
+        self.assertTrue('task_mode: 2' in c.communicate())
+        c = boinccmd.CallRpc(self.connection, '--get_messages 0')
+        self.assertEqual(c.reply, None)
+        self.assertTrue(c.communicate(returnAll=True).startswith('Error: '))
+
+    def test_call_unicode(self):
+        """The arguments may be unicode, like from the readline prompt on python 2"""
+        c = boinccmd.CallRpc(self.connection, u'--set_run_mode auto')
+        self.assertEqual(c.communicate(), 'Success')
+        self.assertTrue('<set_run_mode>\n<auto/>' in self.requests[-1])
+
+class TestIncrementalState(ServerTestCase):
+    hangUp = 100
+
+    def setUp(self):
+        super(TestIncrementalState, self).setUp()
+        with open(parse_input.boinccmd) as f:
+            self.state = f.read()
+        client_state = ElementTree.fromstring(self.state).find('client_state')
+        self.results = client_state.findall('result')
+        projects = client_state.findall('project')
+        self.project_status = self.reply('projects', projects)
+        self.incremental = boinccmd.IncrementalState(self.connection)
+
+    def reply(self, tag, elements):
+        inner = ''.join([ElementTree.tostring(e).decode() for e in elements])
+        return '<boinc_gui_rpc_reply>\n<{0}>\n{1}</{0}>\n</boinc_gui_rpc_reply>\n'.format(tag, inner)
+
+    def answer(self, request):
+        if '<get_state/>' in request:
+            return self.state
+        elif '<get_file_transfers/>' in request:
+            return parse_input.file_transfers
+        elif '<get_project_status/>' in request:
+            return self.project_status
+        elif '<active_only>1' in request:
+            return self.reply('results', [r for r in self.results if r.find('active_task') is not None])
+        else:
+            return self.reply('results', self.results)
+
+    def count(self, command):
+        return len([r for r in self.requests if command in r])
+
+    def running(self):
+        for r in self.results:
+            if r.findtext('active_task/active_task_state') == '1':
+                return r
+
+    def findTask(self, projects, name):
+        for p in projects.values():
+            for t in p.tasks():
+                if t.name == name:
+                    return t
+
+    def test_update(self):
+        projects = self.incremental.update()
+        self.assertEqual(len(projects), 8)
+        self.assertEqual(len(projects['http://www.worldcommunitygrid.org']), 28)
+
+        running = self.running()
+        name = running.findtext('wu_name')
+        t = self.findTask(projects, name)
+        running.find('active_task/fraction_done').text = '0.990000'
+
+        projects = self.incremental.update()
+        self.assertEqual(self.count('<get_state/>'), 1)
+        self.assertEqual(self.count('<active_only>1'), 1)
+        self.assertEqual(self.count('<active_only>0'), 0) # no active task stopped
+        self.assertTrue(self.findTask(projects, name) is t) # same object, updated in place
+        self.assertEqual(t.fractionDone_str, '99 %')
+
+    def test_task_done(self):
+        projects = self.incremental.update()
+        running = self.running()
+        name = running.findtext('wu_name')
+        running.remove(running.find('active_task'))
+        self.results.remove(self.results[0])
+
+        projects = self.incremental.update()
+        self.assertEqual(self.count('<get_state/>'), 1)
+        self.assertEqual(self.count('<active_only>0'), 1)
+        self.assertEqual(self.findTask(projects, name).active, -1)
+        self.assertEqual(sum([len(p) for p in projects.values()]), len(self.results))
+
+    def idle(self):
+        return [r for r in self.results if r.find('active_task') is None]
+
+    def test_idle_task(self):
+        """Changes to tasks without an active task, like a reported or a finished task,
+        are picked up once an active task stops"""
+        projects = self.incremental.update()
+        idle = self.idle()
+        reported = idle[0]
+        finished = [r for r in idle[1:] if float(r.findtext('estimated_cpu_time_remaining')) > 0][0]
+        self.results.remove(reported)
+        finished.find('estimated_cpu_time_remaining').text = '0.000000'
+        name = finished.findtext('wu_name')
+        self.assertNotEqual(self.findTask(projects, name).state_str, 'ready to report')
+
+        projects = self.incremental.update()
+        self.assertEqual(self.count('<active_only>0'), 0)
+        self.assertNotEqual(self.findTask(projects, name).state_str, 'ready to report')
+
+        running = self.running()
+        running.remove(running.find('active_task'))
+        projects = self.incremental.update()
+        self.assertEqual(self.count('<get_state/>'), 1)
+        self.assertEqual(self.count('<active_only>0'), 1)
+        self.assertEqual(self.findTask(projects, reported.findtext('wu_name')), None)
+        self.assertEqual(self.findTask(projects, name).state_str, 'ready to report')
+        self.assertEqual(sum([len(p) for p in projects.values()]), len(self.results))
+
+    def test_stream_parser(self):
+        """The single pass parser is used on every python version, Parse_state is only the fallback"""
+        fallback = boinccmd.Parse_state.feed
+        def feed(parser, line):
+            raise AssertionError('Parse_state used')
+        boinccmd.Parse_state.feed = feed
+        try:
+            projects = self.incremental.update()
+        finally:
+            boinccmd.Parse_state.feed = fallback
+        self.assertEqual(len(projects), 8)
+        self.assertEqual(len(projects['http://www.worldcommunitygrid.org']), 28)
+
+    def test_unknown_task(self):
+        self.incremental.update()
+        self.running().find('wu_name').text = 'not_seen_before'
+        self.incremental.update()
+        self.assertEqual(self.count('<get_state/>'), 2)
+
+if __name__ == '__main__':
+    for t in [TestParse_stateStream, TestConnection, TestCallRpc, TestIncrementalState]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
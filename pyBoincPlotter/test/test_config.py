@@ -0,0 +1,77 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import os
+import shutil
+import tempfile
+import unittest
+# Non-standard python imports
+import keyring
+import keyring.backend
+
+# This project
+import config
+
+class CountingKeyring(keyring.backend.KeyringBackend):
+    """In memory keyring counting the lookups"""
+    priority = 1
+    def __init__(self):
+        self.passwords = dict()
+        self.lookups = 0
+    def get_password(self, service, username):
+        self.lookups += 1
+        return self.passwords.get((service, username))
+    def set_password(self, service, username, password):
+        self.passwords[(service, username)] = password
+    def delete_password(self, service, username):
+        del self.passwords[(service, username)]
+
+class TestPasswords(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.previous = keyring.get_keyring()
+        self.keyring = CountingKeyring()
+        keyring.set_keyring(self.keyring)
+        self.config = config.MyConfigParser(os.path.join(self.directory, 'boinc.cfg'))
+        self.config.set('wuprop.boinc-af.org', 'username', 'me@example.org')
+        self.config.set('configuration', 'max_connections', '10')
+
+    def tearDown(self):
+        keyring.set_keyring(self.previous)
+        shutil.rmtree(self.directory)
+
+    def test_cached(self):
+        self.config.setpassword('wuprop.boinc-af.org', 'username', 'secret')
+        self.assertEqual(self.keyring.passwords, {('wuprop.boinc-af.org', 'me@example.org'): 'secret'})
+        self.config.loadPasswords()
+        self.assertEqual(self.keyring.lookups, 1)
+        # the background refresh only reads the cache
+        self.assertEqual(self.config.getpassword('wuprop.boinc-af.org', 'username'), 'secret')
+        self.assertEqual(self.keyring.lookups, 1)
+
+    def test_setpassword(self):
+        self.assertEqual(self.config.getpassword('wuprop.boinc-af.org', 'username'), None)
+        self.config.setpassword('wuprop.boinc-af.org', 'username', 'secret')
+        self.assertEqual(self.config.getpassword('wuprop.boinc-af.org', 'username'), 'secret')
+
+if __name__ == '__main__':
+    for t in [TestPasswords]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
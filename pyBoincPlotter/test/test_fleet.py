@@ -0,0 +1,106 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python
+import sys
+import unittest
+import socket
+import time
+import threading
+# This project
+from rpc_server import Server
+if sys.version_info >= (3, 5):
+    import fleet                # SyntaxError on python 2.7
+
+@unittest.skipIf(sys.version_info < (3, 5), 'fleet needs python 3.5 or newer')
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        self.servers = list()
+
+    def tearDown(self):
+        for s in self.servers:
+            s.close()
+
+    def server(self, **kwargs):
+        s = Server(**kwargs)
+        self.servers.append(s)
+        return s
+
+    def test_splitTarget(self):
+        self.assertEqual(fleet.splitTarget('coffe.local'), ('coffe.local', 31416))
+        self.assertEqual(fleet.splitTarget('coffe.local:1234'), ('coffe.local', 1234))
+        self.assertEqual(fleet.splitTarget('[::1]:1234'), ('::1', 1234))
+        self.assertEqual(fleet.splitTarget('[fe80::1]'), ('fe80::1', 31416))
+        self.assertEqual(fleet.splitTarget('fe80::1'), ('fe80::1', 31416))
+        self.assertRaises(ValueError, fleet.splitTarget, 'coffe.local:abc')
+
+    def test_poll(self):
+        s1 = self.server()
+        s2 = self.server(password='secret')
+        hosts = fleet.poll([s1.target, s2.target], password={s2.target: 'secret'})
+        self.assertEqual(sorted(hosts), sorted([s1.target, s2.target]))
+        for projects in hosts.values():
+            self.assertEqual(len(projects), 8)
+            prj = projects['http://www.worldcommunitygrid.org']
+            self.assertEqual(len(prj), 28)
+            self.assertEqual(len(prj.fileTransfers), 1)
+            for task in prj.tasks():
+                self.assertEqual(task.device, '127.0.0.1')
+
+    def test_parse_in_executor(self):
+        """The replies are parsed off the event loop thread"""
+        threads = list()
+        parse = fleet.Client.parse
+        def recordThread(client, *args):
+            threads.append(threading.current_thread())
+            return parse(client, *args)
+        fleet.Client.parse = recordThread
+        try:
+            hosts = fleet.poll([self.server().target])
+        finally:
+            fleet.Client.parse = parse
+        self.assertEqual(len(hosts), 1)
+        self.assertEqual(len(threads), 2) # get_state and get_file_transfers
+        self.assertTrue(threading.current_thread() not in threads)
+
+    def test_wrong_password(self):
+        s = self.server(password='secret')
+        self.assertEqual(fleet.poll([s.target], password='guess'), {})
+
+    def test_dead_and_slow(self):
+        s = self.server()
+        slow = self.server(latency=60)
+        dead = socket.socket()  # nobody listening on this port
+        dead.bind(('127.0.0.1', 0))
+        dead_target = '127.0.0.1:%d' % dead.getsockname()[1]
+        dead.close()
+        start = time.time()
+        hosts = fleet.poll([s.target, slow.target, dead_target], timeout=1)
+        self.assertEqual(list(hosts), [s.target])
+        self.assertTrue(time.time() - start < 2)
+
+    def test_bad_target(self):
+        """A target that can not be parsed does not stop the other hosts"""
+        s = self.server()
+        hosts = fleet.poll(['coffe.local:abc', s.target])
+        self.assertEqual(list(hosts), [s.target])
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestFleet)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import threading
+import unittest
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+# This project
+import httpPool
+
+class Clock(object):
+    """Fake time, sleep moves the clock forward"""
+    def __init__(self):
+        self.now = 0.
+    def __call__(self):
+        return self.now
+    def sleep(self, seconds):
+        self.now += seconds
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst(self):
+        clock = Clock()
+        bucket = httpPool.TokenBucket(rate=2, burst=3, clock=clock, sleep=clock.sleep)
+        waits = [bucket.acquire() for _ in range(5)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertAlmostEqual(waits[3], 0.5)
+        self.assertAlmostEqual(waits[4], 0.5)
+        self.assertAlmostEqual(clock.now, 1.)
+
+    def test_refill(self):
+        clock = Clock()
+        bucket = httpPool.TokenBucket(rate=1, burst=2, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+        clock.now += 10         # never more than burst saved up
+        self.assertEqual([bucket.acquire() for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(bucket.acquire(), 1.)
+
+    def test_reserve(self):
+        """Threads finding an empty bucket queue up instead of all waking at once"""
+        clock = Clock()
+        bucket = httpPool.TokenBucket(rate=1, burst=1, clock=clock, sleep=lambda s: None)
+        waits = [bucket.acquire() for _ in range(4)]
+        self.assertEqual(waits, [0, 1, 2, 3])
+
+class TestRateLimiter(unittest.TestCase):
+    def test_hosts(self):
+        limiter = httpPool.RateLimiter(rate=1, burst=1)
+        a = limiter.bucket('www.primegrid.com')
+        self.assertTrue(limiter.bucket('www.primegrid.com') is a)
+        self.assertFalse(limiter.bucket('numberfields.asu.edu') is a)
+
+    def test_unlimited(self):
+        limiter = httpPool.RateLimiter(rate=None)
+        for _ in range(10):
+            self.assertEqual(limiter.acquire('http://www.primegrid.com/results.php'), 0)
+        self.assertEqual(limiter.buckets, dict())
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive
+    def do_GET(self):
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args):
+        pass
+
+class Limiter(object):
+    def __init__(self):
+        self.urls = list()
+    def acquire(self, url):
+        self.urls.append(url)
+        return 0
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_shared(self):
+        s1 = httpPool.session()
+        s2 = httpPool.session()
+        self.assertTrue(s1.get_adapter('https://a') is s2.get_adapter('http://b'))
+        self.assertFalse(s1.cookies is s2.cookies)
+
+    def test_limiter(self):
+        limiter = Limiter()
+        adapter = httpPool.LimitedAdapter(limiter=limiter, pool_maxsize=1)
+        s = httpPool.requests.session()
+        s.mount('http://', adapter)
+        for page in ('/1', '/2'):
+            r = s.get(self.url + page, timeout=5)
+            self.assertEqual(r.content, page.encode())
+        self.assertEqual(limiter.urls, [self.url + '/1', self.url + '/2'])
+
+    def test_configure(self):
+        class Config(dict):
+            def has_option(self, section, option):
+                return option in self
+            def get(self, section, option):
+                return self[option]
+        try:
+            a = httpPool.configure(Config(max_connections='8', requests_per_second='0.5'), burst=1)
+            self.assertTrue(httpPool.adapter() is a)
+            self.assertEqual(a._pool_maxsize, 8)
+            self.assertEqual(a.limiter.rate, 0.5)
+            self.assertEqual(a.limiter.burst, 1)
+        finally:
+            httpPool.configure()
+
+    def test_default(self):
+        """No rate limit unless configured, only the connections per host are limited"""
+        a = httpPool.createAdapter()
+        self.assertTrue(a.limiter is None)
+        self.assertEqual(a._pool_maxsize, httpPool.MAX_CONNECTIONS)
+
+if __name__ == '__main__':
+    for t in [TestTokenBucket, TestRateLimiter, TestSession]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
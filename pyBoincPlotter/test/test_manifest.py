@@ -0,0 +1,122 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+# This project
+from manifest import Manifest
+
+def ttlClass(filename):
+    return os.path.splitext(filename)[1]
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def touch(self, name, age=0):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as f:
+            f.write(name)
+        t = time.time() - age
+        os.utime(filename, (t, t))
+        return filename
+
+    def test_add(self):
+        m = Manifest(self.directory)
+        self.assertTrue(m.created)
+        filename = self.touch('a.html')
+        m.add(filename, url='http://a', size=6, ttl='page')
+        self.assertTrue(filename in m)
+        self.assertTrue('a.html' in m)
+        self.assertFalse(os.path.join(self.directory, 'b.html') in m)
+        self.assertEqual(m.get(filename)[:2], ('http://a', 6))
+        m.remove(filename)
+        self.assertFalse(filename in m)
+        self.assertEqual(len(m), 0)
+
+    def test_persistent(self):
+        m = Manifest(self.directory)
+        m.add(self.touch('a.html'), ttl='page')
+        m.close()
+        m = Manifest(self.directory)
+        self.assertFalse(m.created)
+        self.assertEqual(len(m), 1)
+
+    def test_expired(self):
+        m = Manifest(self.directory, filename=None)
+        now = time.time()
+        m.add(self.touch('old.html'), ttl='page', fetched=now - 7200)
+        m.add(self.touch('new.html'), ttl='page', fetched=now)
+        m.add(self.touch('old.png'), ttl='image', fetched=now - 7200)
+        self.assertEqual(m.expired('page', 3600, now=now), [os.path.join(self.directory, 'old.html')])
+        self.assertEqual(m.expired('image', 3*3600, now=now), [])
+
+    def test_validators(self):
+        m = Manifest(self.directory, filename=None)
+        now = time.time()
+        m.add(self.touch('etag.html'), ttl='page', fetched=now - 7200, etag='"abc"')
+        m.add(self.touch('modified.html'), ttl='page', fetched=now - 7200,
+              modified='Sat, 17 Oct 2026 10:00:00 GMT')
+        m.add(self.touch('plain.html'), ttl='page', fetched=now - 7200)
+        self.assertEqual(m.get('etag.html')[4:6], ('"abc"', None))
+        self.assertEqual(m.expired('page', 3600, now=now, validated=False),
+                         [os.path.join(self.directory, 'plain.html')])
+        self.assertEqual(sorted(m.expired('page', 3600, now=now, validated=True)),
+                         [os.path.join(self.directory, 'etag.html'),
+                          os.path.join(self.directory, 'modified.html')])
+        # Not modified, a new ttl starts
+        m.touch('etag.html', fetched=now)
+        self.assertEqual(m.expired('page', 3600, now=now, validated=True),
+                         [os.path.join(self.directory, 'modified.html')])
+        self.assertEqual(m.get('etag.html')[2], now)
+
+    def test_migrate(self):
+        import sqlite3
+        db = sqlite3.connect(os.path.join(self.directory, 'cache_manifest.sqlite'))
+        db.execute('CREATE TABLE files (filename TEXT PRIMARY KEY, url TEXT, size INTEGER, fetched REAL, ttl TEXT)')
+        db.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?)', ('a.html', 'http://a', 6, 0., 'page'))
+        db.commit()
+        db.close()
+        m = Manifest(self.directory)
+        self.assertEqual(m.get('a.html'), ('http://a', 6, 0., 'page', None, None, None))
+        m.add(self.touch('b.html'), ttl='page', etag='"b"')
+        self.assertEqual(m.get('b.html')[4], '"b"')
+
+    def test_scan(self):
+        self.touch('old.html', age=7200)
+        self.touch('new.xml')
+        self.touch('cookies.pickle')
+        m = Manifest(self.directory, filename=None)
+        m.scan(('.html', '.xml'), ttlClass)
+        self.assertEqual(len(m), 2)
+        self.assertEqual(m.expired('.html', 3600), [os.path.join(self.directory, 'old.html')])
+        self.assertEqual(m.get('new.xml')[3], '.xml')
+
+if __name__ == '__main__':
+    for t in [TestManifest]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,78 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import os
+import shutil
+import tempfile
+import unittest
+
+# This project
+from pageStore import PageStore
+from manifest import Manifest
+
+class TestPageStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = PageStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        content = b'<html>' + b'boilerplate '*1000 + b'</html>'
+        digest = self.store.put(content)
+        self.assertTrue(digest in self.store)
+        self.assertEqual(self.store.get(digest), content)
+        self.assertTrue(os.path.getsize(self.store.path(digest)) < len(content)/10)
+
+    def test_dedup(self):
+        d1 = self.store.put(b'same')
+        d2 = self.store.put(b'same')
+        d3 = self.store.put(b'other')
+        self.assertEqual(d1, d2)
+        self.assertNotEqual(d1, d3)
+        self.assertEqual(len(os.listdir(self.store.directory)), 2)
+
+    def test_missing(self):
+        digest = self.store.put(b'content')
+        self.store.remove(digest)
+        self.assertFalse(digest in self.store)
+        self.assertRaises(IOError, self.store.get, digest)
+
+    def test_damaged(self):
+        digest = self.store.put(b'content')
+        with open(self.store.path(digest), 'wb') as f:
+            f.write(b'not zlib')
+        self.assertRaises(IOError, self.store.get, digest)
+
+    def test_referenced(self):
+        m = Manifest(self.directory, filename=None)
+        digest = self.store.put(b'badge')
+        m.add('a.png', ttl='image', digest=digest)
+        m.add('b.png', ttl='image', digest=digest)
+        m.remove('a.png')
+        self.assertTrue(m.referenced(digest))
+        m.remove('b.png')
+        self.assertFalse(m.referenced(digest))
+
+if __name__ == '__main__':
+    for t in [TestPageStore]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
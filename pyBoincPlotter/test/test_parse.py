@@ -18,6 +18,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # END LICENCE
 # Standard python
+import time
+import json
+import datetime
 import tempfile
 import unittest
 # This project
@@ -32,7 +35,7 @@ def _setUp(Browser, Parser, url, **kwargs):
     CONFIG = config.setupConfigFile() # TODO: remove this requirement, write browser so that this can be None
     dir = parse_input.dataFolder
     #dir = tempfile.mkdtemp()
-    cache = browser.Browser_file(dir, removeOld=False)
+    cache = browser.Browser_file(dir, removeOld=False, manifest=None)
     b = Browser(browser_cache=cache, 
                 CONFIG=CONFIG, 
                 **kwargs)
@@ -223,7 +226,7 @@ class TestWuprop(unittest.TestCase):
         # todo: avoid duplicate
         CONFIG = config.setupConfigFile() # TODO: remove this requirement, write browser so that this can be None
         dir = parse_input.dataFolder
-        browser_cache = browser.Browser_file(dir, removeOld=False)
+        browser_cache = browser.Browser_file(dir, removeOld=False, manifest=None)
 
         wuprop_projects = browser.getProjects_wuprop(CONFIG, browser_cache)
         self.assertEqual(len(wuprop_projects), 8)
@@ -311,11 +314,161 @@ class TestNumbersFields(unittest.TestCase):
         ignoreSpaces(self, str(project.badges[0][1]),
                      'Bronze Medal- 10k credits. (Next badge is Silver at 100k)')
                          
+def resultPage(offset, last, rows=20):
+    """Result table page linking to the previous and next page, like the boinc results.php"""
+    table = ''.join('<tr>%s</tr>' % ''.join('<td>%d_%d</td>' % (offset + i, j) for j in range(10))
+                    for i in range(rows))
+    links = ''
+    if offset > 0:
+        links += '<a href="results.php?offset=%d">Previous</a>' % (offset - rows)
+    if offset < last:
+        links += '<a href="results.php?offset=%d">Next</a>' % (offset + rows)
+    return '<table>%s</table>%s' % (table, links)
+
+class PagedBrowser(object):
+    """Browser serving resultPage up to offset last, with a delay to simulate the network"""
+    name = 'paged'
+    def __init__(self, last, delay=0.01):
+        self.last = last
+        self.delay = delay
+        self.visited = list()
+
+    def visit(self, offset):
+        self.visited.append(offset)
+        time.sleep(self.delay)
+        if offset > self.last:
+            return resultPage(offset, last=0, rows=0)
+        return resultPage(offset, self.last)
+
+class TestFetchPages(unittest.TestCase):
+    def setUp(self):
+        self.browser = PagedBrowser(last=580)
+        self.parser = parse.HTMLParser(browser=self.browser, p=project.Project('paged'))
+
+    def test_order(self):
+        rows = list(self.parser.getRows(resultPage(0, 580)))
+        self.assertEqual([row[0] for row in rows], ['%d_0' % ix for ix in range(600)])
+        # only the linked pages are visited, each of them once
+        self.assertEqual(sorted(self.browser.visited), list(range(20, 600, 20)))
+
+    def test_stop(self):
+        rows = self.parser.getRows(resultPage(0, 580))
+        for ix, row in enumerate(rows):
+            if ix == 50:
+                break
+        rows.close()
+        self.assertTrue(len(self.browser.visited) <= 2 + self.parser.maxWorkers)
+
+class JSONBrowser(object):
+    """Worldcommunitygrid api browser serving n results, pageSize per request but never more than cap"""
+    name = 'worldcommunitygrid.org'
+    def __init__(self, n, pageSize, cap=None, short=()):
+        self.n = n
+        self.pageSize = pageSize
+        self.cap = cap or pageSize
+        self.short = short      # offsets returning half a page
+        self.visited = list()
+
+    def visit(self, offset=0):
+        self.visited.append(offset)
+        limit = min(self.pageSize, self.cap)
+        if offset in self.short:
+            limit //= 2
+        results = [dict(Name='result_%d' % ix) for ix in range(offset, min(offset + limit, self.n))]
+        return json.dumps(dict(ResultsStatus=dict(ResultsAvailable=str(self.n), 
+                                                  ResultsReturned=str(len(results)), 
+                                                  Offset=str(offset),
+                                                  Results=results)))
+
+class TestWorldcommunitygridPages(unittest.TestCase):
+    def test_rows(self):
+        b = JSONBrowser(n=2000, pageSize=250)
+        parser = parse.HTMLParser_worldcommunitygrid(browser=b, p=project.Project('worldcommunitygrid.org'))
+        rows = list(parser.getRows(b.visit()))
+        self.assertEqual([row['Name'] for row in rows], ['result_%d' % ix for ix in range(2000)])
+        self.assertEqual(sorted(b.visited), list(range(0, 2000, 250)))
+
+    def test_single(self):
+        b = JSONBrowser(n=10, pageSize=25)
+        parser = parse.HTMLParser_worldcommunitygrid(browser=b, p=project.Project('worldcommunitygrid.org'))
+        self.assertEqual(len(list(parser.getRows(b.visit()))), 10)
+        self.assertEqual(b.visited, [0])
+
+    def test_capped(self):
+        """page_size above what the server returns, the offsets follow the returned results"""
+        b = JSONBrowser(n=1000, pageSize=250, cap=100)
+        parser = parse.HTMLParser_worldcommunitygrid(browser=b, p=project.Project('worldcommunitygrid.org'))
+        rows = list(parser.getRows(b.visit()))
+        self.assertEqual([row['Name'] for row in rows], ['result_%d' % ix for ix in range(1000)])
+        self.assertEqual(sorted(b.visited), list(range(0, 1000, 100)))
+
+    def test_short(self):
+        """A page with fewer results than the first, the rest of that page is fetched"""
+        b = JSONBrowser(n=1000, pageSize=250, short=(250, ))
+        parser = parse.HTMLParser_worldcommunitygrid(browser=b, p=project.Project('worldcommunitygrid.org'))
+        rows = list(parser.getRows(b.visit()))
+        self.assertEqual([row['Name'] for row in rows], ['result_%d' % ix for ix in range(1000)])
+        self.assertEqual(sorted(b.visited), [0, 250, 375, 500, 750])
+
+def taskPage(offset, states, rows=20):
+    """Result table page of tasks named by their position, states[i] is the state of task i"""
+    deadline = (datetime.datetime.utcnow() + datetime.timedelta(days=5)).strftime('%d %b %Y %H:%M:%S UTC')
+    table = ''
+    for ix in range(offset, min(offset + rows, len(states))):
+        cells = ['task_%d' % ix, '%d' % ix, 'host', deadline, deadline, states[ix], '0', '3600', '10', 'App']
+        table += '<tr>%s</tr>' % ''.join('<td>%s</td>' % c for c in cells)
+    links = ''
+    if offset + rows < len(states):
+        links += '<a href="results.php?offset=%d">Next</a>' % (offset + rows)
+    return '<table>%s</table>%s' % (table, links)
+
+class TaskBrowser(object):
+    """Browser serving taskPage, with an in memory manifest for the watermark"""
+    name = 'tasks'
+    def __init__(self, states):
+        self.states = states
+        self.visited = list()
+        self.browser_cache = browser.Browser_file('', removeOld=False, manifest=None)
+
+    def visit(self, offset=0):
+        self.visited.append(offset)
+        return taskPage(offset, self.states)
+
+class TestWatermark(unittest.TestCase):
+    def parse(self):
+        self.browser.visited = list()
+        parser = parse.HTMLParser(browser=self.browser, p=project.Project('tasks'))
+        parser.parse(self.browser.visit())
+        return [t.name for t in parser.project.tasks()]
+
+    def test_incremental(self):
+        states = ['In progress']*10 + ['Completed and validated']*490
+        self.browser = TaskBrowser(states)
+        names = self.parse()
+        self.assertEqual(len(names), 500)
+
+        # the first page changes, the second is below the watermark
+        states[0] = 'Completed and validated'
+        names = self.parse()
+        self.assertEqual(sorted(names), sorted('task_%d' % ix for ix in range(500)))
+        self.assertEqual(self.browser.visited, [0, 20])
+
+    def test_validated(self):
+        """A task validated since the last parse is not below the watermark"""
+        states = ['Completed and validated']*20 + ['Completed, waiting for validation'] + ['Completed and validated']*79
+        self.browser = TaskBrowser(states)
+        self.parse()
+        states[20] = 'Completed and validated'
+        self.parse()
+        self.assertEqual(sorted(self.browser.visited)[:3], [0, 20, 40])
+        self.parse()
+        self.assertEqual(self.browser.visited, [0])
+
 if __name__ == '__main__':
     import logging
     from loggerSetup import loggerSetup
     loggerSetup(logging.DEBUG)
 
-    for t in [TestNumbersFields, TestYoyo, TestPrimegrid, TestWorldcommunitygrid, TestWuprop]:
+    for t in [TestNumbersFields, TestYoyo, TestPrimegrid, TestWorldcommunitygrid, TestWuprop, TestFetchPages, TestWorldcommunitygridPages, TestWatermark]:
         suite = unittest.TestLoader().loadTestsFromTestCase(t)
         unittest.TextTestRunner(verbosity=2).run(suite)
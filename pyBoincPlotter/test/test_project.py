@@ -17,9 +17,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # END LICENCE
+import os
+import shutil
+import tempfile
 import unittest
 
+import project
 from project import Project
+from application import Application
 import parse_input
 
 class TestApplication(unittest.TestCase):
@@ -71,6 +76,132 @@ class TestApplication(unittest.TestCase):
         s = str(self.proj).split('\n')
         self.assertTrue(len(s), 3)
 
+    def test_findApplicationShort(self):
+        a = self.proj.appendApplicationFromXML(parse_input.application)
+        self.assertTrue(self.proj.findApplicationShort('faah') is a)
+        self.assertTrue(self.proj.findApplicationShort('sn2s') is None)
+        self.assertTrue(self.proj.appendApplicationShort('faah') is a)
+
+        b = Application('Say No to Schistosoma (sn2s)')
+        self.proj.insertApplication(b.name_long, b)
+        self.assertTrue(self.proj.findApplicationShort('sn2s') is b)
+        self.proj.renameApplicationShort(a, 'faah2')
+        self.assertTrue(self.proj.findApplicationShort('faah') is None)
+        self.assertTrue(self.proj.findApplicationShort('faah2') is a)
+        # the next application with the previous name_short takes over
+        c = Application('Say No to Schistosoma 2 (sn2s)')
+        self.proj.insertApplication(c.name_long, c)
+        self.proj.renameApplicationShort(b, 'sn2s_old')
+        self.assertTrue(self.proj.findApplicationShort('sn2s') is c)
+
+    def test_mergeProject(self):
+        """The name_short index of the web project is kept up to date by the merge"""
+        local = Project(url='http://www.worldcommunitygrid.org')
+        faah = local.appendApplicationFromXML(parse_input.application)
+        sn2s = local.appendApplication('Say No to Schistosoma (sn2s)')
+        web = Project(url='http://www.worldcommunitygrid.org')
+        web_faah = web.appendApplication(faah.name_long) # no name_short from the web
+        self.assertTrue(web.findApplicationShort('') is web_faah)
+        project.mergeProject(local, web)
+        self.assertTrue(web.findApplicationShort('faah') is web_faah)
+        self.assertTrue(web.findApplicationShort('sn2s') is sn2s)
+        self.assertTrue(web.findApplicationShort('') is None)
+
+class Named(object):
+    def __init__(self, name):
+        self.name = name
+
+class TestMergeDicts(unittest.TestCase):
+    def setUp(self):
+        self.merged = list()
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'merge_matches.pickle')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def merge(self, local, web):
+        self.merged.append((local.name, web.name))
+        return True
+
+    def mergeDicts(self, local_names, web_names, matches=None):
+        self.merged = list()
+        local = dict((n, Named(n)) for n in local_names)
+        web = dict((n, Named(n)) for n in web_names)
+        project.mergeDicts(local, web, self.merge, 'name', matches=matches)
+        return sorted(self.merged)
+
+    def test_fuzzy(self):
+        merged = self.mergeDicts(['PPS (Sieve)', 'Rosetta', 'World Community Grid'],
+                                 ['pps sieve', 'Rosetta@home', 'World Community'])
+        self.assertEqual(merged, [('PPS (Sieve)', 'pps sieve'), ('Rosetta', 'Rosetta@home'),
+                                  ('World Community Grid', 'World Community')])
+
+    def test_difflib(self):
+        merged = self.mergeDicts(['FightAIDS@Home - Phase 2'], ['FightAIDS@Home Phase 2', 'Mapping Cancer Markers'])
+        self.assertEqual(merged, [('FightAIDS@Home - Phase 2', 'FightAIDS@Home Phase 2')])
+
+    def test_matches(self):
+        matches = project.MatchMap(self.filename)
+        merged = self.mergeDicts(['Rosetta', 'FightAIDS@Home - Phase 2'],
+                                 ['Rosetta@home', 'FightAIDS@Home Phase 2'], matches)
+        self.assertEqual(merged, [('FightAIDS@Home - Phase 2', 'FightAIDS@Home Phase 2'),
+                                  ('Rosetta', 'Rosetta@home')])
+        self.assertEqual(matches.get('', 'Rosetta'), 'Rosetta@home')
+        self.assertEqual(matches.get('', 'FightAIDS@Home - Phase 2'), 'FightAIDS@Home Phase 2')
+        matches.save()
+
+        matches = project.MatchMap(self.filename)
+        self.assertEqual(matches.get('', 'Rosetta'), 'Rosetta@home')
+        merged = self.mergeDicts(['Rosetta'], ['Rosetta@home', 'Rosetta mini'], matches)
+        self.assertEqual(merged, [('Rosetta', 'Rosetta@home')])
+
+    def test_difflib_remembered(self):
+        """difflib only runs for new names"""
+        matches = project.MatchMap(self.filename)
+        self.mergeDicts(['FightAIDS@Home - Phase 2'], ['FightAIDS@Home Phase 2'], matches)
+        get_close_matches = project.difflib.get_close_matches
+        def fail(*args, **kwargs):
+            raise AssertionError('difflib used')
+        project.difflib.get_close_matches = fail
+        try:
+            merged = self.mergeDicts(['FightAIDS@Home - Phase 2'], ['FightAIDS@Home Phase 2'], matches)
+        finally:
+            project.difflib.get_close_matches = get_close_matches
+        self.assertEqual(merged, [('FightAIDS@Home - Phase 2', 'FightAIDS@Home Phase 2')])
+
+    def test_gone(self):
+        """A remembered pair is forgotten when the web name is gone"""
+        matches = project.MatchMap(self.filename)
+        matches.set('', 'FightAIDS@Home - Phase 2', 'FightAIDS@Home Phase 1')
+        merged = self.mergeDicts(['FightAIDS@Home - Phase 2'], ['FightAIDS@Home Phase 2'], matches)
+        self.assertEqual(merged, [('FightAIDS@Home - Phase 2', 'FightAIDS@Home Phase 2')])
+        self.assertEqual(matches.get('', 'FightAIDS@Home - Phase 2'), 'FightAIDS@Home Phase 2')
+
+    def test_ambiguous(self):
+        # two fuzzy candidates, the first one is used but not remembered
+        matches = project.MatchMap(self.filename)
+        merged = self.mergeDicts(['World'], ['World Community', 'World Community Grid'], matches)
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(matches.get('', 'World'), None)
+
+    def test_exact_first(self):
+        # equal keys are merged before the remembered pairs
+        matches = project.MatchMap(self.filename)
+        matches.set('', 'foo', 'bar')
+        merged = self.mergeDicts(['foo'], ['foo', 'bar'], matches)
+        self.assertEqual(merged, [('foo', 'foo')])
+
+    def test_forget(self):
+        # a remembered pair that no longer merges is forgotten
+        matches = project.MatchMap(self.filename)
+        matches.set('', 'foo', 'bar')
+        self.merge = lambda local, web: web.name != 'bar'
+        self.mergeDicts(['foo'], ['bar', 'baz'], matches)
+        self.assertEqual(matches.get('', 'foo'), None)
+        self.assertTrue(matches.changed)
+
 if __name__ == '__main__':
-    suite = unittest.TestLoader().loadTestsFromTestCase(TestApplication)
-    unittest.TextTestRunner(verbosity=2).run(suite)
+    for t in [TestApplication, TestMergeDicts]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,100 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import os
+import shutil
+import tempfile
+import unittest
+
+# This project
+import task
+import boinccmd
+import snapshot
+import parse_input
+from project import Project
+
+def parseFile(Parser, filename=parse_input.boinccmd):
+    parser = Parser()
+    with open(filename) as f:
+        for line in f:
+            parser.feed(line.rstrip('\n'))
+    return parser.projects
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'projects_snapshot.pickle')
+        self.projects = parseFile(boinccmd.Parse_stateStream)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        self.assertTrue(snapshot.save(self.filename, self.projects))
+        projects, created = snapshot.load(self.filename)
+        self.assertEqual(sorted(projects), sorted(self.projects))
+        for key in self.projects:
+            self.assertEqual(str(projects[key]), str(self.projects[key]))
+            for app in projects[key].applications.values():
+                self.assertEqual(app.tasks.stateCounts(), 
+                                 self.projects[key].applications[app.name_long].tasks.stateCounts())
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+    def test_missing(self):
+        self.assertEqual(snapshot.load(self.filename), (None, None))
+        with open(self.filename, 'w') as f:
+            f.write('garbage')
+        self.assertEqual(snapshot.load(self.filename), (None, None))
+
+    def test_incompatible(self):
+        snapshot.save(self.filename, self.projects)
+        version = snapshot.SCHEMA_VERSION
+        try:
+            snapshot.SCHEMA_VERSION += 1
+            self.assertEqual(snapshot.load(self.filename), (None, None))
+        finally:
+            snapshot.SCHEMA_VERSION = version
+
+        sources = snapshot.SOURCES
+        try:
+            snapshot.SOURCES = sources + ['not a file.py']
+            self.assertEqual(snapshot.load(self.filename), (None, None))
+        finally:
+            snapshot.SOURCES = sources
+        self.assertNotEqual(snapshot.load(self.filename), (None, None))
+
+    def test_state(self):
+        # State codes depend on the order states are seen, so the string is pickled
+        t = task.Task_web(name='web', state='Some new state')
+        state = t.__getstate__()
+        self.assertEqual(state['state'], 'some new state')
+        p = Project(url='http://www.example.org', name='example')
+        p.appendApplicationShort('app')
+        p.applications['app'].tasks.append(t)
+        snapshot.save(self.filename, {p.url: p})
+        projects, _ = snapshot.load(self.filename)
+        t2 = projects[p.url].applications['app'].tasks[0]
+        self.assertEqual(t2.state_str, 'some new state')
+        self.assertEqual(t2.name, 'web')
+
+if __name__ == '__main__':
+    for t in [TestSnapshot]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -18,8 +18,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # END LICENCE
 # Standard python imports
+import os
+import time
 import unittest
 import datetime
+import threading
 
 # This project
 import task
@@ -153,7 +156,173 @@ class TestTask_web(TestTask_local):
         test('0 %')
         test('100 %', state='completed and validated')
 
+class TestRegistry(unittest.TestCase):
+    def test_code(self):
+        r = task.Registry(['a', 'b'])
+        self.assertEqual(r.code('b'), 1)
+        self.assertEqual(r.code('c'), 2)
+        self.assertEqual(r.code('c'), 2)
+        self.assertEqual(r.values, ['a', 'b', 'c'])
+        self.assertEqual(len(r), 3)
+
+    def test_threads(self):
+        r = task.Registry()
+        names = ['state %d' % (ix % 50) for ix in range(1000)]
+        results = list()
+        def run():
+            results.append([r.code(name) for name in names])
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEqual(len(r), 50)
+        for codes in results:
+            self.assertEqual(codes, results[0])
+        for name, code in zip(names, results[0]):
+            self.assertEqual(r.values[code], name)
+
+    def test_shared(self):
+        t1 = task.Task_web(name='1', state='Completed and validated')
+        t2 = task.Task_web_yoyo(name='2', state='Over Success Done')
+        self.assertEqual(t1.state, t2.state)
+        self.assertEqual(t1.state_str, 'valid')
+        self.assertTrue(t1.done())
+        t3 = task.Task_web(name='3', state='In progress')
+        self.assertEqual(t3.state, task.Task.inProgress)
+        self.assertFalse(t3.done())
+
+class TestFromValues(unittest.TestCase):
+    def test_local(self):
+        kwargs = dict(name='foobar', state='2', fractionDone='0.5',
+                      elapsedCPUtime='60', remainingCPUtime='3600', deadline='1372752295.000000',
+                      schedularState='2', active='1', memUsage='311340577.134')
+        t1 = task.Task_local(**kwargs)
+        t2 = task.Task_local.fromValues(name='foobar', state=2, fractionDone=50.,
+                                        elapsedSeconds=60., remainingSeconds=3600., deadlineEpoch=1372752295.,
+                                        schedularState=2, active=1, memUsage=311340577.134)
+        self.assertEqual(t1.toString(), t2.toString())
+        self.assertEqual(t1.__getstate__(), t2.__getstate__())
+        self.assertEqual(t2.state_str, 'running')
+
+    def test_defaults(self):
+        t = task.Task_web.fromValues(name='web', state='In progress')
+        self.assertEqual(t.state, task.Task.inProgress)
+        self.assertEqual(t.grantedCredit, 0)
+        self.assertEqual(t.device, 'localhost')
+        self.assertTrue(t.deadlineEpoch is None)
+        self.assertRaises(TypeError, task.Task_web.fromValues, foo=1)
+
+    def test_jobLog(self):
+        t = task.Task_jobLog.createFromJobLog('1374666070 ue 3600.5 ct 3500.25 fe 5e13 nm task_1_0 et 3550.75')
+        self.assertEqual(t.name, 'task_1_0')
+        self.assertEqual(t.timeEpoch, 1374666070)
+        self.assertEqual(t.final_cpu_time, 3500.25)
+        self.assertEqual(t.rsc_fpops_est, 5e13)
+        self.assertEqual(t.fractionDone_str, '100 %')
+        # every slot is the same as with the string setters
+        t2 = task.Task_jobLog(time='1374666070', name='task_1_0', ue='3600.5', ct='3500.25', fe='5e13', et='3550.75')
+        self.assertEqual(t.__getstate__(), t2.__getstate__())
+        self.assertEqual(t.toString(), t2.toString())
+
+def timedeltaToStr(timedelta):
+    """The *_str format from before the float seconds"""
+    return str(timedelta).split('.')[0]
+
+class TestProperties(unittest.TestCase):
+    """The timedelta, datetime and *_str properties of each class give the same values
+    as the string setters used to store"""
+    def check(self, t, elapsed, remaining, seconds=1):
+        elapsed = datetime.timedelta(seconds=float(elapsed)*seconds)
+        remaining = datetime.timedelta(seconds=float(remaining)*seconds)
+        self.assertEqual(t.elapsedCPUtime, elapsed)
+        self.assertEqual(t.remainingCPUtime, remaining)
+        self.assertEqual(t.elapsedCPUtime_str, timedeltaToStr(elapsed))
+        self.assertEqual(t.remainingCPUtime_str, timedeltaToStr(remaining))
+        self.assertEqual(len(t.toString()), len(t.toString()))
+
+    def check_web(self, Task, **kwargs):
+        t = Task(name='web', state='In progress', elapsedCPUtime='1,234.5', remainingCPUtime='60',
+                 deadline='2 Jul 2013 10:04:55 UTC', grantedCredit='12.5', **kwargs)
+        self.check(t, 1234.5, 60)
+        self.assertEqual(t.deadline, datetime.datetime.strptime('2 Jul 2013 10:04:55 UTC', '%d %b %Y %H:%M:%S UTC'))
+        self.assertTrue(t.deadline_str.startswith('-'))
+        self.assertEqual(t.grantedCredit_str, '12.5')
+        return t
+
+    def test_web(self):
+        for Task in (task.Task_web, task.Task_web_yoyo, task.Task_web_rosetta):
+            self.check_web(Task)
+
+    def test_climateprediction(self):
+        t = self.check_web(task.Task_web_climateprediction, workUnitId='42', stateWebStr='In progress')
+        self.assertEqual(t.workUnitId, '42')
+        t.created = datetime.datetime(2016, 12, 9)
+        t.tasks = list()
+
+    def test_worldcommunitygrid(self):
+        t = task.Task_web_worldcommunitygrid(serverState=4, outcome=0, validateState=0, name='wcg',
+                                             elapsedCPUtime='1.5', remainingCPUtime='0.25',
+                                             deadline='2013-07-02T10:04:55')
+        self.check(t, 1.5, 0.25, seconds=3600) # hours
+        self.assertEqual(t.deadline, datetime.datetime(2013, 7, 2, 10, 4, 55))
+
+    def test_local(self):
+        t = task.Task_local(name='local', state='2', elapsedCPUtime='60.5', remainingCPUtime='3600',
+                            checkpointCPUtime='10', currentCPUtime='70', deadline='1372759495.5')
+        self.check(t, 60.5, 3600)
+        self.assertEqual(t.deadline, datetime.datetime.fromtimestamp(1372759495.5))
+        self.assertEqual(t.checkpoint, datetime.timedelta(seconds=60))
+        self.assertEqual(t.checkpoint_str, '0:01:00')
+        t.setCheckpoint('70', '10')
+        self.assertEqual(t.checkpoint, datetime.timedelta(seconds=60))
+        self.assertEqual(t.checkpoint_str, '-0:01:00')
+        t.setCheckpoint(None, '10')
+        self.assertEqual(t.checkpoint, None)
+        self.assertEqual(t.checkpoint_str, '')
+
+    def test_deadline_str(self):
+        """Time until the deadline does not depend on the local timezone
+        (it used to compare a local deadline to utcnow for local tasks)"""
+        if not(hasattr(time, 'tzset')):
+            return
+        tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'Etc/GMT-9'
+        time.tzset()
+        try:
+            deadline = '%f' % (time.time() + 7200.5)
+            local = task.Task_local(name='local', deadline=deadline)
+            self.assertTrue(local.deadline_str in ('2:00:00', '1:59:59'), local.deadline_str)
+            utc = datetime.datetime.utcfromtimestamp(float(deadline) - 86400)
+            web = task.Task_web(name='web', deadline=utc.strftime('%d %b %Y %H:%M:%S UTC'))
+            self.assertTrue(web.deadline_str in ('-22:00:00', '-21:59:59'), web.deadline_str)
+            self.assertEqual(task.Task_web(name='web').deadline_str, '-')
+        finally:
+            if tz is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = tz
+            time.tzset()
+
+    def test_fileTransfer(self):
+        t = task.Task_fileTransfer(project_url='http://www.worldcommunitygrid.org', project_name='wcg',
+                                   name='file', nbytes='2000000', status='0', time_so_far='30.5',
+                                   nbytes_xferred='500000', is_upload='0')
+        self.check(t, 30.5, 0)
+        self.assertEqual(t.state_str, 'downloading')
+        self.assertEqual(t.fractionDone_str, '25 %')
+        self.assertEqual(t.bytesDone, '500 kB/2 MB')
+        self.assertEqual(t.toString()[5], '500 kB/2 MB')
+
+    def test_jobLog(self):
+        t = task.Task_jobLog.createFromJobLog('1374666070 ue 3600.5 ct 3500.25 fe 5e13 nm task_1_0 et 3550.75')
+        self.check(t, 3500.25, 0)
+        self.assertEqual(t.time, datetime.datetime.fromtimestamp(1374666070))
+        self.assertEqual(t.final_cpu_time, 3500.25)
+        self.assertEqual(t.final_elapsed_time, 3550.75)
+        self.assertEqual(t.estimated_runtime_uncorrected, 3600.5)
+        t.credit = 12.5         # set by plot.jobLog.merge
+        self.assertEqual(t.credit, 12.5)
+
 if __name__ == '__main__':
-    for t in [TestTask, TestTask_local, TestTask_web]:
+    for t in [TestTask, TestTask_local, TestTask_web, TestRegistry, TestFromValues, TestProperties]:
         suite = unittest.TestLoader().loadTestsFromTestCase(t)
         unittest.TextTestRunner(verbosity=2).run(suite)
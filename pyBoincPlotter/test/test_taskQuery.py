@@ -0,0 +1,97 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import time
+import unittest
+
+# This project
+import task
+import taskQuery
+from textTable import TextTable
+from project import Project
+
+class Counting(task.Task_local):
+    """Task_local counting the calls to toString"""
+    __slots__ = ('calls', )
+    def toString(self):
+        self.calls = getattr(self, 'calls', 0) + 1
+        return super(Counting, self).toString()
+
+def local(name, deadline, state='2', active='-1', device='localhost', remaining='0'):
+    return Counting(name=name, state=state, active=active, device=device,
+                    remainingCPUtime=remaining, deadline=str(deadline))
+
+class TestTaskQuery(unittest.TestCase):
+    def setUp(self):
+        now = time.time()
+        self.projects = dict()
+        self.tasks = list()
+        for name in ['alpha', 'beta']:
+            p = Project(url='http://www.%s.org' % name, name=name)
+            p.appendApplicationShort('app')
+            for ix in range(10):
+                t = local('%s_%d' % (name, ix), deadline=now + ix*3600, remaining=str(100 - ix),
+                          device='host%d' % (ix % 2), active='1' if ix < 3 else '-1')
+                p.applications['app'].tasks.append(t)
+                self.tasks.append(t)
+            self.projects[p.url] = p
+
+    def names(self, query):
+        rows, more = query.select(self.projects)
+        return [t.name for p, t in rows], more
+
+    def test_page(self):
+        names, more = self.names(taskQuery.TaskQuery(page_size=3, page=1))
+        self.assertEqual(names, ['alpha_3', 'alpha_4', 'alpha_5'])
+        self.assertTrue(more)
+        names, more = self.names(taskQuery.TaskQuery(page_size=5, page=3))
+        self.assertEqual(names, ['beta_5', 'beta_6', 'beta_7', 'beta_8', 'beta_9'])
+        self.assertFalse(more)
+
+    def test_filter(self):
+        names, _ = self.names(taskQuery.TaskQuery(states=['Running'], projects=['BETA'], page_size=None))
+        self.assertEqual(names, ['beta_0', 'beta_1', 'beta_2'])
+        names, _ = self.names(taskQuery.TaskQuery(device=['host1'], deadline=(None, 4.5*3600), page_size=None))
+        self.assertEqual(names, ['alpha_1', 'alpha_3', 'beta_1', 'beta_3'])
+
+    def test_sort(self):
+        names, _ = self.names(taskQuery.TaskQuery(sort='remaining', page_size=2))
+        self.assertEqual(names, ['alpha_9', 'beta_9'])
+        names, _ = self.names(taskQuery.TaskQuery(sort='-remaining', page_size=None))
+        self.assertEqual(names[:2], ['alpha_0', 'beta_0'])
+        self.assertEqual(len(names), 20)
+        self.assertRaises(ValueError, taskQuery.TaskQuery, sort='foo')
+
+    def test_render(self):
+        table = TextTable()
+        taskQuery.TaskQuery(page_size=4).appendTo(table, self.projects)
+        lines = str(table).split('\n')
+        self.assertEqual(lines[0], 'alpha: 10 tasks (7 ready to run, 3 running), '
+                         'pending 0:15:55, running 0:00:00, validation 0:00:00')
+        self.assertEqual(len(lines), 2 + 1 + 4 + 1)
+        self.assertEqual(lines[-1], 'Showing tasks 1-4, more on page 1')
+        # Only the rows on the page are formatted
+        calls = [getattr(t, 'calls', 0) for t in self.tasks]
+        self.assertEqual(calls, [1]*4 + [0]*16)
+
+if __name__ == '__main__':
+    for t in [TestTaskQuery]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
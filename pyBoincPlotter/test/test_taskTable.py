@@ -0,0 +1,89 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+# Standard python imports
+import unittest
+
+# This project
+import task
+from taskTable import TaskTable
+
+def local(name, state='2', elapsed='0', remaining='0', active='-1'):
+    return task.Task_local(name=name, state=state, active=active,
+                           elapsedCPUtime=elapsed, remainingCPUtime=remaining,
+                           deadline='1372752295.000000')
+
+class TestTaskTable(unittest.TestCase):
+    def setUp(self):
+        self.tasks = [local('pending', remaining='100.5'),
+                      local('running', elapsed='60', remaining='3600', active='1'),
+                      local('done', elapsed='500', remaining='0'),
+                      task.Task_web(name='web', state='in progress', elapsedCPUtime='10', grantedCredit='12.5')]
+        self.table = TaskTable(self.tasks)
+
+    def test_list(self):
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(list(self.table), self.tasks)
+        self.assertEqual(self.table[1].name, 'running')
+
+    def test_pendingTime(self):
+        expected = [0, 0, 0]
+        for t in self.tasks[:3]:
+            for ix, value in enumerate(t.pendingTime()):
+                expected[ix] += value
+        self.assertEqual(self.table.pendingTime(), tuple(expected))
+        self.assertEqual(self.table.pendingTime(include_elapsedCPUtime=False), (100.5, 3600, 0))
+
+    def test_stateCounts(self):
+        counts = self.table.stateCounts()
+        self.assertEqual(sum(counts.values()), 4)
+        self.assertEqual(counts['in progress'], 1)
+        self.assertEqual(counts['ready to report'], 1)
+
+    def test_column(self):
+        self.assertEqual(list(self.table.column('grantedCredit')), [0, 0, 0, 12.5])
+        self.assertEqual(list(self.table.column('memUsage', default=-1)), [0, 0, 0, 0])
+        self.assertEqual(self.table.column('claimedCredit', default=-1)[0], -1)
+
+    def test_changed(self):
+        self.assertEqual(self.table.pendingTime()[0], 100.5)
+        self.table.append(local('another', remaining='10'))
+        self.assertEqual(self.table.pendingTime()[0], 110.5)
+        self.table[0] = local('replaced', remaining='1000')
+        self.assertEqual(self.table.pendingTime()[0], 1010)
+        self.table.remove(self.table[-1])
+        self.assertEqual(self.table.pendingTime()[0], 1000)
+
+        # in place changes through the setters are seen without a call to changed
+        self.table[0].setRemainingCPUtime('1')
+        self.assertEqual(self.table.pendingTime()[0], 1)
+        self.table[0].setElapsedCPUtime('10')
+        self.assertEqual(self.table.column('elapsedSeconds')[0], 10)
+
+        # but direct assignment does
+        self.table[0].remainingSeconds = 5
+        self.assertEqual(self.table.column('remainingSeconds')[0], 1)
+        self.table.changed()
+        self.assertEqual(self.table.column('remainingSeconds')[0], 5)
+
+if __name__ == '__main__':
+    for t in [TestTaskTable]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
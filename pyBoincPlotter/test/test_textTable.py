@@ -0,0 +1,95 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import threading
+import unittest
+
+# This project
+import task
+from textTable import TextTable
+from application import Application
+
+class Counting(object):
+    """Task like object counting the calls to toString"""
+    def __init__(self, cells):
+        self.cells = cells
+        self.calls = 0
+
+    def toString(self):
+        self.calls += 1
+        return list(self.cells)
+
+class File(list):
+    """File like object keeping each write"""
+    def write(self, s):
+        self.append(s)
+
+class TestTextTable(unittest.TestCase):
+    def test_render(self):
+        table = TextTable()
+        table.append('header')
+        table.appendRow(['a', 'bbb', 'c'])
+        table.appendRow(['dddd', 'e'])
+        self.assertEqual(table.widths, [4, 3, 1])
+        self.assertEqual(str(table), 'header\n   a bbb c\ndddd   e')
+
+    def test_toString_once(self):
+        table = TextTable()
+        rows = [Counting(['x'*ix, 'y']) for ix in range(5)]
+        for row in rows:
+            table.appendTask(row)
+        table.render()
+        table.render()
+        self.assertEqual([row.calls for row in rows], [1]*5)
+
+    def test_write(self):
+        table = TextTable()
+        table.appendRow(['a', 'b'])
+        table.appendRow(['cc', 'd'])
+        f = File()
+        table.write(f)
+        self.assertEqual(f, [' a b\ncc d\n'])
+
+    def test_application(self):
+        app = Application(name='Application name (app)')
+        app.tasks.append(task.Task_local(name='foo', deadline='1372752295.000000'))
+        app.tasks.append(task.Task_local(name='a much longer name', deadline='1372752295.000000'))
+        lines = str(app).split('\n')
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(len(lines[1]), len(lines[2]))
+
+    def test_threads(self):
+        # Tables are independent, so concurrent renders do not affect each other
+        results = dict()
+        def render(n):
+            table = TextTable()
+            for ix in range(100):
+                table.appendRow(['x'*n, str(ix)])
+            results[n] = str(table)
+        threads = [threading.Thread(target=render, args=(n, )) for n in range(1, 9)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        for n in range(1, 9):
+            self.assertEqual(results[n].split('\n')[0], 'x'*n + '  0')
+
+if __name__ == '__main__':
+    for t in [TestTextTable]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import unittest
+
+# This project
+import task
+from manifest import Manifest
+from watermark import Watermark
+
+def listing(states):
+    """(application name, task) rows named by their position"""
+    return [('app', task.Task_web(name='task_%d' % ix, state=state)) for ix, state in enumerate(states)]
+
+class TestWatermark(unittest.TestCase):
+    def test_fromListing(self):
+        rows = listing(['In progress', 'Completed and validated', 'Completed, waiting for validation',
+                        'Completed and validated', 'Error while computing', 'Completed, marked as invalid'])
+        mark = Watermark.fromListing(rows)
+        self.assertEqual([t.name for app, t in mark.rows], ['task_3', 'task_4', 'task_5'])
+        self.assertEqual(len(Watermark.fromListing(listing(['In progress']))), 0)
+
+    def test_covers(self):
+        mark = Watermark(listing(['Completed and validated']*3))
+        tasks = [t for app, t in listing(['Completed and validated']*4)]
+        self.assertTrue(mark.covers(tasks[:3]))
+        self.assertFalse(mark.covers(tasks))
+        self.assertFalse(mark.covers([]))
+
+    def test_remaining(self):
+        mark = Watermark(listing(['Completed and validated']*3))
+        self.assertEqual([t.name for app, t in mark.remaining(set(['task_0', 'task_2']))], ['task_1'])
+
+    def test_save(self):
+        manifest = Manifest('', filename=None)
+        self.assertEqual(len(Watermark.load(manifest, 'project')), 0)
+        Watermark(listing(['Completed and validated']*3)).save(manifest, 'project')
+        mark = Watermark.load(manifest, 'project')
+        self.assertEqual(len(mark), 3)
+        self.assertTrue(mark.rows[0][1].isFinal)
+        self.assertEqual(len(Watermark.load(manifest, 'other')), 0)
+
+if __name__ == '__main__':
+    for t in [TestWatermark]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,65 @@
+
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+# Standard python imports
+import time
+import threading
+import unittest
+
+# This project
+from workerPool import WorkerPool
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(4)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_result(self):
+        jobs = [self.pool.submit(pow, ix, 2) for ix in range(20)]
+        self.assertEqual([job.result() for job in jobs], [ix**2 for ix in range(20)])
+        self.assertEqual(len(self.pool.workers), 4)
+
+    def test_concurrent(self):
+        start = time.time()
+        jobs = [self.pool.submit(time.sleep, 0.1) for ix in range(4)]
+        for job in jobs:
+            job.result()
+        self.assertTrue(time.time() - start < 0.3)
+
+    def test_error(self):
+        job = self.pool.submit(int, 'not a number')
+        with self.assertRaises(ValueError):
+            job.result()
+
+    def test_cancel(self):
+        called = list()
+        event = threading.Event()
+        blocking = [self.pool.submit(event.wait) for ix in range(4)]
+        job = self.pool.submit(called.append, 1)
+        job.cancel()
+        event.set()
+        self.assertEqual(job.result(), None)
+        self.assertEqual(called, [])
+
+if __name__ == '__main__':
+    for t in [TestWorkerPool]:
+        suite = unittest.TestLoader().loadTestsFromTestCase(t)
+        unittest.TextTestRunner(verbosity=2).run(suite)
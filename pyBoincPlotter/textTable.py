@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Plain text layout of tasks, see TextTable.
+"""
+# Standard python imports
+import sys
+import logging
+logger = logging.getLogger('boinc.textTable')
+
+class TextTable(object):
+    """
+    Lines of text mixed with rows of cells. Each row is converted to strings once,
+    when it is added, and the column widths are updated from these cells.
+    render() right aligns every cell to the widest cell of its column.
+    All state lives in the instance, so independent tables can be rendered concurrently.
+    """
+    def __init__(self):
+        self.lines = list()     # str or list of str (a row)
+        self.widths = list()
+
+    def append(self, line):
+        """Appends a line of text, not part of the columns"""
+        self.lines.append(str(line))
+
+    def appendRow(self, cells):
+        """Appends a row of string cells"""
+        cells = list(cells)
+        widths = self.widths
+        for ix, cell in enumerate(cells):
+            if ix < len(widths):
+                widths[ix] = max(widths[ix], len(cell))
+            else:
+                widths.append(len(cell))
+        self.lines.append(cells)
+
+    def appendTask(self, task):
+        self.appendRow(task.toString())
+
+    def render(self):
+        widths = self.widths
+        ret = list()
+        for line in self.lines:
+            if isinstance(line, list):
+                line = " ".join([cell.rjust(widths[ix]) for ix, cell in enumerate(line)])
+            ret.append(line)
+        return "\n".join(ret)
+
+    def write(self, f=None):
+        """Writes the rendered table to f (default sys.stdout) in one go"""
+        if f is None:
+            f = sys.stdout
+        f.write(self.render() + '\n')
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __str__(self):
+        return self.render()
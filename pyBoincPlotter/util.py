@@ -95,6 +95,44 @@ def strToTimedelta(string):
     else:
         return None
 
+def findtext(element, tag, default=None):
+    """ Text of the first descendant of element named tag,
+    mirrors the soup.tag lookup used on the BeautifulSoup based parsers.
+    Returns default if tag is not present.
+    """
+    value = element.findtext('.//' + tag)
+    if value is None:
+        return default
+    return value
+
+def elementToDict(element):
+    """ Converts the children of a xml.etree element to a dictionary, key is the tag.
+    Values are converted to int or float when possible, empty elements (flags like <suspended/>)
+    become True, nested elements become dictionaries and repeated tags become lists.
+    """
+    ret = dict()
+    for child in element:
+        if len(child) != 0:
+            value = elementToDict(child)
+        elif child.text is None or child.text.strip() == '':
+            value = True
+        else:
+            value = child.text.strip()
+            for convert in (int, float):
+                try:
+                    value = convert(value)
+                    break
+                except ValueError:
+                    pass
+
+        if child.tag in ret:
+            if not(isinstance(ret[child.tag], list)):
+                ret[child.tag] = [ret[child.tag]]
+            ret[child.tag].append(value)
+        else:
+            ret[child.tag] = value
+    return ret
+
 def getLocalFiles(boincDir, name='', extension='.xml'):
     """ Call with name='statistics', extension='.xml'
     for an iterator giving (mindmodeling.org, statistics_mindmodeling.org.xml)
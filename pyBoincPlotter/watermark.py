@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+Incremental scraping of the result pages, see Watermark.
+"""
+# Standard python imports
+import logging
+logger = logging.getLogger('boinc.watermark')
+
+# This project
+import snapshot
+
+class Watermark(object):
+    """
+    The oldest part of a project's result listing where every task is in a final state
+    (see task.Task_web.finalStates), so it will look the same on the next visit.
+    The first (newest) of these tasks is the watermark, a page holding only tasks at or below it
+    does not need to be parsed again, nor do the pages after it, the stored tasks are used instead.
+    rows is a list of (application name, task) in listing order (newest first).
+    """
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = list()
+        self.rows = rows
+        self.names = set(t.name for app, t in rows)
+
+    @classmethod
+    def fromListing(cls, rows):
+        """The final tail of rows, the full listing of the project"""
+        ix = len(rows)
+        while ix > 0 and rows[ix - 1][1].isFinal:
+            ix -= 1
+        return cls(rows[ix:])
+
+    def covers(self, tasks):
+        """True if there are tasks and all of them are at or below the watermark"""
+        if len(tasks) == 0:
+            return False
+        for t in tasks:
+            if t.name not in self.names:
+                return False
+        return True
+
+    def remaining(self, seen):
+        """The stored rows whose task name is not in seen"""
+        return [(app, t) for app, t in self.rows if t.name not in seen]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def save(self, manifest, project):
+        """Stores the rows in the manifest.Manifest, through snapshot so that they are only loaded by the same code"""
+        manifest.setWatermark(project, snapshot.dumps(self.rows))
+
+    @classmethod
+    def load(cls, manifest, project):
+        """The stored Watermark of project, empty if there is none (or it was stored by other code)"""
+        data = manifest.getWatermark(project)
+        if data is None:
+            return cls()
+        rows, created = snapshot.loads(data)
+        if rows is None:
+            return cls()
+        logger.debug('Loaded watermark of %s with %d tasks', project, len(rows))
+        return cls(rows)
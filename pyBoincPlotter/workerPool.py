@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# This file is part of the py-boinc-plotter,
+# which provides parsing and plotting of boinc statistics and
+# badge information.
+# Copyright (C) 2013 obtitus@gmail.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# END LICENCE
+"""
+A small pool of worker threads for the concurrent page fetching in parse.HTMLParser,
+concurrent.futures is not part of python 2.7.
+"""
+# Standard python imports
+import threading
+import logging
+logger = logging.getLogger('boinc.workerPool')
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+class Job(object):
+    """A call submitted to the WorkerPool, use result() to wait for its return value"""
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.value = None
+        self.error = None       # the exception raised by the call, if any
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            if not(self.cancelled):
+                self.value = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            logger.debug('%s failed', self.func, exc_info=True)
+            self.error = e
+        finally:
+            self.done.set()
+
+    def cancel(self):
+        """The call is skipped unless a worker already started it"""
+        self.cancelled = True
+
+    def result(self):
+        """Waits for the call, returns its value or raises its exception"""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class WorkerPool(object):
+    """
+    Runs the submitted calls on at most maxWorkers daemon threads, started as needed.
+    Call shutdown() when done, the workers finish their current call and exit,
+    calls that are still queued should be cancelled first.
+    """
+    def __init__(self, maxWorkers):
+        self.maxWorkers = maxWorkers
+        self.queue = queue.Queue()
+        self.workers = list()
+
+    def submit(self, func, *args, **kwargs):
+        job = Job(func, args, kwargs)
+        self.queue.put(job)
+        if len(self.workers) < self.maxWorkers:
+            worker = threading.Thread(target=self.work)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+        return job
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            job.run()
+
+    def shutdown(self):
+        for _ in self.workers:
+            self.queue.put(None)
+        self.workers = list()